@@ -0,0 +1,324 @@
+"""
+Drowsiness alert dispatch off the frame loop
+
+The frame loop only posts one small (stream, drowsy, timestamp) event per
+frame to AlertManager.post(), which never blocks. A background thread turns
+those samples into alerts with hysteresis and escalation and hands them to
+the sinks (alarm sound, UDP socket, HTTP webhook, log), so a slow sink or
+audio device never stalls detection and the alarm is not re-triggered on
+every drowsy frame. Network sinks (blocking = True) each get their own
+worker thread and queue, so a hung webhook never delays the alarm sound or
+the processing of later state changes.
+
+When the frame's grab time is posted with it (live sources), stats()
+also report capture-to-alert latency: camera grab -> sink finished.
+
+Alert dictionaries passed to sinks:
+    {'stream', 'event': 'raised' | 'escalated' | 'repeat' | 'cleared',
+     'level', 'timestamp', 'duration'}
+"""
+import json
+import time
+import queue
+import socket
+import threading
+from collections import deque
+import numpy as np
+
+
+class LogSink:
+    name = 'log'
+    blocking = False
+
+    def send(self, alert):
+        if alert['event'] == 'cleared':
+            print(f"[{alert['stream']}] Alert cleared after {alert['duration']:.1f}s")
+        elif alert['event'] != 'repeat':
+            print(f"[{alert['stream']}] DROWSINESS ALERT level {alert['level']} "
+                  f"({alert['duration']:.1f}s)")
+
+    def close(self):
+        pass
+
+
+class AudioSink:
+    name = 'audio'
+    blocking = False
+
+    def __init__(self, path='assets/alarm.wav', levels=3):
+        """Alarm sound; louder with every escalation level, stopped when the alert clears"""
+        import pygame  # only needed when audio alerts are on
+        pygame.mixer.init()
+        self.sound = pygame.mixer.Sound(path)
+        self.levels = levels
+
+    def send(self, alert):
+        if alert['event'] == 'cleared':
+            self.sound.stop()
+            return
+        self.sound.set_volume(min(alert['level'], self.levels) / self.levels)
+        self.sound.play()
+
+    def close(self):
+        self.sound.stop()
+
+
+class SocketSink:
+    name = 'socket'
+    blocking = True  # host name resolution and a full send buffer can block
+
+    def __init__(self, host='127.0.0.1', port=9999):
+        """One JSON datagram per alert, e.g. for a dashboard or the vehicle bus bridge"""
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, alert):
+        self.sock.sendto(json.dumps(alert).encode(), self.address)
+
+    def close(self):
+        self.sock.close()
+
+
+class WebhookSink:
+    name = 'webhook'
+    blocking = True
+
+    def __init__(self, url, timeout=2.0):
+        """POST each alert as JSON to url"""
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        from urllib import request
+        req = request.Request(self.url, data=json.dumps(alert).encode(),
+                              headers={'Content-Type': 'application/json'})
+        with request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+    def close(self):
+        pass
+
+
+class _SinkWorker:
+    """Runs one blocking sink on its own thread with its own bounded queue"""
+
+    def __init__(self, sink, send, queue_size=64):
+        self.sink = sink
+        self.dropped = 0
+        self._send = send
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name=f"alerts-{sink.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, alert, posted, captured):
+        try:
+            self._queue.put_nowait((alert, posted, captured))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._send(self.sink, *item)
+
+    def close(self, timeout):
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return  # hung sink; the daemon thread is abandoned
+        self._thread.join(timeout=timeout)
+
+
+class _StreamAlert:
+    """Alert state of one stream"""
+
+    def __init__(self):
+        self.active = False
+        self.level = 0
+        self.raised_at = None
+        self.drowsy_since = None
+        self.alert_since = None
+        self.last_sent = None
+        self.raised = 0
+
+
+class AlertManager:
+    def __init__(self, sinks, raise_after=0.0, clear_after=1.0, escalation=(0.0, 5.0, 15.0),
+                 repeat_interval=5.0, queue_size=256, window=300):
+        """
+        sinks: objects with send(alert), close() and blocking, see LogSink;
+               blocking sinks run on their own threads
+        raise_after: drowsy for this many seconds before an alert is raised
+                     (DrowsinessDetector already requires drowsy_time)
+        clear_after: not drowsy for this many seconds before the alert is
+                     cleared, so a flickering result neither drops nor re-raises it
+        escalation: seconds since raising at which level 1, 2, ... start
+        repeat_interval: re-send the current level this often while active
+        queue_size: events waiting for the alert thread; beyond that post() drops
+        """
+        self.sinks = list(sinks)
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.escalation = tuple(escalation)
+        self.repeat_interval = repeat_interval
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._streams = {}
+        self._latencies = {sink.name: deque(maxlen=window) for sink in self.sinks}
+        self._capture_latencies = {sink.name: deque(maxlen=window) for sink in self.sinks}
+        self._errors = {sink.name: 0 for sink in self.sinks}
+        self._workers = {sink.name: _SinkWorker(sink, self._send) for sink in self.sinks
+                         if getattr(sink, 'blocking', False)}
+        self.posted = 0
+        self.dropped = 0
+        self.counts = {'raised': 0, 'escalated': 0, 'repeat': 0, 'cleared': 0}
+        self.closed = False
+        self._thread = threading.Thread(target=self._run, name='alerts', daemon=True)
+        self._thread.start()
+
+    def post(self, drowsy, timestamp=None, stream='driver', captured=None):
+        """
+        Hand one frame's drowsiness state to the alert thread; never blocks
+        timestamp: frame timestamp in seconds (default: monotonic clock now)
+        captured: time.monotonic() when the frame was grabbed, for the
+                  capture-to-alert latency
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.posted += 1
+        try:
+            self._queue.put_nowait((stream, bool(drowsy), timestamp, time.perf_counter(), captured))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._update(*item)
+
+    def _update(self, stream, drowsy, timestamp, posted, captured):
+        state = self._streams.get(stream)
+        if state is None:
+            state = self._streams[stream] = _StreamAlert()
+
+        if not state.active:
+            if not drowsy:
+                state.drowsy_since = None
+                return
+            if state.drowsy_since is None:
+                state.drowsy_since = timestamp
+            if timestamp - state.drowsy_since < self.raise_after:
+                return
+            state.active = True
+            state.level = 1
+            state.raised_at = timestamp
+            state.alert_since = None
+            state.raised += 1
+            self._dispatch('raised', stream, state, timestamp, posted, captured)
+            return
+
+        # Active: clear only after clear_after seconds without drowsiness
+        if drowsy:
+            state.alert_since = None
+        else:
+            if state.alert_since is None:
+                state.alert_since = timestamp
+            if timestamp - state.alert_since >= self.clear_after:
+                state.active = False
+                state.drowsy_since = None
+                self._dispatch('cleared', stream, state, timestamp, posted, captured)
+                return
+
+        level = sum(1 for start in self.escalation if timestamp - state.raised_at >= start)
+        if level > state.level:
+            state.level = level
+            self._dispatch('escalated', stream, state, timestamp, posted, captured)
+        elif self.repeat_interval and timestamp - state.last_sent >= self.repeat_interval:
+            self._dispatch('repeat', stream, state, timestamp, posted, captured)
+
+    def _dispatch(self, event, stream, state, timestamp, posted, captured=None):
+        state.last_sent = timestamp
+        self.counts[event] += 1
+        alert = {'stream': stream, 'event': event, 'level': state.level,
+                 'timestamp': timestamp, 'duration': timestamp - state.raised_at}
+        for sink in self.sinks:
+            worker = self._workers.get(sink.name)
+            if worker:
+                worker.submit(alert, posted, captured)
+            else:
+                self._send(sink, alert, posted, captured)
+
+    def _send(self, sink, alert, posted, captured):
+        try:
+            sink.send(alert)
+        except Exception as e:
+            if not self._errors[sink.name]:
+                print(f"Error in {sink.name} alert sink: {e}")
+            self._errors[sink.name] += 1
+        # Dispatch latency: frame loop post() -> sink done
+        self._latencies[sink.name].append(time.perf_counter() - posted)
+        if captured is not None:
+            self._capture_latencies[sink.name].append(time.monotonic() - captured)
+
+    def active(self, stream='driver'):
+        state = self._streams.get(stream)
+        return bool(state and state.active)
+
+    def stats(self):
+        """
+        Returns: Dictionary with event counts, per-stream raised alerts and
+                 per-sink dispatch latency (post() -> sink finished) and
+                 capture-to-alert latency (frame grabbed -> sink finished)
+        """
+        sinks = {}
+        for name, samples in self._latencies.items():
+            latencies = np.array(samples) * 1000.0
+            capture = np.array(self._capture_latencies[name]) * 1000.0
+            sinks[name] = {
+                'dispatched': len(latencies),
+                'errors': self._errors[name],
+                'dropped': self._workers[name].dropped if name in self._workers else 0,
+                'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                'latency_p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+                'latency_max_ms': float(latencies.max()) if len(latencies) else 0.0,
+                'capture_to_alert_p50_ms': float(np.percentile(capture, 50)) if len(capture) else None,
+                'capture_to_alert_max_ms': float(capture.max()) if len(capture) else None
+            }
+        return {
+            'posted': self.posted,
+            'dropped': self.dropped,
+            'events': dict(self.counts),
+            'streams': {name: state.raised for name, state in self._streams.items()},
+            'sinks': sinks
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        events = ", ".join(f"{name} {count}" for name, count in stats['events'].items())
+        print(f"Alerts: {events} ({stats['dropped']} of {stats['posted']} events dropped)")
+        for name, s in stats['sinks'].items():
+            print(f"  {name:>8}: dispatch p50 {s['latency_p50_ms']:.1f}ms "
+                  f"p95 {s['latency_p95_ms']:.1f}ms max {s['latency_max_ms']:.1f}ms, "
+                  f"{s['errors']} errors, {s['dropped']} dropped")
+            if s['capture_to_alert_p50_ms'] is not None:
+                print(f"  {'':>8}  capture-to-alert p50 {s['capture_to_alert_p50_ms']:.1f}ms "
+                      f"max {s['capture_to_alert_max_ms']:.1f}ms")
+
+    def close(self, timeout=2.0):
+        """Finish the queued events, then release the sinks"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        for worker in self._workers.values():
+            worker.close(timeout)
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception:
+                pass
@@ -0,0 +1,529 @@
+"""
+Headless batch scoring of recorded videos
+
+Each worker process loads the models once and then scores whole videos,
+writing one CSV of per-frame features per video plus a summary.json.
+With --landmark-cache, faces and landmarks are stored on the first run and
+later runs (e.g. with other thresholds) replay them without decoding or
+inference, see landmark_cache.
+
+With --shards N every video is split into N time segments scored in
+parallel. Each shard starts overlap seconds early to warm up FaceMesh
+tracking and the detector's temporal state, and the shards are stitched
+into one timeline; where a drowsy episode spans a whole overlap, the
+carried-over drowsy_start is applied so Is_Drowsy matches a sequential run.
+Face tracking (--track-interval) and frame skipping (--skip-interval) keep
+state the warm-up cannot reproduce, so those runs are not sharded.
+Usage: python batch_processor.py recordings/ --output results/ --workers 4
+       python batch_processor.py long_drive.mp4 --shards 8 --overlap 60
+"""
+import os
+import csv
+import json
+import math
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+from capture import FrameClock
+from frame_processor import CarriedResults
+from landmark_cache import DEFAULT_MAX_BYTES, LandmarkCache, LandmarkRecording, model_version
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')
+
+# Processed is 0 on frames the scheduler skipped, whose values are carried over from the last processed frame
+FRAME_COLUMNS = ['Frame', 'Time_S', 'Faces', 'EAR', 'MAR', 'Head_Tilt', 'Head_Elevation', 'Is_Drowsy',
+                 'Processed']
+
+# Models loaded once per worker process by _init_worker
+_processor = None
+_cache = None
+_cache_version = None
+
+
+def find_videos(inputs):
+    """Expand a list of files and directories into a sorted list of video files"""
+    videos = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(path, name))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(f"Warning: {path} does not exist, skipping")
+    return videos
+
+
+def output_names(videos):
+    """
+    Returns: {video: base name of its output CSV}; the file name without
+             extension, or where several inputs share one, their path below
+             the common directory with separators replaced by '_'
+    """
+    stems = {video: os.path.splitext(os.path.basename(video))[0] for video in videos}
+    counts = Counter(stems.values())
+    names = {}
+    for video, stem in stems.items():
+        if counts[stem] > 1:
+            same = [os.path.abspath(v) for v, s in stems.items() if s == stem]
+            common = os.path.commonpath([os.path.dirname(path) for path in same])
+            relative = os.path.relpath(os.path.abspath(video), common)
+            stem = os.path.splitext(relative)[0].replace(os.sep, '_')
+        names[video] = stem
+    return names
+
+
+def _init_worker(options, cache_dir=None, cache_bytes=None):
+    """Load the models once per worker and keep each worker on one core"""
+    global _processor, _cache, _cache_version
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    from frame_processor import FrameProcessor
+    _processor = FrameProcessor(**options)
+    # The scheduler skips frames depending on the features, so only full-rate runs are cached
+    if cache_dir and not options.get('skip_interval'):
+        _cache = LandmarkCache(cache_dir, max_bytes=cache_bytes or DEFAULT_MAX_BYTES)
+        _cache_version = model_version(options)
+
+
+def _frame_row(index, fps, results):
+    """CSV row of one frame, see FRAME_COLUMNS"""
+    processed = 0 if isinstance(results, CarriedResults) else 1
+    if not results:
+        return [index, f"{index / fps:.3f}", 0, '', '', '', '', 0, processed]
+    # One driver per camera: score the first face
+    result = results[0]
+    return [index, f"{index / fps:.3f}", len(results), result['ear'], result['mar'],
+            result['head_tilt'], result['head_elevation'], 1 if result['is_drowsy'] else 0, processed]
+
+
+def _decoded_results(cap, recording=None):
+    """Yield the processor's results for every frame of cap, optionally recording them"""
+    # Timers follow the video's own timeline, so scoring speed does not change the results
+    clock = FrameClock(cap, live=False)
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timestamp = clock.stamp()
+        results = _processor.process(frame, timestamp=timestamp)
+        if recording is not None:
+            recording.add(timestamp, results)
+        yield results
+
+
+def _cached_results(cached):
+    """Yield the processor's results for every frame of a cached video, features only"""
+    for index in range(len(cached)):
+        yield _processor.process_landmarks(cached.faces(index), cached.timestamps[index])
+
+
+def process_video(video_path, output_dir, name=None):
+    """
+    Score one video with the worker's FrameProcessor
+    name: base name of the output CSV (default: the video's file name), see output_names
+    Returns: Summary dictionary for the video
+    """
+    _processor.reset()
+    cached = _cache.get(video_path, _cache_version) if _cache else None
+    recording = None
+    if cached is not None:
+        cap = None
+        fps = cached.fps
+        frame_results = _cached_results(cached)
+    else:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return {'video': video_path, 'error': "Could not open video"}
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        recording = LandmarkRecording() if _cache else None
+        frame_results = _decoded_results(cap, recording)
+    name = name or os.path.splitext(os.path.basename(video_path))[0]
+    csv_path = os.path.join(output_dir, f"{name}_frames.csv")
+
+    frames = 0
+    face_frames = 0
+    drowsy_frames = 0
+    ear_values = []
+    mar_values = []
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(FRAME_COLUMNS)
+
+            for results in frame_results:
+                writer.writerow(_frame_row(frames, fps, results))
+                # Carried-over results of skipped frames are counted with their own frame
+                if results and not isinstance(results, CarriedResults):
+                    result = results[0]
+                    face_frames += 1
+                    drowsy_frames += 1 if result['is_drowsy'] else 0
+                    ear_values.append(result['ear'])
+                    mar_values.append(result['mar'])
+                frames += 1
+        if recording is not None:
+            frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            _cache.put(video_path, _cache_version, recording, fps, frame_size)
+    finally:
+        if cap is not None:
+            cap.release()
+
+    elapsed = time.perf_counter() - start
+    cpu_time = time.process_time() - cpu_start
+
+    summary = {
+        'video': video_path,
+        'frames_csv': csv_path,
+        'frames': frames,
+        'face_frames': face_frames,
+        'drowsy_frames': drowsy_frames,
+        'drowsy_ratio': drowsy_frames / face_frames if face_frames else 0.0,
+        'mean_ear': float(np.mean(ear_values)) if ear_values else None,
+        'mean_mar': float(np.mean(mar_values)) if mar_values else None,
+        'video_duration_s': frames / fps,
+        'elapsed_s': elapsed,
+        'cpu_s': cpu_time,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'landmark_cache': 'hit' if cached is not None else ('stored' if recording is not None else None)
+    }
+    if _processor.scheduler:
+        summary['scheduler'] = _processor.scheduler.stats(fps)
+    return summary
+
+
+def _open_at(video_path, index):
+    """Open video_path positioned so the next read returns frame index"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened() or index == 0:
+        return cap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != index:
+        # Backend cannot seek exactly: decode forward without inference instead
+        cap.release()
+        cap = cv2.VideoCapture(video_path)
+        for _ in range(index):
+            if not cap.grab():
+                break
+    return cap
+
+
+def perclos_rule_window(detector):
+    """
+    Seconds of history the PERCLOS drowsiness rule of detector depends on
+    (its first PERCLOS window), 0 when the rule is off. The drowsy_start
+    repair in stitch_shards does not cover PERCLOS, so shards need at least
+    this much overlap to match a sequential run.
+    """
+    if detector is None or detector.perclos_threshold is None:
+        return 0.0
+    return detector.engine.perclos_windows[0]
+
+
+def _detector_state():
+    detector = _processor.drowsiness_detector
+    return detector.frame_counter, detector.drowsy_start
+
+
+def process_shard(video_path, start, end, warm_start):
+    """
+    Score frames [start, end) of a video (end None: to the end), after
+    processing frames [warm_start, start) only to warm up the temporal state
+    Returns: Dictionary with the CSV rows of the segment, the per-row detector
+             frame_counter and PERCLOS verdict, and the detector state after
+             the warm-up and at the end
+    """
+    _processor.reset()
+    cap = _open_at(video_path, warm_start)
+    if not cap.isOpened():
+        return {'video': video_path, 'start': start, 'error': "Could not open video"}
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    clock = FrameClock(cap, live=False, first_index=warm_start)
+    detector = _processor.drowsiness_detector
+
+    rows = []
+    timestamps = []
+    counters = []
+    perclos_drowsy = []
+    warm_state = _detector_state()
+    index = warm_start
+    elapsed_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        while end is None or index < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timestamp = clock.stamp()
+            results = _processor.process(frame, timestamp=timestamp)
+            if index == start - 1:
+                warm_state = _detector_state()
+            if index >= start:
+                rows.append(_frame_row(index, fps, results))
+                timestamps.append(timestamp)
+                counters.append(detector.frame_counter)
+                perclos = detector.features.get('perclos', {})
+                perclos_drowsy.append(bool(results) and detector.perclos_threshold is not None and
+                                      next(iter(perclos.values()), 0.0) >= detector.perclos_threshold)
+            index += 1
+    finally:
+        cap.release()
+
+    return {
+        'video': video_path, 'start': start, 'warm_start': warm_start, 'fps': fps,
+        'rows': rows, 'timestamps': timestamps, 'counters': counters,
+        'perclos_drowsy': perclos_drowsy, 'warm_state': warm_state,
+        'end_state': _detector_state(), 'drowsy_time': detector.drowsy_time,
+        'perclos_window': perclos_rule_window(detector),
+        'elapsed_s': time.perf_counter() - elapsed_start, 'cpu_s': time.process_time() - cpu_start
+    }
+
+
+def stitch_shards(shards):
+    """
+    Join the shards of one video in order into one timeline
+
+    A shard's warm-up normally ends in the same detector state the previous
+    shard reached at the boundary. When an eyes-closed / head-tilt run
+    covers the whole overlap, the shard's run started late: its rows are
+    corrected with the previous shard's drowsy_start until the run ends.
+    Returns: (rows, number of boundaries that needed the correction)
+    """
+    rows = []
+    repaired = 0
+    previous_end = None
+    for shard in shards:
+        shard_rows = shard['rows']
+        end_state = shard['end_state']
+        if previous_end is not None and previous_end != shard['warm_state'] and previous_end[0] > 0:
+            repaired += 1
+            offset = previous_end[0] - shard['warm_state'][0]
+            drowsy_start = previous_end[1]
+            run_ended = False
+            for i, row in enumerate(shard_rows):
+                counter = shard['counters'][i]
+                if row[2] and counter == 0:
+                    run_ended = True
+                    break
+                if row[2]:
+                    timed = shard['timestamps'][i] - drowsy_start > shard['drowsy_time']
+                    row[7] = 1 if timed or shard['perclos_drowsy'][i] else 0
+            if not run_ended:
+                # The run lasted the whole shard: carry the corrected state on
+                end_state = (end_state[0] + offset, drowsy_start)
+        rows.extend(shard_rows)
+        previous_end = end_state
+    return rows, repaired
+
+
+def plan_shards(video_path, shards, overlap):
+    """Returns: [(start, end, warm_start)] frame ranges splitting the video into shards"""
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    shards = max(1, min(shards, frame_count))
+    bounds = [frame_count * i // shards for i in range(shards + 1)]
+    overlap_frames = int(math.ceil(overlap * fps))
+    # The frame count is an estimate for some containers: the last shard reads to the end
+    return [(bounds[i], bounds[i + 1] if i < shards - 1 else None, max(0, bounds[i] - overlap_frames))
+            for i in range(shards)]
+
+
+def write_sharded_video(video_path, output_dir, shards, name=None):
+    """
+    Stitch the shard results of one video and write its CSV
+    name: base name of the output CSV, see output_names
+    Returns: Summary dictionary for the video, as process_video
+    """
+    shards = sorted(shards, key=lambda shard: shard['start'])
+    errors = [shard['error'] for shard in shards if 'error' in shard]
+    if errors:
+        return {'video': video_path, 'error': errors[0]}
+    rows, repaired = stitch_shards(shards)
+    fps = shards[0]['fps']
+    short = [shard for shard in shards[1:]
+             if (shard['start'] - shard['warm_start']) / fps < shard['perclos_window']]
+    if short:
+        print(f"Warning: {video_path}: {len(short)} shard(s) warmed up for less than the "
+              f"{short[0]['perclos_window']:.0f}s PERCLOS window; Is_Drowsy near their "
+              f"boundaries may differ from a sequential run")
+    name = name or os.path.splitext(os.path.basename(video_path))[0]
+    csv_path = os.path.join(output_dir, f"{name}_frames.csv")
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FRAME_COLUMNS)
+        writer.writerows(rows)
+
+    face_rows = [row for row in rows if row[2] and row[8]]
+    drowsy_frames = sum(row[7] for row in face_rows)
+    elapsed = max(shard['elapsed_s'] for shard in shards)
+    return {
+        'video': video_path,
+        'frames_csv': csv_path,
+        'frames': len(rows),
+        'face_frames': len(face_rows),
+        'drowsy_frames': drowsy_frames,
+        'drowsy_ratio': drowsy_frames / len(face_rows) if face_rows else 0.0,
+        'mean_ear': float(np.mean([row[3] for row in face_rows])) if face_rows else None,
+        'mean_mar': float(np.mean([row[4] for row in face_rows])) if face_rows else None,
+        'video_duration_s': len(rows) / fps,
+        # Slowest shard; shards of one video run concurrently
+        'elapsed_s': elapsed,
+        'cpu_s': sum(shard['cpu_s'] for shard in shards),
+        'fps': len(rows) / elapsed if elapsed > 0 else 0.0,
+        'shards': len(shards),
+        'warm_up_frames': sum(shard['start'] - shard['warm_start'] for shard in shards),
+        'boundaries_repaired': repaired,
+        'perclos_short_warm_ups': len(short)
+    }
+
+
+def _run_sharded(pool, videos, output_dir, shards, overlap):
+    """Submit every shard of every video at once; Returns: list of video summaries"""
+    futures = {}
+    for video in videos:
+        for start, end, warm_start in plan_shards(video, shards, overlap):
+            futures[pool.submit(process_shard, video, start, end, warm_start)] = video
+    names = output_names(videos)
+    by_video = {video: [] for video in videos}
+    for future in as_completed(futures):
+        video = futures[future]
+        try:
+            by_video[video].append(future.result())
+        except Exception as e:
+            by_video[video].append({'video': video, 'start': 0, 'error': str(e)})
+    return [write_sharded_video(video, output_dir, results, names[video])
+            for video, results in by_video.items()]
+
+
+def run_batch(videos, output_dir, workers=None, cache_dir=None, cache_bytes=None,
+              shards=1, overlap=60.0, **options):
+    """
+    Score videos across a process pool, one worker per video at a time
+    cache_dir, cache_bytes: landmark cache directory and size limit, see landmark_cache
+    shards, overlap: split every video into this many segments scored in
+                     parallel, each warmed up on the overlap seconds before it;
+                     raised to the PERCLOS window when the PERCLOS rule is on;
+                     ignored with track_interval or skip_interval
+    options: forwarded to FrameProcessor (track_interval, landmark_mode, ...)
+    Returns: Summary dictionary with per-video results and throughput
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    # Which frames are detected or skipped depends on where a run started, so
+    # a shard's tracker and scheduler would not line up with a sequential run
+    stateful = [name for name, enabled in (('track_interval', options.get('track_interval')),
+                                           ('skip_interval', (options.get('skip_interval') or 0) > 1))
+                if enabled]
+    if shards > 1 and stateful:
+        print(f"Warning: {' and '.join(stateful)} cannot be reproduced across shard boundaries, "
+              f"scoring each video in one piece")
+        shards = 1
+    window = perclos_rule_window(options.get('drowsiness_detector'))
+    if shards > 1 and overlap < window:
+        print(f"Warning: overlap {overlap:.0f}s is shorter than the {window:.0f}s PERCLOS window, "
+              f"using {window:.0f}s so the shards match a sequential run")
+        overlap = window
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(videos) * max(1, shards)))
+
+    summaries = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(options, cache_dir, cache_bytes)) as pool:
+        if shards > 1:
+            # Sharded runs decode and infer every frame; the landmark cache is not used
+            completed = _run_sharded(pool, videos, output_dir, shards, overlap)
+        else:
+            names = output_names(videos)
+            futures = {pool.submit(process_video, video, output_dir, names[video]): video
+                       for video in videos}
+            completed = []
+            for future in as_completed(futures):
+                try:
+                    completed.append(future.result())
+                except Exception as e:
+                    completed.append({'video': futures[future], 'error': str(e)})
+        for summary in completed:
+            summaries.append(summary)
+            if 'error' in summary:
+                print(f"Error processing {summary['video']}: {summary['error']}")
+            else:
+                cache = " (cached landmarks)" if summary.get('landmark_cache') == 'hit' else ""
+                print(f"{summary['video']}: {summary['frames']} frames at {summary['fps']:.1f} fps{cache}, "
+                      f"drowsy {summary['drowsy_ratio']:.1%}")
+    wall_time = time.perf_counter() - start
+
+    total_frames = sum(s.get('frames', 0) for s in summaries)
+    total_worker_time = sum(s.get('elapsed_s', 0.0) for s in summaries)
+    report = {
+        'videos': sorted(summaries, key=lambda s: s['video']),
+        'workers': workers,
+        'total_frames': total_frames,
+        'wall_time_s': wall_time,
+        'fps': total_frames / wall_time if wall_time > 0 else 0.0,
+        # Worker time excludes model loading and pool start-up
+        'fps_per_core': total_frames / total_worker_time if total_worker_time > 0 else 0.0
+    }
+
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch drowsiness scoring of recorded videos")
+    parser.add_argument('inputs', nargs='+', help="video files or directories")
+    parser.add_argument('--output', default='batch_results', help="output directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--track-interval', type=int, default=None,
+                        help="run face detection every N frames and track in between")
+    parser.add_argument('--landmark-mode', choices=['crop', 'stable_roi', 'full_frame'], default='crop')
+    parser.add_argument('--face-backend', choices=['ultralytics', 'onnxruntime', 'openvino'],
+                        default='ultralytics', help="face detection inference backend")
+    parser.add_argument('--face-model', default='yolov8n-face.pt', help="face detector weights")
+    parser.add_argument('--detect-size', type=int, default=640, help="face detection resolution")
+    parser.add_argument('--roi-size', type=int, default=None, help="fixed FaceMesh ROI size")
+    parser.add_argument('--skip-interval', type=int, default=None,
+                        help="process only every Nth frame (at most) while the driver is clearly alert")
+    parser.add_argument('--landmark-cache', default=None, metavar='DIR',
+                        help="store faces and landmarks here and replay them on later runs")
+    parser.add_argument('--cache-size-mb', type=int, default=2048,
+                        help="evict least recently used cache entries beyond this size")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="split each video into this many segments scored in parallel "
+                             "(not with --track-interval or --skip-interval)")
+    parser.add_argument('--overlap', type=float, default=60.0,
+                        help="seconds of warm-up before each shard (cover the PERCLOS window)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("Error: No videos found")
+        return
+
+    report = run_batch(videos, args.output, workers=args.workers,
+                       track_interval=args.track_interval, landmark_mode=args.landmark_mode,
+                       face_backend=args.face_backend, face_model=args.face_model,
+                       detect_size=args.detect_size, roi_size=args.roi_size,
+                       skip_interval=args.skip_interval, cache_dir=args.landmark_cache,
+                       cache_bytes=args.cache_size_mb * 1024 * 1024,
+                       shards=args.shards, overlap=args.overlap)
+    print(f"Processed {report['total_frames']} frames from {len(videos)} videos in "
+          f"{report['wall_time_s']:.1f}s with {report['workers']} workers")
+    print(f"Throughput: {report['fps']:.1f} fps total, {report['fps_per_core']:.1f} fps per core")
+
+
+if __name__ == "__main__":
+    main()
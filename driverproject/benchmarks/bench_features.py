@@ -0,0 +1,80 @@
+"""
+Micro-benchmark: per-call SciPy EAR/MAR/head pose vs the vectorized kernel
+
+Runs on synthetic landmarks, so it needs neither a camera nor the models.
+Usage: python benchmarks/bench_features.py --faces 10000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drowsiness_detector import DrowsinessDetector, FEATURE_REGIONS, compute_point_features
+
+# Region sizes in the packed landmark layout
+REGION_SIZES = (6, 6, 8, 1, 1, 1)
+
+
+def synthetic_points(count, seed=0):
+    """Random packed (count, 23, 2) landmark arrays in a 640x480 frame"""
+    rng = np.random.default_rng(seed)
+    return (rng.random((count, sum(REGION_SIZES), 2)) * [640, 480]).astype(np.float32)
+
+
+def split_regions(points):
+    bounds = np.cumsum((0,) + REGION_SIZES)
+    return {name: points[a:b] for name, a, b in zip(FEATURE_REGIONS, bounds[:-1], bounds[1:])}
+
+
+def time_per_face(func, faces, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best / faces * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--faces', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    points = synthetic_points(args.faces)
+    faces = [split_regions(p) for p in points]
+    detector = DrowsinessDetector()
+    
+    def scipy_path():
+        for face in faces:
+            detector.calculate_ear(face['left_eye'])
+            detector.calculate_ear(face['right_eye'])
+            detector.calculate_mar(face['mouth'])
+            detector.calculate_head_pose(face['nose'], face['left_ear'], face['right_ear'])
+    
+    def kernel_per_face():
+        for p in points:
+            compute_point_features(p)
+    
+    def kernel_batch():
+        compute_point_features(points)
+    
+    # Both paths must agree before timing means anything
+    reference = np.array([detector.calculate_ear(f['left_eye']) for f in faces[:100]])
+    assert np.allclose(reference, compute_point_features(points[:100])['left_ear'], rtol=1e-5)
+    
+    results = {
+        'scipy per call': time_per_face(scipy_path, args.faces, args.repeat),
+        'kernel per face': time_per_face(kernel_per_face, args.faces, args.repeat),
+        'kernel batched': time_per_face(kernel_batch, args.faces, args.repeat)
+    }
+    baseline = results['scipy per call']
+    for name, us in results.items():
+        print(f"{name:>16}: {us:8.2f} us/face  ({baseline / us:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare per-frame FaceMesh latency across landmark modes
+
+Face boxes are detected once up front so only the landmark stage is timed.
+Usage: python benchmarks/bench_landmark_modes.py --video drive.mp4 --frames 300
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_detector import FaceDetector
+from landmark_detector import FacialLandmarkDetector, StableROI
+
+
+def load_frames(source, max_frames):
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video source: {source}")
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_mode(mode, frames, boxes):
+    """Time the landmark stage for one mode; returns latencies in ms and hit count"""
+    detector = FacialLandmarkDetector()
+    roi = StableROI()
+    latencies = []
+    hits = 0
+    
+    for frame, faces in zip(frames, boxes):
+        if not faces:
+            continue
+        bbox = faces[0]['bbox']
+        x1, y1, x2, y2 = bbox
+        
+        start = time.perf_counter()
+        if mode == 'crop':
+            landmarks = detector.detect_landmarks(frame[y1:y2, x1:x2], offset=(x1, y1))
+        elif mode == 'stable_roi':
+            face_roi, offset, scale = roi.extract(frame, bbox)
+            landmarks = detector.detect_landmarks(face_roi, offset=offset, scale=scale)
+        else:
+            landmarks = detector.detect_landmarks(frame)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        hits += 1 if landmarks else 0
+    
+    return latencies, hits
+
+
+def summarize(latencies, hits):
+    if not latencies:
+        return {'frames': 0}
+    values = np.array(latencies)
+    return {
+        'frames': len(values),
+        'hit_rate': hits / len(values),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'max_ms': float(values.max())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--video', default='0', help="video file or camera index")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--modes', nargs='+', default=['crop', 'stable_roi', 'full_frame'])
+    parser.add_argument('--json', help="write results to this file")
+    args = parser.parse_args()
+    
+    source = int(args.video) if args.video.isdigit() else args.video
+    frames = load_frames(source, args.frames)
+    print(f"Loaded {len(frames)} frames")
+    
+    face_detector = FaceDetector()
+    boxes = [face_detector.detect_faces(frame) for frame in frames]
+    
+    report = {}
+    for mode in args.modes:
+        # Warm up a throwaway detector so model loading is not timed
+        run_mode(mode, frames[:5], boxes[:5])
+        report[mode] = summarize(*run_mode(mode, frames, boxes))
+        stats = report[mode]
+        if stats['frames']:
+            print(f"{mode:>10}: mean {stats['mean_ms']:.2f}ms  p50 {stats['p50_ms']:.2f}ms  "
+                  f"p95 {stats['p95_ms']:.2f}ms  hit rate {stats['hit_rate']:.1%}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
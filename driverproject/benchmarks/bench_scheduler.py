@@ -0,0 +1,128 @@
+"""
+Measure what the adaptive frame scheduler saves and what it costs
+
+Replays the same frames through a FrameProcessor at full rate and with
+skip_interval set, and compares CPU time and the frame at which each
+eyes-closed / head-tilt episode is first seen (DrowsinessDetector.frame_counter
+turning positive). Episode onsets are compared by frame index so the result
+does not depend on how fast the replay runs.
+Usage: python benchmarks/bench_scheduler.py --video shift.mp4 --skip-interval 4
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_processor import FrameProcessor
+
+
+def stream_frames(source, max_frames):
+    """Yield up to max_frames frames of source, decoded one at a time"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video source: {source}")
+    try:
+        for _ in range(max_frames):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def replay(frames, face_detector, landmark_mode, skip_interval=None, fps=30.0):
+    """
+    Run frames (any iterable, e.g. stream_frames) through a fresh FrameProcessor
+    Returns: (CPU seconds spent processing, frame indices where an episode
+             onset was seen, number of frames, processor)
+    """
+    processor = FrameProcessor(landmark_mode=landmark_mode, skip_interval=skip_interval,
+                               face_detector=face_detector)
+    detector = processor.drowsiness_detector
+    onsets = []
+    counting = False
+    cpu = 0.0
+    frames_seen = 0
+    for index, frame in enumerate(frames):
+        # Decoding is the same for both runs and not timed
+        cpu_start = time.process_time()
+        processor.process(frame, timestamp=index / fps)
+        cpu += time.process_time() - cpu_start
+        frames_seen += 1
+        now_counting = detector.frame_counter > 0
+        if now_counting and not counting:
+            onsets.append(index)
+        counting = now_counting
+    return cpu, onsets, frames_seen, processor
+
+
+def match_onsets(reference, candidate, window):
+    """
+    Pair every full-rate onset with the first scheduled onset within window frames
+    Returns: (delays in frames of the matched onsets, number of missed onsets)
+    """
+    delays = []
+    missed = 0
+    candidate = np.array(candidate)
+    for onset in reference:
+        later = candidate[(candidate >= onset) & (candidate < onset + window)]
+        if len(later):
+            delays.append(int(later[0] - onset))
+        else:
+            missed += 1
+    return delays, missed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive frame scheduler CPU and delay report")
+    parser.add_argument('--video', required=True, help="recording of a (long) drive")
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--fps', type=float, default=30.0, help="source frame rate for delays in ms")
+    parser.add_argument('--skip-interval', type=int, default=4)
+    parser.add_argument('--landmark-mode', choices=FrameProcessor.LANDMARK_MODES, default='crop')
+    parser.add_argument('--output', default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    from face_detector import FaceDetector
+
+    face_detector = FaceDetector()
+    print(f"Replaying up to {args.frames} frames at full rate and with skip interval {args.skip_interval}")
+
+    # Frames are decoded again for each run instead of held in memory
+    full_cpu, full_onsets, frames, _ = replay(stream_frames(args.video, args.frames), face_detector,
+                                              args.landmark_mode, fps=args.fps)
+    cpu, onsets, _, processor = replay(stream_frames(args.video, args.frames), face_detector,
+                                       args.landmark_mode, args.skip_interval, args.fps)
+    delays, missed = match_onsets(full_onsets, onsets, window=args.skip_interval * 4)
+
+    report = {
+        'frames': frames,
+        'skip_interval': args.skip_interval,
+        'full_rate_cpu_s': full_cpu,
+        'scheduled_cpu_s': cpu,
+        'cpu_saved_fraction': 1.0 - cpu / full_cpu if full_cpu else 0.0,
+        'scheduler': processor.scheduler.stats(args.fps),
+        'onsets': len(full_onsets),
+        'onsets_missed': missed,
+        'onset_delay_mean_ms': float(np.mean(delays)) * 1000.0 / args.fps if delays else 0.0,
+        'onset_delay_max_ms': max(delays) * 1000.0 / args.fps if delays else 0.0
+    }
+
+    print(f"CPU: {full_cpu:.1f}s at full rate, {cpu:.1f}s scheduled "
+          f"({report['cpu_saved_fraction']:.0%} saved, {report['scheduler']['skip_rate']:.0%} frames skipped)")
+    print(f"Episode onsets: {len(full_onsets)}, missed {missed}, added delay mean "
+          f"{report['onset_delay_mean_ms']:.0f}ms max {report['onset_delay_max_ms']:.0f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Accuracy vs speed comparison of two face detector variants
+
+Runs a reference detector (fp32 by default) and a candidate (e.g. the INT8
+model from quantize_detector.py) on the same sampled frames. The reference
+boxes stand in for ground truth: recall is the share of reference faces the
+candidate finds at IoU >= --match-iou, next to the mean IoU of the matches
+and per-frame latency of both models.
+
+Usage:
+    python benchmarks/compare_detectors.py recordings/ --candidate yolov8n-face.int8.onnx --output int8.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+from batch_processor import find_videos
+from face_backends import _ExportedBackend, box_iou
+from quantize_detector import sample_frames
+
+
+def match_boxes(reference, candidate, match_iou=0.5):
+    """
+    Greedy one-to-one matching of candidate boxes to reference boxes by IoU
+    Returns: IoU of every matched pair
+    """
+    if not len(reference) or not len(candidate):
+        return []
+    ious = box_iou(reference, candidate)
+    matched = []
+    while ious.size:
+        i, j = np.unravel_index(np.argmax(ious), ious.shape)
+        if ious[i, j] < match_iou:
+            break
+        matched.append(float(ious[i, j]))
+        ious[i, :] = -1.0
+        ious[:, j] = -1.0
+    return matched
+
+
+def check_edge_clipping():
+    """
+    Exported backends must clip boxes to the frame: a face past the corner
+    would otherwise reach the crop with negative or out-of-frame coordinates
+    """
+    backend = _ExportedBackend(imgsz=100)
+    # One face centred on the top-left corner and one past the bottom-right, no letterbox
+    output = np.zeros((1, 5, 2), dtype=np.float32)
+    output[0, :, 0] = [5, 5, 40, 40, 0.9]
+    output[0, :, 1] = [95, 95, 40, 40, 0.9]
+    detections = backend.postprocess(output, 1.0, (0, 0), (100, 100, 3), conf=0.5, iou=0.7)
+    assert len(detections) == 2
+    assert (detections[:, :4] >= 0).all() and (detections[:, :4] <= 100).all(), detections
+
+
+def latency_stats(latencies):
+    latencies = np.array(latencies)
+    if not len(latencies):
+        return {}
+    return {
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'fps': 1000.0 / float(latencies.mean())
+    }
+
+
+def compare_detectors(reference, candidate, frames, match_iou=0.5, warmup=3):
+    """
+    reference, candidate: FaceDetector instances
+    Returns: Dictionary with accuracy of candidate against reference and latency of both
+    """
+    for frame in frames[:warmup]:
+        reference.detect_faces(frame)
+        candidate.detect_faces(frame)
+
+    reference_ms, candidate_ms, ious = [], [], []
+    reference_faces = candidate_faces = 0
+    for frame in frames:
+        # Alternate the models frame by frame so both see the same cache and thermal state
+        start = time.perf_counter()
+        expected = reference.detect_faces(frame)
+        reference_ms.append((time.perf_counter() - start) * 1000.0)
+
+        start = time.perf_counter()
+        found = candidate.detect_faces(frame)
+        candidate_ms.append((time.perf_counter() - start) * 1000.0)
+
+        reference_faces += len(expected)
+        candidate_faces += len(found)
+        ious.extend(match_boxes([f['bbox'] for f in expected], [f['bbox'] for f in found], match_iou))
+
+    matched = len(ious)
+    report = {
+        'frames': len(frames),
+        'match_iou': match_iou,
+        'accuracy': {
+            'reference_faces': reference_faces,
+            'candidate_faces': candidate_faces,
+            'matched': matched,
+            'recall': matched / reference_faces if reference_faces else 1.0,
+            'precision': matched / candidate_faces if candidate_faces else 1.0,
+            'mean_iou': float(np.mean(ious)) if ious else 0.0,
+            'p5_iou': float(np.percentile(ious, 5)) if ious else 0.0
+        },
+        'reference': latency_stats(reference_ms),
+        'candidate': latency_stats(candidate_ms)
+    }
+    if report['reference'] and report['candidate']:
+        report['speedup'] = report['reference']['mean_ms'] / report['candidate']['mean_ms']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a face detector variant against the fp32 reference")
+    parser.add_argument('inputs', nargs='+', help="recorded videos or directories (ideally not the calibration set)")
+    parser.add_argument('--reference', default='yolov8n-face.pt')
+    parser.add_argument('--reference-backend', default='ultralytics',
+                        choices=['ultralytics', 'onnxruntime', 'openvino'])
+    parser.add_argument('--candidate', default='yolov8n-face.int8.onnx')
+    parser.add_argument('--candidate-backend', default='onnxruntime',
+                        choices=['ultralytics', 'onnxruntime', 'openvino'])
+    parser.add_argument('--frames', type=int, default=300, help="frames sampled for the comparison")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--match-iou', type=float, default=0.5)
+    parser.add_argument('--threads', type=int, default=None, help="inference threads for the exported backends")
+    parser.add_argument('--output', default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    from face_detector import FaceDetector
+
+    check_edge_clipping()
+    videos = find_videos(args.inputs)
+    frames = sample_frames(videos, args.frames, args.seed)
+    if not frames:
+        print("Error: No frames to compare on")
+        return
+
+    reference = FaceDetector(args.reference, backend=args.reference_backend, threads=args.threads)
+    candidate = FaceDetector(args.candidate, backend=args.candidate_backend, threads=args.threads)
+    report = compare_detectors(reference, candidate, frames, args.match_iou)
+    report['reference']['model'] = args.reference
+    report['reference']['backend'] = args.reference_backend
+    report['candidate']['model'] = args.candidate
+    report['candidate']['backend'] = args.candidate_backend
+    for side in ('reference', 'candidate'):
+        path = report[side]['model']
+        if os.path.exists(path):
+            report[side]['size_mb'] = os.path.getsize(path) / 1e6
+
+    accuracy = report['accuracy']
+    print(f"{report['frames']} frames, {accuracy['reference_faces']} reference faces")
+    print(f"  recall {accuracy['recall']:.3f}  precision {accuracy['precision']:.3f}  "
+          f"mean IoU {accuracy['mean_iou']:.3f}  p5 IoU {accuracy['p5_iou']:.3f}")
+    for side in ('reference', 'candidate'):
+        stats = report[side]
+        print(f"  {side:>9}: {stats['mean_ms']:.2f}ms mean  {stats['p95_ms']:.2f}ms p95  "
+              f"{stats['fps']:.1f} fps  ({stats['model']}, {stats['backend']})")
+    if 'speedup' in report:
+        print(f"  speedup {report['speedup']:.2f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
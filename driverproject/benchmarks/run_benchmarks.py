@@ -0,0 +1,257 @@
+"""
+Reproducible benchmark suite for the drowsiness pipeline
+
+Replays recorded or synthetic videos through FaceDetector,
+FacialLandmarkDetector, DrowsinessDetector and the headless
+DrowsinessDetectionSystem loop. Every case runs in a fresh process so peak
+RSS and CPU time belong to that case alone. Runs offline on a CPU-only box.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --videos a.mp4 b.mp4 --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+from synthetic import make_synthetic_video
+
+CASES = ('face_detector', 'landmark_detector', 'drowsiness_detector', 'system')
+
+
+def iter_frames(videos, max_frames=None):
+    """Decode frames from every video in turn"""
+    count = 0
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        try:
+            while max_frames is None or count < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                count += 1
+                yield frame
+        finally:
+            cap.release()
+
+
+def time_calls(func, items, warmup=3):
+    """Call func on every item; returns per-call latencies in ms (warm-up calls excluded)"""
+    latencies = []
+    for index, item in enumerate(items):
+        start = time.perf_counter()
+        func(item)
+        if index >= warmup:
+            latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def bench_face_detector(videos, options):
+    from face_detector import FaceDetector
+    detector = FaceDetector(backend=options['face_backend'])
+    return {'latencies': time_calls(detector.detect_faces, iter_frames(videos, options['max_frames']))}
+
+
+def bench_landmark_detector(videos, options):
+    from landmark_detector import FacialLandmarkDetector
+    detector = FacialLandmarkDetector()
+    return {'latencies': time_calls(detector.detect_landmarks, iter_frames(videos, options['max_frames']))}
+
+
+def bench_drowsiness_detector(videos, options):
+    from drowsiness_detector import DrowsinessDetector
+    from bench_features import synthetic_points, split_regions
+    detector = DrowsinessDetector()
+    count = options['max_frames'] or 3000
+    faces = []
+    for points in synthetic_points(count, seed=options['seed']):
+        face = split_regions(points)
+        face['points'] = points
+        faces.append(face)
+    return {'latencies': time_calls(detector.detect_drowsiness, faces)}
+
+
+def bench_system(videos, options):
+    from main import DrowsinessDetectionSystem
+    with tempfile.TemporaryDirectory() as telemetry_dir:
+        system = DrowsinessDetectionSystem(headless=True, telemetry_dir=telemetry_dir,
+                                           profile_window=10**7, **options['system'])
+        for video in videos:
+            system.start_detection(source=video)
+    summary = system.profiler.summary()
+    frame = summary['stages'].get('frame', {})
+    return {'frames': frame.get('count', 0), 'stages': summary['stages'],
+            'latency_ms_from_profiler': frame}
+
+
+BENCHMARKS = {
+    'face_detector': bench_face_detector,
+    'landmark_detector': bench_landmark_detector,
+    'drowsiness_detector': bench_drowsiness_detector,
+    'system': bench_system
+}
+
+
+def _run_case(name, videos, options, queue):
+    """Child process body: run one case and report timings and resource use"""
+    try:
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        # 'face_detector:onnxruntime' runs the face_detector case on that backend
+        case, _, backend = name.partition(':')
+        if backend:
+            options = dict(options, face_backend=backend)
+        result = BENCHMARKS[case](videos, options)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        latencies = np.array(result.pop('latencies', []))
+        if len(latencies):
+            result['frames'] = len(latencies)
+            result['latency_ms'] = {
+                'mean': float(latencies.mean()),
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max())
+            }
+            result['fps'] = 1000.0 / float(latencies.mean())
+        elif 'latency_ms_from_profiler' in result:
+            frame = result.pop('latency_ms_from_profiler')
+            result['latency_ms'] = {key[:-3]: value for key, value in frame.items() if key.endswith('_ms')}
+            result['fps'] = 1000.0 / frame['mean_ms'] if frame.get('mean_ms') else 0.0
+
+        # ru_maxrss is in kilobytes on Linux
+        result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        result['wall_s'] = wall
+        result['cpu_s'] = cpu
+        result['cpu_percent'] = 100.0 * cpu / wall if wall > 0 else 0.0
+        queue.put(result)
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def run_case(name, videos, options):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(name, videos, options, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_DIR,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'commit': commit
+    }
+
+
+def compare(report, baseline):
+    """Print FPS and p95 changes against a previous report"""
+    print(f"\nComparison against {baseline['environment'].get('commit') or 'baseline'}:")
+    for name, result in report['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous or 'fps' not in previous or 'fps' not in result:
+            continue
+        fps_change = (result['fps'] / previous['fps'] - 1) * 100 if previous['fps'] else 0.0
+        p95, previous_p95 = result['latency_ms']['p95'], previous['latency_ms']['p95']
+        p95_change = (p95 / previous_p95 - 1) * 100 if previous_p95 else 0.0
+        print(f"{name:>20}: fps {previous['fps']:8.1f} -> {result['fps']:8.1f} ({fps_change:+.1f}%)  "
+              f"p95 {previous_p95:7.2f} -> {p95:7.2f} ms ({p95_change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drowsiness pipeline benchmark suite")
+    parser.add_argument('--videos', nargs='*', default=None,
+                        help="recorded videos or directories (default: synthetic videos)")
+    parser.add_argument('--synthetic', type=int, default=2, help="number of synthetic videos")
+    parser.add_argument('--synthetic-frames', type=int, default=300)
+    parser.add_argument('--cache-dir', default=os.path.join(BENCH_DIR, '.cache'))
+    parser.add_argument('--max-frames', type=int, default=None, help="frames per stage case")
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--track-interval', type=int, default=None)
+    parser.add_argument('--landmark-mode', choices=['crop', 'stable_roi', 'full_frame'], default='crop')
+    parser.add_argument('--face-backends', nargs='+', default=['ultralytics'],
+                        choices=['ultralytics', 'onnxruntime', 'openvino'],
+                        help="run the face detector case once per backend; the system case uses the first")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="write the JSON report here")
+    parser.add_argument('--compare', default=None, help="previous JSON report to compare with")
+    args = parser.parse_args()
+
+    if args.videos:
+        videos = []
+        for path in args.videos:
+            videos.extend(sorted(glob.glob(os.path.join(path, '*'))) if os.path.isdir(path) else [path])
+    else:
+        videos = [make_synthetic_video(
+            os.path.join(args.cache_dir, f"synthetic_{args.seed}_{i}_{args.synthetic_frames}.avi"),
+            frames=args.synthetic_frames, seed=args.seed * 100 + i) for i in range(args.synthetic)]
+
+    options = {
+        'max_frames': args.max_frames,
+        'seed': args.seed,
+        'face_backend': args.face_backends[0],
+        'system': {'track_interval': args.track_interval, 'landmark_mode': args.landmark_mode,
+                   'face_backend': args.face_backends[0]}
+    }
+
+    names = []
+    for case in args.cases:
+        if case == 'face_detector' and len(args.face_backends) > 1:
+            names.extend(f"face_detector:{backend}" for backend in args.face_backends)
+        else:
+            names.append(case)
+
+    report = {'environment': environment(), 'videos': videos, 'options': options, 'results': {}}
+    for name in names:
+        print(f"Running {name}...")
+        result = run_case(name, videos, options)
+        report['results'][name] = result
+        if 'error' in result:
+            print(f"  failed: {result['error']}")
+        else:
+            latency = result.get('latency_ms', {})
+            print(f"  {result.get('fps', 0.0):.1f} fps  p50 {latency.get('p50', 0.0):.2f}ms  "
+                  f"p95 {latency.get('p95', 0.0):.2f}ms  p99 {latency.get('p99', 0.0):.2f}ms  "
+                  f"peak RSS {result['peak_rss_mb']:.0f}MB  CPU {result['cpu_percent']:.0f}%")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Deterministic synthetic driver videos for offline benchmarks
+
+The frames show a cartoon face that drifts, nods and blinks over a noisy
+background. Real detectors may or may not find a face in them; they exist
+so that decode, resize and inference costs are reproducible without any
+recorded footage.
+"""
+import os
+import cv2
+import numpy as np
+
+
+def synthetic_frame(index, width=640, height=480, rng=None):
+    """Render frame number index of the synthetic sequence"""
+    rng = rng or np.random.default_rng(index)
+    frame = rng.integers(40, 80, size=(height, width, 3), dtype=np.uint8)
+
+    # Slow drift and nod of the head
+    cx = int(width / 2 + width * 0.08 * np.sin(index / 45.0))
+    cy = int(height / 2 + height * 0.05 * np.sin(index / 30.0))
+    face_w, face_h = width // 6, height // 4
+    cv2.ellipse(frame, (cx, cy), (face_w, face_h), 0, 0, 360, (140, 170, 210), -1)
+
+    # Eyes close for a few frames every couple of seconds
+    eye_open = 0 if index % 75 < 6 else max(3, face_h // 10)
+    for side in (-1, 1):
+        center = (cx + side * face_w // 2, cy - face_h // 4)
+        cv2.ellipse(frame, center, (face_w // 5, eye_open), 0, 0, 360, (40, 40, 40), -1)
+
+    # Mouth, opening wide now and then like a yawn
+    mouth_open = face_h // 4 if index % 300 < 40 else face_h // 20
+    cv2.ellipse(frame, (cx, cy + face_h // 2), (face_w // 3, mouth_open), 0, 0, 360, (60, 60, 150), -1)
+    return frame
+
+
+def make_synthetic_video(path, frames=300, width=640, height=480, fps=30.0, seed=0):
+    """Write the synthetic sequence to path unless the file already exists"""
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not create video writer for {path}")
+    try:
+        for index in range(frames):
+            rng = np.random.default_rng(seed * 1_000_003 + index)
+            writer.write(synthetic_frame(index, width, height, rng))
+    finally:
+        writer.release()
+    return path
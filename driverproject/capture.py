@@ -0,0 +1,314 @@
+import os
+import re
+import time
+import threading
+import cv2
+import numpy as np
+
+
+def is_live_source(source):
+    """Camera indices, stream URLs and synthetic sources are live; paths to existing files are recordings"""
+    return not (isinstance(source, str) and os.path.isfile(source))
+
+
+class FrameClock:
+    def __init__(self, cap, live, first_index=0):
+        """
+        Timestamps (seconds) for the frames read from cap
+
+        Live sources use the monotonic clock at grab time when cap reports it
+        (LatestFrameCapture, SyntheticCapture), else at read time. Recordings
+        use the frame's position in the file, so a replay gives the same
+        timing however fast it is processed.
+        first_index: index of the next frame when cap was seeked into a recording
+        """
+        self.cap = cap
+        self.live = live
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frames = first_index
+        self._last = None
+
+    def stamp(self):
+        """Call right after each successful read; Returns: the frame's timestamp"""
+        self.frames += 1
+        if self.live:
+            grabbed = getattr(self.cap, 'grab_time', None)
+            return time.monotonic() if grabbed is None else grabbed
+
+        # Container timestamps when the backend reports them; where they stall
+        # or step back, continue one frame period after the last timestamp so
+        # the sequence stays on the container's timebase
+        timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if self._last is not None and timestamp <= self._last:
+            timestamp = self._last + 1.0 / self.fps
+        self._last = timestamp
+        return timestamp
+
+
+def configure_camera(cap, fourcc=None, width=None, height=None, fps=None, buffer_size=1):
+    """
+    Request a camera format; drivers silently ignore what they do not support
+    fourcc: 'MJPG' (compressed, full rate at high resolutions over USB 2) or
+            'YUYV' (uncompressed, no decode cost but often capped at low FPS)
+    buffer_size: frames the driver may queue; 1 keeps stale frames out
+    Returns: Dictionary of the settings the driver actually reports
+    """
+    # FOURCC first: the available sizes and rates depend on it
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    if buffer_size:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+    code = int(cap.get(cv2.CAP_PROP_FOURCC))
+    actual = {
+        'fourcc': "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00') or None,
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'fps': cap.get(cv2.CAP_PROP_FPS),
+        'buffer_size': int(cap.get(cv2.CAP_PROP_BUFFERSIZE))
+    }
+    requested = {'fourcc': fourcc, 'width': width, 'height': height, 'fps': fps,
+                 'buffer_size': buffer_size}
+    for key, value in requested.items():
+        # Backends that cannot report a property return 0
+        if value and actual[key] and actual[key] != value:
+            print(f"Warning: camera {key} {value} requested, driver uses {actual[key]}")
+    return actual
+
+
+class SyntheticCapture:
+    def __init__(self, width=640, height=480, fps=30.0, frames=None):
+        """
+        Generated frames at a real-time rate behind the VideoCapture interface,
+        for testing the capture path and measuring latency without a camera
+        frames: end after this many frames (default: never)
+        """
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = frames
+        self.index = 0
+        self.grab_time = None
+        self._next = time.monotonic()
+        self._grabbed = None
+        self._released = False
+
+    def isOpened(self):
+        return not self._released
+
+    def grab(self):
+        if self._released or (self.frames is not None and self.index >= self.frames):
+            return False
+        # Like a camera, a frame is only available once per frame interval
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + 1.0 / self.fps, time.monotonic())
+        self.grab_time = time.monotonic()
+        self._grabbed = self.index
+        self.index += 1
+        return True
+
+    def retrieve(self, image=None):
+        if self._grabbed is None:
+            return False, None
+        if image is None or image.shape != (self.height, self.width, 3):
+            image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        image[:] = 64
+        # A moving bright block makes dropped or repeated frames visible
+        x = int((self._grabbed * 8) % max(self.width - 40, 1))
+        image[self.height // 2 - 20:self.height // 2 + 20, x:x + 40] = 255
+        cv2.putText(image, str(self._grabbed), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                    (0, 255, 0), 2)
+        return True, image
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.index
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.index * 1000.0 / self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.frames or 0
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._released = True
+
+
+class LatestFrameCapture:
+    def __init__(self, cap, realtime_fps=None, reuse_buffers=False):
+        """
+        Grab frames from cap on a background thread and keep only the newest
+
+        grab() is timed on its own, so every frame is stamped when it left the
+        driver, before it is decoded; read() returns the newest frame not yet
+        returned, never a stale buffered one. Frames replaced before they were
+        read are counted as dropped.
+        realtime_fps: pace a recording at this rate, like a live camera
+        reuse_buffers: retrieve into two alternating buffers and hand frames
+                       out as copies into the caller's (or one returned) buffer
+        """
+        self.cap = cap
+        self.grab_time = None
+        self.captured = 0
+        self.dropped = 0
+        self.reuse_buffers = reuse_buffers
+        self._out = None
+        self._interval = 1.0 / realtime_fps if realtime_fps else 0.0
+        self._latest = None  # (frame, grab time, position ms, position frames)
+        self._position = (0.0, 0.0)
+        self._ended = False
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._grab_loop, name='capture-grab', daemon=True)
+        self._thread.start()
+
+    def _grab_loop(self):
+        next_grab = time.monotonic()
+        buffers = [None, None]
+        write = 0
+        try:
+            while not self._stop.is_set():
+                if self._interval:
+                    delay = next_grab - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_grab += self._interval
+                if not self.cap.grab():
+                    break
+                grabbed = getattr(self.cap, 'grab_time', None) or time.monotonic()
+                if self.reuse_buffers:
+                    # The other buffer may be waiting in the latest slot
+                    ret, frame = self.cap.retrieve(buffers[write])
+                    buffers[write] = frame
+                    write ^= 1
+                else:
+                    ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                position = (self.cap.get(cv2.CAP_PROP_POS_MSEC), self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+                with self._cond:
+                    if self._latest is not None:
+                        self.dropped += 1
+                    self._latest = (frame, grabbed, position)
+                    self.captured += 1
+                    self._cond.notify()
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify_all()
+
+    def _take(self, image=None, copy=True):
+        with self._cond:
+            while self._latest is None and not self._ended:
+                self._cond.wait()
+            item, self._latest = self._latest, None
+            if item is None:
+                return None
+            frame, self.grab_time, self._position = item
+            if not copy or (image is None and not self.reuse_buffers):
+                return frame
+            # Copy while holding the lock: in reuse mode the grab thread
+            # overwrites this buffer two frames later
+            if image is None or image.shape != frame.shape:
+                if self._out is None or self._out.shape != frame.shape:
+                    self._out = np.empty_like(frame)
+                image = self._out
+            np.copyto(image, frame)
+            return image
+
+    def read(self, image=None):
+        """Wait for a frame newer than the last one returned; Returns: (ret, frame)"""
+        frame = self._take(image)
+        if frame is None:
+            return False, None
+        return True, frame
+
+    def grab(self):
+        """Skip the newest frame without copying it"""
+        return self._take(copy=False) is not None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        # Position of the last returned frame, not of the grab thread
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self._position[0]
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self._position[1]
+        return self.cap.get(prop)
+
+    def stats(self):
+        return {'captured': self.captured, 'dropped': self.dropped}
+
+    def release(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.cap.release()
+
+
+def _parse_synthetic(source):
+    """'synthetic' or 'synthetic:640x480@30' -> (width, height, fps)"""
+    match = re.fullmatch(r'synthetic(?::(\d+)x(\d+))?(?:@([\d.]+))?', source)
+    if not match:
+        raise ValueError(f"Invalid synthetic source: {source}")
+    width, height, fps = match.groups()
+    return int(width or 640), int(height or 480), float(fps or 30.0)
+
+
+def open_source(source, fourcc=None, width=None, height=None, fps=None, buffer_size=1,
+                latest=True, realtime=False, reuse_buffers=False):
+    """
+    Open a camera, stream, recording or synthetic source behind one interface
+    source: camera index, stream URL, video file or 'synthetic[:WxH][@FPS]'
+    fourcc, width, height, fps, buffer_size: camera format, see configure_camera
+    latest: grab live sources on a background thread and keep only the newest
+            frame, see LatestFrameCapture; recordings are read in order
+    realtime: also pace a recording at its FPS on the grab thread, dropping
+              the frames processing cannot keep up with, like a camera
+    reuse_buffers: let the grab thread decode into preallocated buffers, see
+                   LatestFrameCapture
+    Returns: capture object with the cv2.VideoCapture read/grab/get/release
+             interface, or None if the source cannot be opened
+    """
+    if isinstance(source, str) and source.startswith('synthetic'):
+        synthetic_width, synthetic_height, synthetic_fps = _parse_synthetic(source)
+        cap = SyntheticCapture(width or synthetic_width, height or synthetic_height,
+                               fps or synthetic_fps)
+        return LatestFrameCapture(cap, reuse_buffers=reuse_buffers) if latest else cap
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        return None
+    if not is_live_source(source):
+        if realtime:
+            return LatestFrameCapture(cap, realtime_fps=cap.get(cv2.CAP_PROP_FPS) or 30.0,
+                                      reuse_buffers=reuse_buffers)
+        return cap
+
+    settings = configure_camera(cap, fourcc=fourcc, width=width, height=height, fps=fps,
+                                buffer_size=buffer_size)
+    print(f"Camera: {settings['fourcc'] or 'default format'} {settings['width']}x{settings['height']} "
+          f"@ {settings['fps']:.0f} fps, driver buffer {settings['buffer_size'] or 'default'}")
+    return LatestFrameCapture(cap, reuse_buffers=reuse_buffers) if latest else cap
@@ -0,0 +1,99 @@
+"""
+Pre-warmed detection daemon
+
+Keeps a DrowsinessDetectionSystem with its models loaded between driver
+sessions, so a new session starts on the first frame instead of after the
+model load. Sessions are started and stopped over a local TCP socket with
+one JSON command per line:
+
+    {"command": "start", "source": "0", "pipelined": false}
+    {"command": "stop"}      stop the running session, or the next queued one
+    {"command": "status"}
+    {"command": "quit"}      stop and exit the daemon
+
+Every command is answered with one JSON line. Sessions run on the daemon's
+main thread (OpenCV windows need it); the socket is served on a thread.
+Usage: python main.py --daemon --daemon-port 8765
+"""
+import json
+import queue
+import threading
+import socketserver
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.daemon.handle_command(json.loads(line))
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+class _CommandServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class DetectionDaemon:
+    def __init__(self, system, host='127.0.0.1', port=8765):
+        """system: DrowsinessDetectionSystem with its models already loaded"""
+        if system.processor is None:
+            raise ValueError("The daemon needs a system with loaded models")
+        self.system = system
+        self.address = (host, port)
+        self.sessions = 0
+        self.running = None  # source of the running session
+        self._sessions = queue.Queue()
+        self._quit = False
+        self._server = None
+
+    def handle_command(self, message):
+        """Called on the socket thread; Returns: reply dictionary"""
+        command = message.get('command')
+        if command == 'start':
+            source = str(message.get('source', '0'))
+            self._sessions.put({'source': int(source) if source.isdigit() else source,
+                                'pipelined': bool(message.get('pipelined', False)),
+                                'csv_path': message.get('csv_path')})
+            return {'ok': True, 'queued': self._sessions.qsize()}
+        if command == 'stop':
+            # Stops the running session, or the next queued one as soon as it starts
+            if self.running is None and not self._sessions.qsize():
+                return {'ok': True, 'stopped': None}
+            self.system.stop_requested.set()
+            return {'ok': True, 'stopped': self.running}
+        if command == 'status':
+            return {'ok': True, 'running': self.running, 'sessions': self.sessions,
+                    'queued': self._sessions.qsize(), 'startup': self.system.startup.summary()}
+        if command == 'quit':
+            self._quit = True
+            self.system.stop_requested.set()
+            self._sessions.put(None)
+            return {'ok': True}
+        return {'ok': False, 'error': f"Unknown command: {command}"}
+
+    def serve(self):
+        """Run sessions as they are requested until 'quit' or Ctrl+C"""
+        self._server = _CommandServer(self.address, _CommandHandler)
+        self._server.daemon = self
+        thread = threading.Thread(target=self._server.serve_forever, name='daemon', daemon=True)
+        thread.start()
+        print(f"Detection daemon ready on {self.address[0]}:{self.address[1]}")
+        try:
+            while True:
+                session = self._sessions.get()
+                if session is None or self._quit:
+                    break
+                self.running = session['source']
+                try:
+                    self.system.start_detection(**session)
+                finally:
+                    self.running = None
+                    self.sessions += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
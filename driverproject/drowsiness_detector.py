@@ -1,6 +1,74 @@
 import numpy as np
-from scipy.spatial import distance
 import time
+from feature_engine import FeatureEngine
+
+# Landmark regions used by the feature kernel, in the packed order of the
+# 'points' array produced by FacialLandmarkDetector
+FEATURE_REGIONS = ('left_eye', 'right_eye', 'mouth', 'nose', 'left_ear', 'right_ear')
+
+# Point pairs (into the packed array) for the vertical A, vertical B and
+# horizontal C distances of the left eye, right eye and mouth
+_PAIR_FROM = np.array([1, 2, 0, 7, 8, 6, 13, 15, 12])
+_PAIR_TO = np.array([5, 4, 3, 11, 10, 9, 19, 17, 16])
+_NOSE, _LEFT_EAR, _RIGHT_EAR = 20, 21, 22
+
+
+def compute_point_features(points):
+    """
+    Vectorized EAR, MAR and head pose for a batch of faces or frames
+    points: packed (B, 23, D) landmark array, or (23, D) for a single face
+    Returns: Dictionary of (B,) float64 arrays: left_ear, right_ear, ear, mar,
+             head_tilt and head_elevation
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim == 2:
+        points = points[np.newaxis]
+    
+    # All nine distances in one gather: (B, 3 ratios, [A, B, C])
+    diff = points[:, _PAIR_FROM] - points[:, _PAIR_TO]
+    dist = np.sqrt(np.einsum('bkd,bkd->bk', diff, diff)).reshape(-1, 3, 3)
+    numerator = dist[:, :, 0] + dist[:, :, 1]
+    denominator = 2.0 * dist[:, :, 2]
+    ratios = np.zeros_like(numerator)
+    np.divide(numerator, denominator, out=ratios, where=denominator > 0)
+    
+    # Head tilt from the ear line, elevation of the nose below the ear center
+    left_ear, right_ear = points[:, _LEFT_EAR], points[:, _RIGHT_EAR]
+    head_tilt = np.degrees(np.arctan2(right_ear[:, 1] - left_ear[:, 1],
+                                      right_ear[:, 0] - left_ear[:, 0]))
+    head_elevation = points[:, _NOSE, 1] - (left_ear[:, 1] + right_ear[:, 1]) / 2.0
+    
+    return {
+        'left_ear': ratios[:, 0],
+        'right_ear': ratios[:, 1],
+        'ear': (ratios[:, 0] + ratios[:, 1]) / 2.0,
+        'mar': ratios[:, 2],
+        'head_tilt': head_tilt,
+        'head_elevation': head_elevation
+    }
+
+
+def compute_features(left_eye, right_eye, mouth, nose, left_ear, right_ear):
+    """
+    Vectorized EAR, MAR and head pose from separate region arrays
+    Each argument is a stacked (B, K, D) landmark array, or (K, D) for one face
+    Returns: Same dictionary as compute_point_features
+    """
+    regions = [np.asarray(r, dtype=np.float64)
+               for r in (left_eye, right_eye, mouth, nose, left_ear, right_ear)]
+    return compute_point_features(np.concatenate(regions, axis=-2))
+
+
+def stack_landmarks(landmark_stream):
+    """
+    Stack per-frame landmark dictionaries into one packed (B, 23, D) array,
+    e.g. to recompute features over a recorded landmark stream
+    """
+    return np.stack([
+        landmarks['points'] if 'points' in landmarks
+        else np.concatenate([np.asarray(landmarks[r]) for r in FEATURE_REGIONS])
+        for landmarks in landmark_stream])
+
 
 class DrowsinessDetector:
     def __init__(self, 
@@ -8,20 +76,41 @@ class DrowsinessDetector:
                  mar_threshold=0.35, 
                  head_tilt_threshold=20,
                  consecutive_frames=20,
-                 drowsy_time=1.0):
-        """Initialize drowsiness detector with thresholds"""
+                 drowsy_time=1.0,
+                 perclos_windows=(60.0,),
+                 perclos_threshold=None):
+        """
+        Initialize drowsiness detector with thresholds
+        perclos_windows: PERCLOS windows in seconds, see FeatureEngine
+        perclos_threshold: also report drowsiness when PERCLOS over the first
+                           window reaches this fraction (e.g. 0.15)
+        """
         self.ear_threshold = ear_threshold
         self.mar_threshold = mar_threshold
         self.head_tilt_threshold = head_tilt_threshold
         self.consecutive_frames = consecutive_frames
         self.drowsy_time = drowsy_time
+        self.perclos_threshold = perclos_threshold
         
         self.frame_counter = 0
         self.drowsy_start = None
         
+        # Smoothed EAR, PERCLOS, blinks and yawns of the latest frame
+        self.engine = FeatureEngine(ear_threshold, mar_threshold, perclos_windows=perclos_windows)
+        self.features = {}
+        
+    def reset(self):
+        """Clear all temporal state, e.g. before a new video"""
+        self.frame_counter = 0
+        self.drowsy_start = None
+        self.engine.reset()
+        self.features = {}
+        
     def calculate_ear(self, eye_points):
-        """Calculate Eye Aspect Ratio"""
+        """Calculate Eye Aspect Ratio from a (6, 2) or (6, 3) point array"""
+        from scipy.spatial import distance  # deferred: only this scalar reference path needs scipy
         try:
+            eye_points = np.asarray(eye_points, dtype=np.float64)
             # Vertical distances
             A = distance.euclidean(eye_points[1], eye_points[5])
             B = distance.euclidean(eye_points[2], eye_points[4])
@@ -36,8 +125,10 @@ class DrowsinessDetector:
             return 0.0
         
     def calculate_mar(self, mouth_points):
-        """Calculate Mouth Aspect Ratio"""
+        """Calculate Mouth Aspect Ratio from an (8, 2) or (8, 3) point array"""
+        from scipy.spatial import distance  # deferred: only this scalar reference path needs scipy
         try:
+            mouth_points = np.asarray(mouth_points, dtype=np.float64)
             # Vertical distances
             A = distance.euclidean(mouth_points[1], mouth_points[7])
             B = distance.euclidean(mouth_points[3], mouth_points[5])
@@ -57,48 +148,56 @@ class DrowsinessDetector:
             # Calculate head tilt
             dx = right_ear[0][0] - left_ear[0][0]
             dy = right_ear[0][1] - left_ear[0][1]
-            angle = np.degrees(np.arctan2(dy, dx))
+            angle = float(np.degrees(np.arctan2(dy, dx)))
             
             # Calculate head elevation
-            ear_center = ((left_ear[0][0] + right_ear[0][0]) // 2, (left_ear[0][1] + right_ear[0][1]) // 2)
-            elevation = nose[0][1] - ear_center[1]
+            ear_center = ((left_ear[0][0] + right_ear[0][0]) / 2.0, (left_ear[0][1] + right_ear[0][1]) / 2.0)
+            elevation = float(nose[0][1] - ear_center[1])
             
             return angle, elevation
         except Exception as e:
             print(f"Error calculating head pose: {e}")
             return 0, 0
         
-    def detect_drowsiness(self, landmarks):
-        """Detect drowsiness based on facial landmarks"""
+    def detect_drowsiness(self, landmarks, timestamp=None):
+        """
+        Detect drowsiness based on facial landmarks
+        timestamp: capture time of the frame in seconds; None uses the
+                   monotonic clock, which is only right for live frames
+        """
         if not landmarks:
             return False, 0, 0, 0, 0
         
         try:
-            # Calculate average EAR
-            left_ear = self.calculate_ear(landmarks['left_eye'])
-            right_ear = self.calculate_ear(landmarks['right_eye'])
-            ear = (left_ear + right_ear) / 2.0
-            
-            # Calculate MAR
-            mar = self.calculate_mar(landmarks['mouth'])
-            
-            # Calculate head pose
-            head_tilt, head_elevation = self.calculate_head_pose(
-                landmarks['nose'], landmarks['left_ear'], landmarks['right_ear'])
+            # EAR, MAR and head pose in one vectorized pass
+            if 'points' in landmarks:
+                features = compute_point_features(landmarks['points'])
+            else:
+                features = compute_features(*(landmarks[r] for r in FEATURE_REGIONS))
+            ear = float(features['ear'][0])
+            mar = float(features['mar'][0])
+            head_tilt = float(features['head_tilt'][0])
+            head_elevation = float(features['head_elevation'][0])
+            if timestamp is None:
+                timestamp = time.monotonic()
+            self.features = self.engine.update(ear, mar, timestamp)
             
             # Check for drowsiness
             if ear < self.ear_threshold or abs(head_tilt) > self.head_tilt_threshold:
                 self.frame_counter += 1
                 if self.drowsy_start is None:
-                    self.drowsy_start = time.time()
+                    self.drowsy_start = timestamp
             else:
                 self.frame_counter = 0
                 self.drowsy_start = None
             
             # Detect drowsiness if eyes are closed or head is tilted for sufficient frames
             is_drowsy = False
-            if self.drowsy_start and (time.time() - self.drowsy_start) > self.drowsy_time:
+            if self.drowsy_start is not None and timestamp - self.drowsy_start > self.drowsy_time:
                 is_drowsy = True
+            if self.perclos_threshold is not None:
+                perclos = self.features['perclos'][self.engine.perclos_windows[0]]
+                is_drowsy = is_drowsy or perclos >= self.perclos_threshold
             
             return is_drowsy, ear, mar, head_tilt, head_elevation
             
@@ -0,0 +1,267 @@
+import os
+import shutil
+import tempfile
+import cv2
+import numpy as np
+
+BACKENDS = ('ultralytics', 'onnxruntime', 'openvino')
+
+
+def letterbox(image, size=640, color=(114, 114, 114)):
+    """
+    Resize image to fit a size x size square keeping its aspect ratio and pad the rest
+    Returns: (padded image, scale, (pad_x, pad_y))
+    """
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    padded = cv2.copyMakeBorder(image, pad_y, size - new_h - pad_y, pad_x, size - new_w - pad_x,
+                                cv2.BORDER_CONSTANT, value=color)
+    return padded, scale, (pad_x, pad_y)
+
+
+def make_blob(frame, imgsz=640, out=None):
+    """
+    Letterbox a BGR frame into a (1, 3, imgsz, imgsz) float32 RGB blob in [0, 1]
+    out: optional preallocated blob to write into
+    Returns: (blob, scale, (pad_x, pad_y))
+    """
+    padded, scale, pad = letterbox(frame, imgsz)
+    rgb = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB)
+    if out is None:
+        out = np.empty((1, 3, imgsz, imgsz), dtype=np.float32)
+    # HWC uint8 -> NCHW float32
+    np.multiply(rgb.transpose(2, 0, 1), 1.0 / 255.0, out=out[0], casting='unsafe')
+    return out, scale, pad
+
+
+def box_iou(a, b):
+    """
+    Pairwise IoU between (N, 4) and (M, 4) xyxy boxes
+    Returns: (N, M) array
+    """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def nms(boxes, scores, iou_threshold=0.45):
+    """
+    Greedy non-maximum suppression on (N, 4) xyxy boxes
+    Returns: Indices of the kept boxes, highest score first
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_yolov8(output, conf=0.5, iou=0.7, num_classes=1):
+    """
+    Decode a raw YOLOv8 head output of shape (1, 4 + num_classes [+ keypoints], N)
+    Returns: (M, 5) array of x1, y1, x2, y2, score in network input pixels
+    """
+    predictions = output[0]
+    scores = predictions[4:4 + num_classes].max(axis=0)
+    mask = scores >= conf
+    if not mask.any():
+        return np.empty((0, 5), dtype=np.float32)
+
+    cx, cy, w, h = predictions[:4, mask]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    scores = scores[mask]
+    keep = nms(boxes, scores, iou)
+    return np.concatenate([boxes[keep], scores[keep, None]], axis=1).astype(np.float32)
+
+
+def export_onnx(model_path, imgsz=640, batch=1):
+    """
+    Export a YOLO .pt model to ONNX once (needs ultralytics), next to the .pt file
+    The exported input shape is static, so sizes other than 640 and batches
+    larger than 1 get their own file
+    Returns: Path of the .onnx file
+    """
+    base = os.path.splitext(model_path)[0]
+    if imgsz != 640:
+        base += f"-{imgsz}"
+    if batch > 1:
+        base += f"-b{batch}"
+    onnx_path = base + '.onnx'
+    if not os.path.exists(onnx_path):
+        from ultralytics import YOLO
+        print(f"Exporting {model_path} to ONNX at {imgsz}px, batch {batch}...")
+        # ultralytics writes <name>.onnx next to the weights; export from a copy so
+        # exports at other sizes never overwrite each other
+        with tempfile.TemporaryDirectory() as directory:
+            weights = shutil.copy(model_path, directory)
+            exported = YOLO(weights).export(format='onnx', imgsz=imgsz, batch=batch,
+                                            dynamic=False, simplify=True)
+            shutil.move(exported, onnx_path)
+    return onnx_path
+
+
+class UltralyticsBackend:
+    # Input size can change between calls
+    fixed_shape = False
+
+    def __init__(self, model_path, imgsz=640):
+        """Reference PyTorch path through ultralytics"""
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+
+    def detect(self, frame, conf=0.5, iou=0.7):
+        """Returns: (M, 5) array of x1, y1, x2, y2, score in frame pixels"""
+        results = self.model(frame, conf=conf, iou=iou, imgsz=self.imgsz, verbose=False)
+        boxes = results[0].boxes
+        if boxes is None or len(boxes) == 0:
+            return np.empty((0, 5), dtype=np.float32)
+        xyxy = boxes.xyxy.cpu().numpy()
+        scores = boxes.conf.cpu().numpy()
+        return np.concatenate([xyxy, scores[:, None]], axis=1).astype(np.float32)
+
+    def detect_batch(self, frames, conf=0.5, iou=0.7):
+        """One batched forward pass over a list of frames; Returns: List of (M, 5) arrays"""
+        detections = []
+        for result in self.model(list(frames), conf=conf, iou=iou, imgsz=self.imgsz, verbose=False):
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                detections.append(np.empty((0, 5), dtype=np.float32))
+                continue
+            xyxy = boxes.xyxy.cpu().numpy()
+            scores = boxes.conf.cpu().numpy()
+            detections.append(np.concatenate([xyxy, scores[:, None]], axis=1).astype(np.float32))
+        return detections
+
+
+class _ExportedBackend:
+    """Shared letterbox preprocessing and NumPy post-processing for exported models"""
+    # Exported models have a static input shape, one model per imgsz
+    fixed_shape = True
+
+    # Batch size baked into the model, None when the batch dimension is dynamic
+    max_batch = 1
+
+    def __init__(self, imgsz=640):
+        self.imgsz = imgsz
+        self._input = np.empty((1, 3, imgsz, imgsz), dtype=np.float32)
+        self._batch_input = None
+
+    def preprocess(self, frame):
+        return make_blob(frame, self.imgsz, out=self._input)
+
+    def postprocess(self, output, scale, pad, frame_shape, conf, iou):
+        detections = decode_yolov8(output, conf, iou)
+        if len(detections):
+            detections[:, [0, 2]] = (detections[:, [0, 2]] - pad[0]) / scale
+            detections[:, [1, 3]] = (detections[:, [1, 3]] - pad[1]) / scale
+            h, w = frame_shape[:2]
+            # Fancy indexing copies, so clip into the columns by assignment
+            detections[:, [0, 2]] = np.clip(detections[:, [0, 2]], 0, w)
+            detections[:, [1, 3]] = np.clip(detections[:, [1, 3]], 0, h)
+        return detections
+
+    def detect(self, frame, conf=0.5, iou=0.7):
+        """Returns: (M, 5) array of x1, y1, x2, y2, score in frame pixels"""
+        blob, scale, pad = self.preprocess(frame)
+        output = self.infer(blob)
+        return self.postprocess(output, scale, pad, frame.shape, conf, iou)
+
+    def detect_batch(self, frames, conf=0.5, iou=0.7):
+        """
+        Run frames through the model max_batch at a time (one at a time for
+        batch-1 exports); a static batch is zero-padded when frames run out
+        Returns: List of (M, 5) arrays
+        """
+        if self.max_batch == 1:
+            return [self.detect(frame, conf, iou) for frame in frames]
+
+        step = self.max_batch or len(frames)
+        detections = []
+        for start in range(0, len(frames), step):
+            chunk = frames[start:start + step]
+            size = step if self.max_batch else len(chunk)
+            if self._batch_input is None or len(self._batch_input) != size:
+                self._batch_input = np.zeros((size, 3, self.imgsz, self.imgsz), dtype=np.float32)
+            letterboxes = []
+            for i, frame in enumerate(chunk):
+                _, scale, pad = make_blob(frame, self.imgsz, out=self._batch_input[i:i + 1])
+                letterboxes.append((scale, pad))
+            # The reused input still holds the previous call's frames in the unused slots
+            self._batch_input[len(chunk):] = 0
+            output = self.infer(self._batch_input)
+            for i, (frame, (scale, pad)) in enumerate(zip(chunk, letterboxes)):
+                detections.append(self.postprocess(output[i:i + 1], scale, pad, frame.shape, conf, iou))
+        return detections
+
+
+class OnnxRuntimeBackend(_ExportedBackend):
+    def __init__(self, onnx_path, imgsz=640, threads=None):
+        """ONNX Runtime on the CPU execution provider"""
+        super().__init__(imgsz)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.max_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+    def infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVINOBackend(_ExportedBackend):
+    def __init__(self, model_path, imgsz=640, threads=None):
+        """OpenVINO on CPU; model_path may be an .onnx or an OpenVINO .xml file"""
+        super().__init__(imgsz)
+        import openvino as ov
+        core = ov.Core()
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if threads:
+            config['INFERENCE_NUM_THREADS'] = threads
+        self.model = core.compile_model(core.read_model(model_path), 'CPU', config)
+        self.output = self.model.output(0)
+        batch = self.model.input(0).get_partial_shape()[0]
+        self.max_batch = batch.get_length() if batch.is_static else None
+
+    def infer(self, blob):
+        return self.model(blob)[self.output]
+
+
+def create_backend(name, model_path, imgsz=640, threads=None, batch=1):
+    """
+    Build a face detection backend by name
+    For exported backends a .pt model_path is exported to ONNX on first use,
+    with a static batch of batch frames for detect_batch
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown face detection backend: {name}")
+    if name == 'ultralytics':
+        return UltralyticsBackend(model_path, imgsz)
+
+    if model_path.endswith('.pt'):
+        model_path = export_onnx(model_path, imgsz, batch)
+    if name == 'onnxruntime':
+        return OnnxRuntimeBackend(model_path, imgsz, threads)
+    return OpenVINOBackend(model_path, imgsz, threads)
@@ -1,15 +1,42 @@
 import cv2
-import torch
-from ultralytics import YOLO
+import numpy as np
+from face_backends import create_backend
 
 class FaceDetector:
-    def __init__(self, model_path='yolov8n-face.pt'):
-        """Initialize YOLO face detector"""
+    def __init__(self, model_path='yolov8n-face.pt', backend='ultralytics', imgsz=640,
+                 conf=0.5, iou=0.7, threads=None, batch=1):
+        """
+        Initialize YOLO face detector
+        backend: 'ultralytics' (PyTorch reference), 'onnxruntime' or 'openvino';
+                 the exported backends convert model_path to ONNX on first use
+        imgsz: inference resolution; larger frames are downscaled so their
+               long side is imgsz before detection and boxes are scaled back
+        batch: frames per forward pass of detect_faces_batch for exported backends
+        """
+        self.backend_name = backend
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
         try:
-            self.model = YOLO(model_path)
+            self.backend = create_backend(backend, model_path, imgsz=imgsz, threads=threads,
+                                          batch=batch)
         except Exception as e:
             print(f"Error loading YOLO model: {e}")
             raise
+    
+    @property
+    def fixed_shape(self):
+        """True if the backend only runs at the imgsz it was built for"""
+        return self.backend.fixed_shape
+    
+    def set_imgsz(self, imgsz):
+        """Change the inference resolution (backends without a fixed shape only)"""
+        if imgsz == self.imgsz:
+            return
+        if self.fixed_shape:
+            raise ValueError(f"The {self.backend_name} backend has a fixed {self.imgsz}px input")
+        self.imgsz = imgsz
+        self.backend.imgsz = imgsz
         
     def detect_faces(self, frame):
         """
@@ -17,19 +44,196 @@ class FaceDetector:
         Returns: List of face bounding boxes
         """
         try:
-            results = self.model(frame, conf=0.5)  # Run inference
-            faces = []
-            
-            if results[0].boxes:
-                for box in results[0].boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    faces.append({
-                        'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                        'confidence': float(confidence)
-                    })
-            
-            return faces
+            frame, scale = self._downscale(frame)
+            detections = self.backend.detect(frame, conf=self.conf, iou=self.iou)  # Run inference
+            return self._to_faces(detections, scale)
         except Exception as e:
             print(f"Error in face detection: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def detect_faces_batch(self, frames):
+        """
+        Detect faces in several frames (e.g. one per camera) with batched inference
+        Returns: One list of face bounding boxes per frame
+        """
+        try:
+            downscaled = [self._downscale(frame) for frame in frames]
+            batch = self.backend.detect_batch([frame for frame, _ in downscaled],
+                                              conf=self.conf, iou=self.iou)
+            return [self._to_faces(detections, scale)
+                    for detections, (_, scale) in zip(batch, downscaled)]
+        except Exception as e:
+            print(f"Error in batched face detection: {e}")
+            return [[] for _ in frames]
+    
+    def _downscale(self, frame):
+        """Downscale once here (INTER_AREA) instead of letting the backend resize the full frame"""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.imgsz / max(h, w))
+        if scale < 1.0:
+            frame = cv2.resize(frame, (round(w * scale), round(h * scale)),
+                               interpolation=cv2.INTER_AREA)
+        return frame, scale
+    
+    @staticmethod
+    def _to_faces(detections, scale):
+        if scale < 1.0:
+            detections[:, :4] /= scale
+        faces = []
+        for x1, y1, x2, y2, confidence in detections:
+            faces.append({
+                'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                'confidence': float(confidence)
+            })
+        return faces
+
+class TrackingFaceDetector:
+    def __init__(self, detector, detect_interval=10, tracker='landmarks'):
+        """
+        Run the full face detector only every detect_interval frames and
+        propagate the face boxes cheaply in between
+
+        tracker: 'landmarks' shifts the previous box by the movement of the
+                 landmarks reported through update_track(), 'opencv' uses a
+                 lightweight OpenCV tracker (KCF/MOSSE) per face
+        """
+        if tracker not in ('landmarks', 'opencv'):
+            raise ValueError(f"Unknown tracker type: {tracker}")
+        self.detector = detector
+        self.detect_interval = max(1, int(detect_interval))
+        self.tracker = tracker
+        
+        self._faces = []
+        self._trackers = []
+        self._centers = []
+        self._frames_since_detection = 0
+        self._force_detection = True
+        self._frame_shape = None
+        
+        # Statistics
+        self.frames = 0
+        self.full_detections = 0
+        self.fallback_detections = 0
+        
+    def detect_faces(self, frame):
+        """
+        Detect or track faces in frame
+        Returns: List of face bounding boxes, same format as FaceDetector
+        """
+        self.frames += 1
+        self._frame_shape = frame.shape[:2]
+        
+        if self._needs_detection():
+            return self._run_detection(frame)
+        
+        if self.tracker == 'opencv':
+            faces = self._track_opencv(frame)
+            if faces is None:
+                # Tracking lost, fall back to a full detection on this frame
+                self.fallback_detections += 1
+                return self._run_detection(frame)
+            self._faces = faces
+        
+        self._frames_since_detection += 1
+        return [dict(face) for face in self._faces]
+    
+    def update_track(self, face_index, points):
+        """
+        Feed back landmark points (full-frame pixel coordinates) for a face
+        returned by the last detect_faces call; None means landmarks were lost
+        """
+        if face_index >= len(self._faces):
+            return
+        
+        if points is None or len(points) == 0:
+            # Losing the landmarks means the box no longer holds a face
+            if not self._force_detection and self._frames_since_detection > 0:
+                self.fallback_detections += 1
+            self._force_detection = True
+            return
+        
+        if self.tracker != 'landmarks':
+            return
+        
+        center = np.asarray(points, dtype=np.float32)[:, :2].mean(axis=0)
+        previous = self._centers[face_index]
+        self._centers[face_index] = center
+        if previous is None:
+            return
+        
+        dx, dy = center - previous
+        x1, y1, x2, y2 = self._faces[face_index]['bbox']
+        self._faces[face_index]['bbox'] = self._clip_bbox(
+            [int(round(x1 + dx)), int(round(y1 + dy)), int(round(x2 + dx)), int(round(y2 + dy))])
+    
+    def reset(self):
+        """Start over for a new stream: full detection on the next frame, statistics cleared"""
+        self._force_detection = True
+        self.frames = 0
+        self.full_detections = 0
+        self.fallback_detections = 0
+    
+    def stats(self):
+        """Returns: Dictionary with detection and fallback counts"""
+        return {
+            'frames': self.frames,
+            'full_detections': self.full_detections,
+            'fallback_detections': self.fallback_detections,
+            'detection_rate': self.full_detections / self.frames if self.frames else 0.0,
+            'fallback_rate': self.fallback_detections / self.frames if self.frames else 0.0
+        }
+    
+    def _needs_detection(self):
+        return (self._force_detection
+                or not self._faces
+                or self._frames_since_detection + 1 >= self.detect_interval)
+    
+    def _run_detection(self, frame):
+        faces = self.detector.detect_faces(frame)
+        self.full_detections += 1
+        self._faces = [dict(face, bbox=list(face['bbox'])) for face in faces]
+        self._centers = [None] * len(self._faces)
+        self._frames_since_detection = 0
+        self._force_detection = False
+        
+        if self.tracker == 'opencv':
+            self._trackers = []
+            for face in self._faces:
+                x1, y1, x2, y2 = face['bbox']
+                tracker = self._create_opencv_tracker()
+                tracker.init(frame, (x1, y1, x2 - x1, y2 - y1))
+                self._trackers.append(tracker)
+        
+        return [dict(face) for face in self._faces]
+    
+    def _track_opencv(self, frame):
+        faces = []
+        for face, tracker in zip(self._faces, self._trackers):
+            ok, (x, y, w, h) = tracker.update(frame)
+            if not ok or w <= 0 or h <= 0:
+                return None
+            bbox = self._clip_bbox([int(x), int(y), int(x + w), int(y + h)])
+            faces.append(dict(face, bbox=bbox))
+        return faces
+    
+    def _clip_bbox(self, bbox):
+        if self._frame_shape is None:
+            return bbox
+        h, w = self._frame_shape
+        x1, y1, x2, y2 = bbox
+        return [min(max(x1, 0), w - 1), min(max(y1, 0), h - 1),
+                min(max(x2, 1), w), min(max(y2, 1), h)]
+    
+    @staticmethod
+    def _create_opencv_tracker():
+        """Create the cheapest OpenCV tracker available in this build"""
+        factories = [
+            getattr(cv2, 'TrackerKCF_create', None),
+            getattr(getattr(cv2, 'legacy', None), 'TrackerMOSSE_create', None),
+            getattr(getattr(cv2, 'legacy', None), 'TrackerKCF_create', None),
+            getattr(cv2, 'TrackerMIL_create', None)
+        ]
+        for factory in factories:
+            if factory is not None:
+                return factory()
+        raise RuntimeError("No OpenCV tracker available, use tracker='landmarks'")
@@ -0,0 +1,224 @@
+import math
+import time
+
+
+class TimeWindowRing:
+    def __init__(self, capacity, windows):
+        """
+        Fixed-size ring of (timestamp, weight, value) samples with running
+        weighted sums over one or more trailing time windows
+
+        capacity: most samples kept; sized for the longest window at the
+                  highest frame rate, older samples fall out early beyond that
+        windows: window lengths in seconds
+        """
+        self.capacity = capacity
+        self.windows = tuple(windows)
+        self._times = [0.0] * capacity
+        self._weights = [0.0] * capacity
+        self._values = [0.0] * capacity
+        self._count = 0  # samples ever pushed; slot of sample i is i % capacity
+
+        # Per window: oldest sample index still inside, sum of weights, sum of weight * value
+        self._tails = [0] * len(self.windows)
+        self._weight_sums = [0.0] * len(self.windows)
+        self._value_sums = [0.0] * len(self.windows)
+
+    def push(self, timestamp, value, weight=1.0):
+        """Add a sample and evict what left each window; amortized O(1)"""
+        capacity = self.capacity
+        slot = self._count % capacity
+        self._times[slot] = timestamp
+        self._weights[slot] = weight
+        self._values[slot] = value
+        self._count += 1
+
+        for i, window in enumerate(self.windows):
+            self._weight_sums[i] += weight
+            self._value_sums[i] += weight * value
+            tail = self._tails[i]
+            oldest_allowed = timestamp - window
+            while tail < self._count and (self._count - tail > capacity
+                                          or self._times[tail % capacity] <= oldest_allowed):
+                old = tail % capacity
+                self._weight_sums[i] -= self._weights[old]
+                self._value_sums[i] -= self._weights[old] * self._values[old]
+                tail += 1
+            self._tails[i] = tail
+
+        # Re-add the sums from scratch once per lap so rounding errors cannot build up
+        if self._count % capacity == 0:
+            self._resync()
+
+    def expire(self, timestamp):
+        """Evict samples that left their windows without adding one"""
+        capacity = self.capacity
+        for i, window in enumerate(self.windows):
+            tail = self._tails[i]
+            while tail < self._count and self._times[tail % capacity] <= timestamp - window:
+                old = tail % capacity
+                self._weight_sums[i] -= self._weights[old]
+                self._value_sums[i] -= self._weights[old] * self._values[old]
+                tail += 1
+            self._tails[i] = tail
+
+    def _resync(self):
+        capacity = self.capacity
+        for i in range(len(self.windows)):
+            weight_sum = value_sum = 0.0
+            for index in range(self._tails[i], self._count):
+                slot = index % capacity
+                weight_sum += self._weights[slot]
+                value_sum += self._weights[slot] * self._values[slot]
+            self._weight_sums[i] = weight_sum
+            self._value_sums[i] = value_sum
+
+    def count(self, window_index=0):
+        return self._count - self._tails[window_index]
+
+    def weight(self, window_index=0):
+        return max(self._weight_sums[window_index], 0.0)
+
+    def total(self, window_index=0):
+        return self._value_sums[window_index]
+
+    def mean(self, window_index=0):
+        """Weighted mean of the values inside the window"""
+        weight = self._weight_sums[window_index]
+        return self._value_sums[window_index] / weight if weight > 0 else 0.0
+
+    def reset(self):
+        self._count = 0
+        self._tails = [0] * len(self.windows)
+        self._weight_sums = [0.0] * len(self.windows)
+        self._value_sums = [0.0] * len(self.windows)
+
+
+class FeatureEngine:
+    def __init__(self, ear_threshold=0.25, mar_threshold=0.35, perclos_windows=(60.0,),
+                 rate_window=60.0, smoothing_frames=5, max_fps=60.0, max_gap=0.5,
+                 open_margin=0.03, blink_min=0.05, blink_max=0.5, yawn_min=1.5):
+        """
+        Streaming temporal eye and mouth features with O(1) work per frame and
+        memory fixed at construction, however long the session runs
+
+        perclos_windows: seconds; PERCLOS is the share of time with EAR below
+                         ear_threshold, weighted by frame duration
+        rate_window: seconds over which blink and yawn rates are reported
+        smoothing_frames: moving-average length for the smoothed EAR
+        max_fps: sizes the ring buffers (longest window x max_fps samples)
+        max_gap: frame durations are capped at this many seconds, so a stall
+                 or dropped frames do not count as a long closure
+        open_margin: eyes count as open again only above ear_threshold + open_margin
+        blink_min, blink_max: closures in this range (seconds) are blinks,
+                              longer ones are counted as long closures
+        yawn_min: MAR above mar_threshold for this long is a yawn
+        """
+        self.ear_threshold = ear_threshold
+        self.mar_threshold = mar_threshold
+        self.perclos_windows = tuple(perclos_windows)
+        self.rate_window = rate_window
+        self.max_gap = max_gap
+        self.open_margin = open_margin
+        self.blink_min = blink_min
+        self.blink_max = blink_max
+        self.yawn_min = yawn_min
+
+        self._perclos = TimeWindowRing(int(math.ceil(max(self.perclos_windows) * max_fps)),
+                                       self.perclos_windows)
+        self._smoothing = [0.0] * smoothing_frames
+        # Blinks and yawns are rare events; one slot per 100ms of the rate window is plenty
+        event_capacity = max(16, int(rate_window * 10))
+        self._blinks = TimeWindowRing(event_capacity, (rate_window,))
+        self._yawns = TimeWindowRing(event_capacity, (rate_window,))
+        self.reset()
+
+    def reset(self):
+        """Forget all history, e.g. when a new driver or video starts"""
+        self._perclos.reset()
+        self._blinks.reset()
+        self._yawns.reset()
+        self._smoothing_sum = 0.0
+        self._smoothing_count = 0
+        self._last_time = None
+        self._closed_since = None
+        self._mouth_open_since = None
+        self._yawn_counted = False
+
+        self.blink_count = 0
+        self.long_closures = 0
+        self.yawn_count = 0
+        self.last_blink_duration = 0.0
+        self.features = {}
+
+    def update(self, ear, mar, timestamp=None):
+        """
+        Feed one frame's EAR and MAR
+        timestamp: capture time in seconds (default: monotonic clock now)
+        Returns: Dictionary of temporal features, also kept in self.features
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        dt = 0.0 if self._last_time is None else min(max(timestamp - self._last_time, 0.0), self.max_gap)
+        self._last_time = timestamp
+
+        # Moving average of EAR over the last smoothing_frames frames
+        size = len(self._smoothing)
+        slot = self._smoothing_count % size
+        if self._smoothing_count >= size:
+            self._smoothing_sum -= self._smoothing[slot]
+        self._smoothing[slot] = ear
+        self._smoothing_sum += ear
+        self._smoothing_count += 1
+        ear_smoothed = self._smoothing_sum / min(self._smoothing_count, size)
+
+        # PERCLOS: time-weighted share of closed-eye frames
+        closed = ear < self.ear_threshold
+        self._perclos.push(timestamp, 1.0 if closed else 0.0, dt)
+
+        # Blinks: closure episodes with hysteresis on reopening
+        if self._closed_since is None:
+            if closed:
+                self._closed_since = timestamp
+        elif ear > self.ear_threshold + self.open_margin:
+            duration = timestamp - self._closed_since
+            self._closed_since = None
+            if duration > self.blink_max:
+                self.long_closures += 1
+            elif duration >= self.blink_min:
+                self.blink_count += 1
+                self.last_blink_duration = duration
+                self._blinks.push(timestamp, duration)
+        self._blinks.expire(timestamp)
+        closed_duration = timestamp - self._closed_since if self._closed_since is not None else 0.0
+
+        # Yawns: mouth open wide for at least yawn_min, counted once per opening
+        if mar > self.mar_threshold:
+            if self._mouth_open_since is None:
+                self._mouth_open_since = timestamp
+                self._yawn_counted = False
+            mouth_open = timestamp - self._mouth_open_since
+            if mouth_open >= self.yawn_min and not self._yawn_counted:
+                self._yawn_counted = True
+                self.yawn_count += 1
+                self._yawns.push(timestamp, mouth_open)
+        else:
+            self._mouth_open_since = None
+        self._yawns.expire(timestamp)
+        yawning = self._mouth_open_since is not None and timestamp - self._mouth_open_since >= self.yawn_min
+
+        per_minute = 60.0 / self.rate_window
+        self.features = {
+            'ear_smoothed': ear_smoothed,
+            'perclos': {window: self._perclos.mean(i) for i, window in enumerate(self.perclos_windows)},
+            'eyes_closed_duration': closed_duration,
+            'blink_count': self.blink_count,
+            'blink_rate': self._blinks.count() * per_minute,
+            'blink_duration_mean': self._blinks.mean(),
+            'last_blink_duration': self.last_blink_duration,
+            'long_closures': self.long_closures,
+            'yawning': yawning,
+            'yawn_count': self.yawn_count,
+            'yawn_rate': self._yawns.count() * per_minute
+        }
+        return self.features
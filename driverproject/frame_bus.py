@@ -0,0 +1,350 @@
+"""
+Process-based detection pipeline over a shared-memory frame ring
+
+Capture decodes straight into preallocated frame slots of one
+multiprocessing.shared_memory block. Only slot indices travel to the
+detector process (YOLO) and on to the landmark process (FaceMesh and
+drowsiness features), and only small result records travel back, so the
+two models run in parallel on separate cores without pickling images.
+
+    capture thread -> [slot] -> detector process -> [slot, faces]
+        -> landmark process -> [slot, results] -> main thread (draw, alert, display)
+"""
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+import cv2
+import numpy as np
+from profiler import StageProfiler
+from capture import FrameClock
+
+
+class SharedFrameRing:
+    def __init__(self, slots, shape, dtype=np.uint8, name=None):
+        """
+        slots frames of one fixed shape in a single shared memory block
+        name: attach to an existing ring created by another process
+        """
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Python < 3.13 registers every attach with the resource tracker,
+            # which then unlinks the block under the owner when this process
+            # exits; only the creator should own its cleanup
+            if os.name == 'posix':
+                resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        """Returns: Arguments for attaching to this ring from another process"""
+        return {'slots': self.slots, 'shape': self.shape, 'dtype': self.dtype.str, 'name': self.name}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['slots'], spec['shape'], spec['dtype'], name=spec['name'])
+
+    def track(self):
+        """
+        Owner: register the block with the resource tracker again. Spawned
+        children share the owner's tracker, so their unregister on attach
+        also drops the owner's entry; call once they have attached
+        """
+        if self.owner and os.name == 'posix':
+            resource_tracker.register(self.shm._name, 'shared_memory')
+
+    def close(self):
+        """Detach; the creating process also frees the block"""
+        self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A frame view is still referenced; the mapping goes away with the process
+            pass
+        if self.owner:
+            # unlink() unregisters, so the entry must exist even if a worker
+            # attached after the last track(), e.g. when startup failed
+            self.track()
+            self.shm.unlink()
+
+
+class _ExternalFaces:
+    """Stands in for FaceDetector in the landmark process: faces come from the detector process"""
+    fixed_shape = True
+
+    def detect_faces(self, frame):
+        raise RuntimeError("Faces are detected in the detector process")
+
+
+def _detector_worker(spec, options, inbox, outbox):
+    """Detector process: read frames by slot index and run face detection"""
+    ring = None
+    try:
+        from face_detector import FaceDetector, TrackingFaceDetector
+        detector = FaceDetector(options.get('face_model', 'yolov8n-face.pt'),
+                                backend=options.get('face_backend', 'ultralytics'),
+                                imgsz=options.get('detect_size', 640))
+        if options.get('track_interval'):
+            # Landmark feedback would have to cross processes, so only OpenCV tracking here
+            detector = TrackingFaceDetector(detector, options['track_interval'], tracker='opencv')
+        ring = SharedFrameRing.attach(spec)
+        outbox.put('ready')
+
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            seq, slot, captured, timestamp = item
+            start = time.perf_counter()
+            faces = detector.detect_faces(ring.frames[slot])
+            outbox.put((seq, slot, captured, timestamp, faces, time.perf_counter() - start))
+    except Exception as e:
+        print(f"Error in detector process: {e}")
+    finally:
+        outbox.put(None)
+        if ring:
+            ring.close()
+
+
+def _landmark_worker(spec, options, inbox, outbox):
+    """Landmark process: FaceMesh and drowsiness features for the detected faces"""
+    ring = None
+    try:
+        from frame_processor import FrameProcessor
+        processor = FrameProcessor(landmark_mode=options.get('landmark_mode', 'crop'),
+                                   roi_size=options.get('roi_size'),
+                                   face_detector=_ExternalFaces())
+        ring = SharedFrameRing.attach(spec)
+        outbox.put('ready')
+
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            if item == 'ready':
+                # The detector process finished loading
+                outbox.put(item)
+                continue
+            seq, slot, captured, timestamp, faces, detect_time = item
+            start = time.perf_counter()
+            results = processor.process(ring.frames[slot], faces=faces, timestamp=timestamp)
+            outbox.put((seq, slot, captured, timestamp, results, detect_time,
+                        time.perf_counter() - start))
+    except Exception as e:
+        print(f"Error in landmark process: {e}")
+    finally:
+        outbox.put(None)
+        if ring:
+            ring.close()
+
+
+class ProcessPipeline:
+    # Processor options the worker processes understand
+    WORKER_OPTIONS = ('face_backend', 'face_model', 'detect_size', 'track_interval',
+                      'landmark_mode', 'roi_size')
+
+    def __init__(self, system, options, slots=6, report_interval=5.0,
+                 window_name="Driver Drowsiness Detection", profiler=None, startup_timeout=120.0):
+        """
+        Capture -> detector process -> landmark process -> render pipeline
+        around a DrowsinessDetectionSystem; options are its FrameProcessor options
+
+        slots: frames in flight; a frame is dropped at capture when all slots are busy
+        """
+        self.system = system
+        self.options = {key: options[key] for key in self.WORKER_OPTIONS if key in options}
+        self.slots = slots
+        self.report_interval = report_interval
+        self.window_name = window_name
+        self.startup_timeout = startup_timeout
+        self.profiler = profiler or getattr(system, 'profiler', None) or StageProfiler()
+
+        self.ring = None
+        self.dropped = 0
+        self.captured = 0
+        self._free = queue.Queue()
+        self._stop = threading.Event()
+        self._processes = []
+        self._capture_thread = None
+
+    def _capture_loop(self, cap, clock, first_frame, first_timestamp, detect_queue):
+        """Decode frames directly into free ring slots"""
+        seq = 0
+        frame = first_frame
+        timestamp = first_timestamp
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    slot = self._free.get_nowait()
+                except queue.Empty:
+                    slot = None
+
+                if frame is not None:
+                    # The first frame was read before the ring existed
+                    if slot is not None:
+                        self.ring.frames[slot][...] = frame
+                    ret, frame = True, None
+                elif slot is not None:
+                    target = self.ring.frames[slot]
+                    ret, image = cap.read(target)
+                    if ret and image is not None and not np.shares_memory(image, target):
+                        if image.shape != target.shape:
+                            image = cv2.resize(image, (target.shape[1], target.shape[0]))
+                        target[...] = image
+                    if ret:
+                        timestamp = clock.stamp()
+                else:
+                    # No free slot: read and discard so the camera buffer stays fresh
+                    ret = cap.grab()
+                    if ret:
+                        clock.stamp()
+
+                if not ret:
+                    if slot is not None:
+                        self._free.put(slot)
+                    break
+                self.captured += 1
+                if slot is None:
+                    self.dropped += 1
+                    continue
+                self.profiler.record('capture', time.perf_counter() - start)
+                detect_queue.put((seq, slot, start, timestamp))
+                seq += 1
+        finally:
+            detect_queue.put(None)
+
+    def _wait_ready(self, result_queue):
+        """Wait for both worker processes to load their models"""
+        deadline = time.perf_counter() + self.startup_timeout
+        ready = 0
+        while ready < 2:
+            try:
+                message = result_queue.get(timeout=max(0.1, deadline - time.perf_counter()))
+            except queue.Empty:
+                raise RuntimeError("Worker processes did not start in time")
+            if message is None:
+                raise RuntimeError("A worker process failed to start")
+            ready += 1
+
+    def run(self, cap, clock=None):
+        """
+        Run the pipeline until 'q' is pressed or the capture ends
+        clock: capture.FrameClock timing the frames (default: live, monotonic)
+        """
+        clock = clock or FrameClock(cap, live=True)
+        ret, first_frame = cap.read()
+        if not ret:
+            print("Error: Could not read frame")
+            return
+        first_timestamp = clock.stamp()
+
+        self.ring = SharedFrameRing(self.slots, first_frame.shape, first_frame.dtype)
+        for slot in range(self.slots):
+            self._free.put(slot)
+
+        context = multiprocessing.get_context('spawn')
+        detect_queue = context.Queue()
+        landmark_queue = context.Queue()
+        result_queue = context.Queue()
+        spec = self.ring.spec()
+        self._processes = [
+            context.Process(target=_detector_worker, name='detector', daemon=True,
+                            args=(spec, self.options, detect_queue, landmark_queue)),
+            context.Process(target=_landmark_worker, name='landmarks', daemon=True,
+                            args=(spec, self.options, landmark_queue, result_queue))
+        ]
+        try:
+            for process in self._processes:
+                process.start()
+            # The detector's 'ready' is forwarded through the landmark process
+            self._wait_ready(result_queue)
+            self.ring.track()
+
+            self._capture_thread = threading.Thread(
+                target=self._capture_loop, args=(cap, clock, first_frame, first_timestamp, detect_queue),
+                name='capture', daemon=True)
+            self._capture_thread.start()
+            self._render_loop(result_queue)
+        finally:
+            self.stop()
+            # Drain so the workers can exit, then free the ring
+            for process in self._processes:
+                process.join(timeout=5.0)
+                if process.is_alive():
+                    process.terminate()
+            self.ring.close()
+
+    def _render_loop(self, result_queue):
+        last_report = time.perf_counter()
+        while True:
+            try:
+                item = result_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+
+            seq, slot, captured, timestamp, results, detect_time, landmark_time = item
+            self.profiler.record('detect', detect_time)
+            self.profiler.record('landmarks', landmark_time)
+            if self._stop.is_set():
+                self._free.put(slot)
+                continue
+
+            frame = self.ring.frames[slot]
+            self.system.record_results(results, timestamp)
+            with self.profiler.stage('draw'):
+                self.system.render_frame(frame, results)
+                if getattr(self.system, 'hud', False):
+                    self.profiler.draw_overlay(frame)
+            key = -1
+            if not getattr(self.system, 'headless', False):
+                with self.profiler.stage('display'):
+                    cv2.imshow(self.window_name, frame)
+                    key = cv2.waitKey(1) & 0xFF
+            self._free.put(slot)
+            self.profiler.record('frame', time.perf_counter() - captured)
+            self.profiler.frame_done()
+
+            stop = getattr(self.system, 'stop_requested', None)
+            if key == ord('q') or (stop is not None and stop.is_set()):
+                # Stop capturing; keep draining until the workers hand back their slots
+                self._stop.set()
+
+            if self.report_interval and time.perf_counter() - last_report >= self.report_interval:
+                self.print_stats()
+                last_report = time.perf_counter()
+
+    def stop(self):
+        self._stop.set()
+        if self._capture_thread:
+            self._capture_thread.join(timeout=2.0)
+
+    def stats(self):
+        return {
+            'stages': self.profiler.summary()['stages'],
+            'captured': self.captured,
+            'dropped': self.dropped,
+            'free_slots': self._free.qsize(),
+            'slots': self.slots
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        stages = ", ".join(f"{name}: {s['mean_ms']:.1f}ms" for name, s in stats['stages'].items())
+        print(f"Process pipeline stages - {stages}")
+        print(f"Process pipeline - captured {stats['captured']}, dropped {stats['dropped']}, "
+              f"{stats['free_slots']}/{stats['slots']} slots free")
@@ -0,0 +1,312 @@
+import copy
+import time
+from face_backends import box_iou
+from face_detector import FaceDetector, TrackingFaceDetector
+from landmark_detector import FacialLandmarkDetector, StableROI, square_roi
+from drowsiness_detector import DrowsinessDetector
+from profiler import StageProfiler
+from resolution import AdaptiveResolution
+from scheduler import FrameScheduler
+
+
+class CarriedResults(list):
+    """
+    What process() returns for a frame the scheduler skipped: the previous
+    frame's results, to keep drawing them. They were recorded with the frame
+    they came from, so telemetry, metrics and alerts must not record them again.
+    """
+
+
+class FrameProcessor:
+    LANDMARK_MODES = ('crop', 'stable_roi', 'full_frame')
+    # A face keeps its DrowsinessDetector while its box overlaps the previous
+    # one this much, and for this many processed frames without a detection
+    FACE_MATCH_IOU = 0.3
+    FACE_MAX_MISSED = 30
+    
+    def __init__(self, track_interval=None, tracker='landmarks', landmark_mode='crop',
+                 face_backend='ultralytics', face_model='yolov8n-face.pt', face_detector=None,
+                 detect_size=640, roi_size=None, target_fps=None, max_faces=1, skip_interval=None,
+                 landmark_detector=None, drowsiness_detector=None, profiler=None,
+                 reuse_buffers=False):
+        """
+        Face -> landmark -> drowsiness pipeline for one video stream, without any UI
+        track_interval: run YOLO only every N frames and track faces in between
+        landmark_mode: 'crop' runs FaceMesh on the raw face box, 'stable_roi' on a
+                       padded fixed-size ROI and 'full_frame' on the whole frame
+                       with face detection used only as a gate
+        face_backend: FaceDetector inference backend, see face_backends.BACKENDS
+        face_model: YOLO weights, e.g. an INT8 .onnx from quantize_detector.py
+        detect_size: face detection resolution (long side of the downscaled frame)
+        roi_size: FaceMesh input size; 'crop' faces are cut as squares resized to
+                  roi_size x roi_size (None keeps the raw box), 'stable_roi'
+                  defaults to 256
+        target_fps: adapt detect_size between 256 and 640 to hold this processing rate
+        max_faces: faces FaceMesh tracks per image in 'full_frame' mode
+        skip_interval: process only every Nth frame (at most) while the driver is
+                       clearly alert, see FrameScheduler; skipped frames return
+                       the previous results as CarriedResults
+        profiler: StageProfiler receiving 'detect', 'landmarks' and 'features' timings
+        reuse_buffers: return the same results list and result dictionaries
+                       every frame (and let FaceMesh reuse its buffers), valid
+                       until the next call; only for loops that finish with the
+                       results before processing the next frame
+        """
+        if landmark_mode not in self.LANDMARK_MODES:
+            raise ValueError(f"Unknown landmark mode: {landmark_mode}")
+        self.landmark_mode = landmark_mode
+        
+        self.face_detector = face_detector or FaceDetector(face_model, backend=face_backend,
+                                                           imgsz=detect_size)
+        self.resolution = AdaptiveResolution(self.face_detector, target_fps) if target_fps else None
+        self.face_tracker = None
+        if track_interval:
+            self.face_tracker = TrackingFaceDetector(
+                self.face_detector, detect_interval=track_interval, tracker=tracker)
+        self.landmark_detector = landmark_detector or FacialLandmarkDetector(
+            max_num_faces=max_faces if landmark_mode == 'full_frame' else 1)
+        self.roi_size = roi_size
+        self.face_rois = []
+        self._roi_buffers = []
+        self.drowsiness_detector = drowsiness_detector or DrowsinessDetector()
+        # One detector per tracked face, so several occupants never share
+        # timers or PERCLOS; the first face seen (the driver) uses
+        # drowsiness_detector. Faces are matched to tracks by box IoU, not by
+        # their rank in the detection list, which follows confidence
+        self._face_tracks = []
+        self._reset_face_tracks()
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.scheduler = None
+        if skip_interval and skip_interval > 1:
+            self.scheduler = FrameScheduler(self.drowsiness_detector, max_interval=skip_interval)
+        self._last_results = []
+        self._results = []
+        self._result_buffers = []
+        self.set_reuse_buffers(reuse_buffers)
+        
+    def set_reuse_buffers(self, enabled):
+        """Switch buffer reuse on or off, e.g. off for a threaded pipeline"""
+        self.reuse_buffers = enabled
+        self.landmark_detector.reuse_buffers = enabled
+        
+    def reset(self):
+        """Clear all per-stream state before processing a new video"""
+        if self.face_tracker:
+            self.face_tracker.reset()
+        self.landmark_detector.reset()
+        self.face_rois = []
+        self.drowsiness_detector.reset()
+        self._reset_face_tracks()
+        if self.scheduler:
+            self.scheduler.reset()
+        self._last_results = []
+        
+    def process(self, frame, faces=None, timestamp=None):
+        """
+        Run face, landmark and drowsiness detection on a single frame
+        faces: face boxes already detected for this frame (e.g. by a batched
+               detector call), skips this processor's own detection
+        timestamp: capture time in seconds that drives the drowsiness timers,
+                   see capture.FrameClock; None means live, now
+        Returns: List of per-face result dictionaries, CarriedResults when the
+                 frame was skipped
+        """
+        if self.scheduler and not self.scheduler.should_process():
+            return CarriedResults(self._last_results)
+        
+        results = self._results if self.reuse_buffers else []
+        results.clear()
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        
+        profiler = self.profiler
+        
+        # Detect (or track) faces
+        if faces is None:
+            with profiler.stage('detect'):
+                if self.face_tracker:
+                    faces = self.face_tracker.detect_faces(frame)
+                else:
+                    faces = self.face_detector.detect_faces(frame)
+        
+        frame_landmarks = None
+        if self.landmark_mode == 'full_frame' and faces:
+            # Face detection only gates FaceMesh, which tracks on the full frame
+            with profiler.stage('landmarks'):
+                frame_landmarks = self.landmark_detector.detect_landmarks(frame)
+        
+        detectors = self._face_detectors([face['bbox'] for face in faces])
+        for index, face in enumerate(faces):
+            # Detect facial landmarks (in full-frame coordinates)
+            if frame_landmarks is not None:
+                landmarks = self._match_landmarks(face['bbox'], frame_landmarks)
+            else:
+                with profiler.stage('landmarks'):
+                    landmarks = self._detect_roi_landmarks(frame, index, face['bbox'])
+            
+            if self.face_tracker:
+                points = landmarks[0]['points'] if landmarks else None
+                self.face_tracker.update_track(index, points)
+            
+            if landmarks:
+                # Detect drowsiness
+                with profiler.stage('features'):
+                    results.append(self._feature_result(face['bbox'], landmarks[0], timestamp,
+                                                        self._result_buffer(len(results)),
+                                                        detectors[index]))
+        
+        if self.resolution:
+            self.resolution.update(time.perf_counter() - start)
+        if self.scheduler:
+            self.scheduler.update(results, time.thread_time() - cpu_start)
+        self._last_results = results
+        return results
+    
+    def process_landmarks(self, faces, timestamp=None):
+        """
+        Feature stage only, for landmarks detected earlier (e.g. landmark_cache)
+        faces: list of (bbox, landmarks) per face, in detection order
+        Returns: Same per-face result dictionaries as process()
+        """
+        detectors = self._face_detectors([bbox for bbox, _ in faces])
+        results = [self._feature_result(bbox, landmarks, timestamp, detector=detector)
+                   for (bbox, landmarks), detector in zip(faces, detectors)]
+        self._last_results = results
+        return results
+    
+    def _result_buffer(self, index):
+        """Result dictionary reused for the index-th face, or None without reuse_buffers"""
+        if not self.reuse_buffers:
+            return None
+        while len(self._result_buffers) <= index:
+            self._result_buffers.append({})
+        return self._result_buffers[index]
+    
+    @property
+    def drowsiness_detectors(self):
+        """DrowsinessDetector of every tracked face"""
+        return [track['detector'] for track in self._face_tracks]
+
+    def _reset_face_tracks(self):
+        # drowsiness_detector waits, without a box, for the first face
+        self._face_tracks[:] = [{'bbox': None, 'missed': 0, 'detector': self.drowsiness_detector}]
+
+    def _face_detectors(self, bboxes):
+        """
+        Match this frame's faces to the tracked faces of earlier frames
+        Returns: DrowsinessDetector of each box, in the order of bboxes
+        """
+        tracks = self._face_tracks
+        assigned = [None] * len(bboxes)
+        matched = set()
+        placed = [i for i, track in enumerate(tracks) if track['bbox'] is not None]
+        if placed and bboxes:
+            # Greedy one-to-one matching, best overlap first
+            ious = box_iou([tracks[i]['bbox'] for i in placed], bboxes)
+            while ious.size and ious.max() >= self.FACE_MATCH_IOU:
+                row, face = divmod(int(ious.argmax()), ious.shape[1])
+                assigned[face] = placed[row]
+                matched.add(placed[row])
+                ious[row, :] = -1
+                ious[:, face] = -1
+
+        new_faces = [face for face, track in enumerate(assigned) if track is None]
+        lost = [i for i in placed if i not in matched]
+        if len(new_faces) == 1 and len(lost) == 1:
+            # One face left and one track lost: the same person moved quickly
+            assigned[new_faces[0]] = lost[0]
+            matched.add(lost[0])
+            new_faces = []
+        for face in new_faces:
+            idle = [i for i, track in enumerate(tracks) if track['bbox'] is None and i not in matched]
+            if idle:
+                index = idle[0]
+            else:
+                detector = copy.deepcopy(self.drowsiness_detector)
+                detector.reset()
+                tracks.append({'bbox': None, 'missed': 0, 'detector': detector})
+                index = len(tracks) - 1
+            assigned[face] = index
+            matched.add(index)
+
+        for index, bbox in zip(assigned, bboxes):
+            tracks[index]['bbox'] = tuple(bbox)
+            tracks[index]['missed'] = 0
+        detectors = [tracks[index]['detector'] for index in assigned]
+
+        # Faces gone for too long drop their detector; drowsiness_detector is
+        # reset and waits for the next new face instead
+        kept = []
+        for index, track in enumerate(tracks):
+            if index not in matched and track['bbox'] is not None:
+                track['missed'] += 1
+                if track['missed'] > self.FACE_MAX_MISSED:
+                    if track['detector'] is not self.drowsiness_detector:
+                        continue
+                    track['detector'].reset()
+                    track['bbox'] = None
+                    track['missed'] = 0
+            kept.append(track)
+        tracks[:] = kept
+        return detectors
+
+    def _feature_result(self, bbox, landmarks, timestamp, result=None, detector=None):
+        """
+        result: dictionary to fill in place instead of a new one
+        detector: the face's own DrowsinessDetector, see _face_detectors();
+                  defaults to drowsiness_detector
+        """
+        if detector is None:
+            detector = self.drowsiness_detector
+        is_drowsy, ear, mar, head_tilt, head_elevation = detector.detect_drowsiness(
+            landmarks, timestamp)
+        temporal = detector.features
+        perclos = temporal.get('perclos')
+        if result is None:
+            result = {}
+        result['bbox'] = bbox
+        result['landmarks'] = landmarks
+        result['is_drowsy'] = is_drowsy
+        result['ear'] = ear
+        result['mar'] = mar
+        result['head_tilt'] = head_tilt
+        result['head_elevation'] = head_elevation
+        result['ear_smoothed'] = temporal.get('ear_smoothed', ear)
+        result['perclos'] = next(iter(perclos.values()), 0.0) if perclos else 0.0
+        result['blink_rate'] = temporal.get('blink_rate', 0.0)
+        result['yawning'] = temporal.get('yawning', False)
+        return result
+    
+    def _detect_roi_landmarks(self, frame, index, bbox):
+        """Run FaceMesh on the ROI of one face and map points back to the frame"""
+        x1, y1, x2, y2 = bbox
+        if self.landmark_mode == 'crop':
+            if not self.roi_size:
+                face_roi = frame[y1:y2, x1:x2]
+                return self.landmark_detector.detect_landmarks(face_roi, offset=(x1, y1), slot=index)
+            
+            # Fixed-size square around the box, written into a per-face buffer
+            while len(self._roi_buffers) <= index:
+                self._roi_buffers.append(None)
+            center = ((x1 + x2) / 2.0, (y1 + y2) / 2.0)
+            side = max(x2 - x1, y2 - y1, 1)
+            roi, offset, scale = square_roi(frame, center, side, self.roi_size,
+                                            out=self._roi_buffers[index])
+            self._roi_buffers[index] = roi
+            return self.landmark_detector.detect_landmarks(roi, offset=offset, scale=scale,
+                                                           slot=index)
+        
+        while len(self.face_rois) <= index:
+            self.face_rois.append(StableROI(size=self.roi_size or 256))
+        roi, offset, scale = self.face_rois[index].extract(frame, bbox)
+        return self.landmark_detector.detect_landmarks(roi, offset=offset, scale=scale, slot=index)
+    
+    @staticmethod
+    def _match_landmarks(bbox, frame_landmarks):
+        """Pick the full-frame landmark set whose nose lies inside bbox"""
+        x1, y1, x2, y2 = bbox
+        for landmarks in frame_landmarks:
+            nx, ny = landmarks['nose'][0][:2]
+            if x1 <= nx <= x2 and y1 <= ny <= y2:
+                return [landmarks]
+        return []
@@ -0,0 +1,259 @@
+"""
+On-disk landmark cache for replaying recordings without re-running inference
+
+Tuning DrowsinessDetector thresholds on recorded footage only needs the
+face boxes and the 23 packed landmark points per frame; YOLO and FaceMesh
+give the same answer every time. The first run over a video stores them,
+keyed by the video's content hash, so later runs skip decoding and both
+models and go straight to the feature stage.
+
+One entry per (video, model version) is one .npz file:
+    counts      (N,) uint8     faces with landmarks in frame i
+    timestamps  (N,) float64   frame timestamps, see capture.FrameClock
+    bboxes      (M, 4) int16   face boxes of all frames, concatenated
+    points      (M, 23, 2)     relative to the box's top-left corner, int16
+                               fixed point (1/scale px) or float16
+    meta        JSON           format, version, fps, frame size, scale
+
+The model version hashes everything that changes the landmarks (weights,
+backend, resolutions, landmark mode, tracking, mediapipe version), so a
+changed model misses the cache instead of reading stale points. The
+directory is kept under max_bytes by evicting the least recently used
+entries; file modification times record use, so worker processes can share
+one cache directory without a shared index.
+"""
+import os
+import json
+import glob
+import hashlib
+import tempfile
+import numpy as np
+from landmark_detector import NUM_POINTS, landmarks_from_points
+
+CACHE_FORMAT = 1
+CACHE_EXTENSION = '.npz'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Options that change the detected faces or landmarks
+VERSION_OPTIONS = ('face_backend', 'face_model', 'detect_size', 'landmark_mode', 'roi_size',
+                   'track_interval', 'tracker', 'max_faces')
+
+
+def _file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(options):
+    """
+    Identify the models and settings that produced the landmarks
+    options: FrameProcessor keyword arguments
+    Returns: Short hex string
+    """
+    identity = {'format': CACHE_FORMAT}
+    for key in VERSION_OPTIONS:
+        identity[key] = options.get(key)
+    face_model = options.get('face_model', 'yolov8n-face.pt')
+    if face_model and os.path.isfile(face_model):
+        identity['face_model'] = _file_digest(face_model)
+    try:
+        from importlib.metadata import version
+        identity['mediapipe'] = version('mediapipe')
+    except Exception:
+        identity['mediapipe'] = None
+    text = json.dumps(identity, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class LandmarkRecording:
+    def __init__(self):
+        """Collects FrameProcessor results frame by frame for LandmarkCache.put()"""
+        self.counts = []
+        self.timestamps = []
+        self.bboxes = []
+        self.points = []
+
+    def add(self, timestamp, results):
+        self.counts.append(len(results))
+        self.timestamps.append(timestamp)
+        for result in results:
+            self.bboxes.append(result['bbox'])
+            self.points.append(result['landmarks']['points'][:, :2])
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class CachedLandmarks:
+    def __init__(self, arrays, meta):
+        """Landmarks of one cached video; points are decoded to float32 on access"""
+        self.meta = meta
+        self.counts = arrays['counts']
+        self.timestamps = arrays['timestamps']
+        self.bboxes = arrays['bboxes']
+        self._points = arrays['points']
+        self._scale = meta['scale']
+        # First face of frame i is row offsets[i]
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts, dtype=np.int64)[:-1]])
+
+    @property
+    def fps(self):
+        return self.meta['fps']
+
+    def __len__(self):
+        return len(self.counts)
+
+    def decode(self, rows):
+        """Returns: float32 frame-pixel points of the given face rows"""
+        points = self._points[rows].astype(np.float32)
+        if self._scale:
+            points /= self._scale
+        points += self.bboxes[rows, np.newaxis, :2]
+        return points
+
+    def faces(self, index):
+        """Returns: [(bbox, landmarks)] of frame index, for FrameProcessor.process_landmarks"""
+        start = self.offsets[index]
+        count = self.counts[index]
+        points = self.decode(slice(start, start + count))
+        return [([int(v) for v in self.bboxes[start + i]], landmarks_from_points(points[i]))
+                for i in range(count)]
+
+    def first_face_points(self):
+        """
+        Returns: (mask, points): which frames have a face, and the (N, 23, 2)
+                 float32 points of their first face (zeros where there is none)
+        """
+        mask = self.counts > 0
+        points = np.zeros((len(self.counts), NUM_POINTS, 2), dtype=np.float32)
+        points[mask] = self.decode(self.offsets[mask])
+        return mask, points
+
+
+class LandmarkCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, dtype='int16'):
+        """
+        directory: cache directory, created if needed; may be shared by processes
+        max_bytes: total size the least recently used entries are evicted down to
+        dtype: 'int16' stores points in fixed point at the finest step that fits
+               the largest face (1/54 px for a 300 px face), 'float16' as half floats
+        """
+        if dtype not in ('int16', 'float16'):
+            raise ValueError(f"Unsupported landmark cache dtype: {dtype}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+        self._hashes = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def video_hash(self, video_path):
+        """Content hash of a video file, remembered per (path, size, mtime)"""
+        stat = os.stat(video_path)
+        key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._hashes:
+            self._hashes[key] = _file_digest(video_path)
+        return self._hashes[key]
+
+    def _path(self, video_hash, version):
+        return os.path.join(self.directory, f"{video_hash}-{version}{CACHE_EXTENSION}")
+
+    def get(self, video_path, version):
+        """Returns: CachedLandmarks of video_path for version, or None on a miss"""
+        path = self._path(self.video_hash(video_path), version)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in ('counts', 'timestamps', 'bboxes', 'points')}
+                meta = json.loads(str(data['meta']))
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        if meta.get('format') != CACHE_FORMAT or meta.get('version') != version:
+            self.misses += 1
+            return None
+        # Mark as recently used for LRU eviction; another worker may evict the
+        # entry meanwhile, which is harmless since the data is already loaded
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return CachedLandmarks(arrays, meta)
+
+    def put(self, video_path, version, recording, fps, frame_size):
+        """
+        Store a complete recording of video_path
+        frame_size: (width, height) of the video, kept in the entry's metadata
+        Returns: Path of the cache entry
+        """
+        video_hash = self.video_hash(video_path)
+        bboxes = np.asarray(recording.bboxes, dtype=np.int16).reshape(-1, 4)
+        # Relative to the face box the values stay small, so either dtype keeps sub-pixel precision
+        points = np.asarray(recording.points, dtype=np.float32).reshape(-1, NUM_POINTS, 2)
+        points -= bboxes[:, np.newaxis, :2]
+        if self.dtype == 'int16':
+            # Finest step for the largest face, with 2x headroom for points outside the box
+            side = int(max((bboxes[:, 2:] - bboxes[:, :2]).max(initial=1), 1))
+            scale = max(1, 32767 // (2 * side))
+            points = np.clip(np.round(points * scale), -32768, 32767).astype(np.int16)
+        else:
+            scale = 0
+            points = points.astype(np.float16)
+        meta = {'format': CACHE_FORMAT, 'version': version, 'video_hash': video_hash,
+                'video': os.path.basename(video_path), 'fps': fps,
+                'frame_size': list(frame_size), 'frames': len(recording), 'scale': scale}
+
+        path = self._path(video_hash, version)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, counts=np.asarray(recording.counts, dtype=np.uint8),
+                         timestamps=np.asarray(recording.timestamps, dtype=np.float64),
+                         bboxes=bboxes,
+                         points=points, meta=np.array(json.dumps(meta)))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        # Entries of the same video from other model versions can never hit again
+        for stale in glob.glob(os.path.join(self.directory, f"{video_hash}-*{CACHE_EXTENSION}")):
+            if stale != path:
+                os.unlink(stale)
+        self.evict(keep=path)
+        return path
+
+    def entries(self):
+        """Returns: [(path, bytes, last used)] of all entries, least recently used first"""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*' + CACHE_EXTENSION)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        entries = self.entries()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
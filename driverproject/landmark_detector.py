@@ -1,17 +1,44 @@
 import cv2
 import numpy as np
-import mediapipe as mp
+
+# Regions extracted for every face, in the order they are packed into 'points'
+REGIONS = ('left_eye', 'right_eye', 'mouth', 'nose', 'left_ear', 'right_ear')
+
+# Points per region, and the slice of the packed 'points' array each region occupies
+REGION_SIZES = (6, 6, 8, 1, 1, 1)
+REGION_SLICES = {}
+_start = 0
+for _name, _size in zip(REGIONS, REGION_SIZES):
+    REGION_SLICES[_name] = slice(_start, _start + _size)
+    _start += _size
+NUM_POINTS = _start
+
+
+def landmarks_from_points(points):
+    """Rebuild a detect_landmarks() face dictionary around a packed (23, D) point array"""
+    face = {name: points[s] for name, s in REGION_SLICES.items()}
+    face['points'] = points
+    return face
 
 class FacialLandmarkDetector:
-    def __init__(self):
-        """Initialize MediaPipe face mesh"""
+    def __init__(self, max_num_faces=1, reuse_buffers=False):
+        """
+        Initialize MediaPipe face mesh
+        max_num_faces: faces tracked in one image; ROI modes need 1, full-frame
+                       mode needs one per occupant the camera can see
+        reuse_buffers: convert into a persistent RGB buffer and return the same
+                       list, face dictionaries and point arrays on every call,
+                       overwritten by the next call (single-threaded loops only)
+        """
+        import mediapipe as mp  # deferred: importing mediapipe takes seconds
         self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
+        self._mesh_options = dict(
+            max_num_faces=max_num_faces,
             refine_landmarks=True,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
+        self.face_mesh = self.mp_face_mesh.FaceMesh(**self._mesh_options)
         
         # Define landmark indices
         self.LEFT_EYE = [33, 160, 158, 133, 153, 144]
@@ -21,50 +48,161 @@ class FacialLandmarkDetector:
         self.LEFT_EAR = [234]
         self.RIGHT_EAR = [454]
         
-    def detect_landmarks(self, frame):
+        # All region indices packed into one gather, each region is a slice of it
+        region_indices = [self.LEFT_EYE, self.RIGHT_EYE, self.MOUTH,
+                          self.NOSE, self.LEFT_EAR, self.RIGHT_EAR]
+        self.region_index = np.concatenate(region_indices).astype(np.intp)
+        self._region_list = self.region_index.tolist()
+        self.region_slices = {}
+        start = 0
+        for name, indices in zip(REGIONS, region_indices):
+            self.region_slices[name] = slice(start, start + len(indices))
+            start += len(indices)
+        
+        # Buffers for reuse_buffers mode, grown on demand
+        self.reuse_buffers = reuse_buffers
+        self._rgb = None
+        self._faces = []
+        self._landmark_lists = []
+        self._pixel_scale = np.empty(2, dtype=np.float32)
+        self._pixel_offset = np.empty(2, dtype=np.float32)
+        
+    def reset(self):
+        """Drop FaceMesh's tracking state, so a new video starts with a fresh detection"""
+        if hasattr(self.face_mesh, 'reset'):
+            self.face_mesh.reset()
+        else:
+            self.face_mesh.close()
+            self.face_mesh = self.mp_face_mesh.FaceMesh(**self._mesh_options)
+        
+    def detect_landmarks(self, frame, offset=(0, 0), scale=1.0, slot=0):
         """
         Detect facial landmarks in frame
-        Returns: Dictionary containing eye, mouth, and head pose landmarks
+        offset, scale: map points back to full-frame pixel coordinates when
+                       frame is a crop (full = point / scale + offset)
+        slot: first reused face buffer to write into with reuse_buffers; callers
+              running FaceMesh once per face crop pass the face index, so every
+              face of a frame keeps its own points
+        Returns: List of dictionaries with a (K, 2) float32 'points' array in
+                 full-frame pixels and one view into it per region
         """
         try:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if self.reuse_buffers:
+                # Reallocated only when the input size changes
+                self._rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+                frame_rgb = self._rgb
+            else:
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             results = self.face_mesh.process(frame_rgb)
             
-            landmarks = []
+            landmarks = self._landmark_list(slot) if self.reuse_buffers else []
+            landmarks.clear()
             if results.multi_face_landmarks:
-                for face_landmarks in results.multi_face_landmarks:
-                    # Get image dimensions
-                    h, w, _ = frame.shape
-                    
-                    # Extract landmarks
-                    left_eye = self._get_landmarks(face_landmarks, self.LEFT_EYE, w, h)
-                    right_eye = self._get_landmarks(face_landmarks, self.RIGHT_EYE, w, h)
-                    mouth = self._get_landmarks(face_landmarks, self.MOUTH, w, h)
-                    nose = self._get_landmarks(face_landmarks, self.NOSE, w, h)
-                    left_ear = self._get_landmarks(face_landmarks, self.LEFT_EAR, w, h)
-                    right_ear = self._get_landmarks(face_landmarks, self.RIGHT_EAR, w, h)
+                # Get image dimensions
+                h, w, _ = frame.shape
+                pixel_scale = self._pixel_scale
+                pixel_scale[0] = w / scale
+                pixel_scale[1] = h / scale
+                pixel_offset = self._pixel_offset
+                pixel_offset[0], pixel_offset[1] = offset
+                
+                for index, face_landmarks in enumerate(results.multi_face_landmarks):
+                    # Only the region points are read, scaled to frame pixels
+                    if self.reuse_buffers:
+                        face = self._face_buffer(slot + index)
+                        points = face['points']
+                    else:
+                        points = np.empty((NUM_POINTS, 2), dtype=np.float32)
+                    self._gather_regions(face_landmarks, points)
+                    points *= pixel_scale
+                    points += pixel_offset
                     
-                    landmarks.append({
-                        'left_eye': left_eye,
-                        'right_eye': right_eye,
-                        'mouth': mouth,
-                        'nose': nose,
-                        'left_ear': left_ear,
-                        'right_ear': right_ear
-                    })
+                    if not self.reuse_buffers:
+                        face = {name: points[s] for name, s in self.region_slices.items()}
+                        face['points'] = points
+                    landmarks.append(face)
             
             return landmarks
         except Exception as e:
             print(f"Error in landmark detection: {e}")
             return []
     
-    def _get_landmarks(self, face_landmarks, indices, width, height):
-        """Helper function to extract landmarks"""
-        points = []
-        for idx in indices:
-            point = face_landmarks.landmark[idx]
-            points.append([
-                int(point.x * width),
-                int(point.y * height)
-            ])
-        return np.array(points)
\ No newline at end of file
+    def _landmark_list(self, slot):
+        """Result list reused for the calls writing into slot"""
+        while len(self._landmark_lists) <= slot:
+            self._landmark_lists.append([])
+        return self._landmark_lists[slot]
+    
+    def _face_buffer(self, index):
+        """Face dictionary reused for the index-th face, with region views into its points"""
+        while len(self._faces) <= index:
+            self._faces.append(landmarks_from_points(np.zeros((NUM_POINTS, 2), dtype=np.float32)))
+        return self._faces[index]
+    
+    def _gather_regions(self, face_landmarks, points):
+        """Copy the normalized (x, y) of the region points into the (K, 2) array points"""
+        landmark = face_landmarks.landmark
+        region = [landmark[i] for i in self._region_list]
+        points[:, 0] = [point.x for point in region]
+        points[:, 1] = [point.y for point in region]
+
+
+def square_roi(frame, center, side, size, out=None):
+    """
+    Cut a side x side square centred on center out of frame, resized to size x size
+    Parts of the square outside the frame are filled with black
+    out: optional (size, size, 3) buffer to write the ROI into
+    Returns: (roi, offset, scale) suitable for FacialLandmarkDetector.detect_landmarks
+    """
+    cx, cy = center
+    x0, y0 = cx - side / 2.0, cy - side / 2.0
+    scale = size / side
+    M = np.array([[scale, 0, -x0 * scale],
+                  [0, scale, -y0 * scale]], dtype=np.float32)
+    roi = cv2.warpAffine(frame, M, (size, size), dst=out,
+                         flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+    return roi, (x0, y0), scale
+
+
+class StableROI:
+    def __init__(self, size=256, padding=0.3, move_threshold=0.15, resize_threshold=0.2):
+        """
+        Padded, square, fixed-size face ROI that only moves when the face
+        drifts noticeably, so MediaPipe's tracker sees a steady image
+        """
+        self.size = size
+        self.padding = padding
+        self.move_threshold = move_threshold
+        self.resize_threshold = resize_threshold
+        self.window = None  # (center_x, center_y, side) in frame pixels
+        self._roi = None
+        
+    def reset(self):
+        self.window = None
+        
+    def update(self, bbox):
+        """Move the ROI window only if bbox left its dead zone"""
+        x1, y1, x2, y2 = bbox
+        cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+        side = max(x2 - x1, y2 - y1) * (1.0 + 2.0 * self.padding)
+        
+        if self.window is None:
+            self.window = (cx, cy, side)
+            return self.window
+        
+        wx, wy, wside = self.window
+        moved = max(abs(cx - wx), abs(cy - wy)) > self.move_threshold * wside
+        resized = abs(side - wside) > self.resize_threshold * wside
+        if moved or resized:
+            self.window = (cx, cy, side)
+        return self.window
+        
+    def extract(self, frame, bbox):
+        """
+        Cut the ROI for bbox out of frame, resized to size x size
+        Returns: (roi, offset, scale) suitable for FacialLandmarkDetector.detect_landmarks
+        """
+        cx, cy, side = self.update(bbox)
+        roi, offset, scale = square_roi(frame, (cx, cy), side, self.size, out=self._roi)
+        self._roi = roi
+        return roi, offset, scale
\ No newline at end of file
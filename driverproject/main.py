@@ -1,141 +1,296 @@
+import os
+import time
+import threading
+import argparse
 import cv2
 import numpy as np
-import time
-from datetime import datetime
-import pandas as pd
-import pygame
-import os
-from face_detector import FaceDetector
-from landmark_detector import FacialLandmarkDetector
-from drowsiness_detector import DrowsinessDetector
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from frame_processor import FrameProcessor, CarriedResults
+from pipeline import DetectionPipeline
+from frame_bus import ProcessPipeline
+from telemetry import TelemetryWriter
+from profiler import StageProfiler, AllocationProfiler
+from capture import FrameClock, is_live_source, open_source
+from alerts import AlertManager, LogSink, AudioSink, SocketSink, WebhookSink
+from startup import StartupReport, load_processor, process_start
 
 class DrowsinessDetectionSystem:
-    def __init__(self):
-        """Initialize the drowsiness detection system"""
-        # Initialize detectors
-        print("Loading models...")
-        self.face_detector = FaceDetector()
-        self.landmark_detector = FacialLandmarkDetector()
-        self.drowsiness_detector = DrowsinessDetector()
+    LANDMARK_MODES = FrameProcessor.LANDMARK_MODES
+    
+    def __init__(self, track_interval=None, tracker='landmarks', landmark_mode='crop',
+                 face_backend='ultralytics', face_model='yolov8n-face.pt', detect_size=640,
+                 roi_size=None, target_fps=None, skip_interval=None, telemetry_dir='telemetry', rotate='hour', hud=False,
+                 budget_ms=None, profile_dump=None, headless=False, profile_window=300,
+                 load_models=True, alert_socket=None, alert_webhook=None, warm_up=True,
+                 startup=None, capture=None, reuse_buffers=False, alloc_profile=False):
+        """
+        Initialize the drowsiness detection system
+        track_interval: run YOLO only every N frames and track faces in between
+        landmark_mode: 'crop', 'stable_roi' or 'full_frame', see FrameProcessor
+        face_backend: 'ultralytics', 'onnxruntime' or 'openvino', see FaceDetector
+        face_model: face detector weights (.pt, or .onnx for the exported backends)
+        detect_size, roi_size, target_fps: inference resolution policy, see FrameProcessor
+        skip_interval: reduced processing rate while the driver is clearly alert
+        telemetry_dir, rotate: where and how per-frame telemetry is recorded
+        hud: draw per-stage latency and FPS on the video
+        budget_ms, profile_dump, profile_window: see StageProfiler
+        headless: no window and no audio, e.g. for benchmarks and servers
+        alert_socket: 'host:port' to also send alerts as UDP JSON datagrams
+        alert_webhook: URL to also POST alerts to
+        warm_up: run one dummy inference per model while loading, see startup
+        startup: StartupReport to record load times in (default: a new one)
+        capture: open_source() keyword arguments (fourcc, width, height, fps,
+                 buffer_size, latest, realtime), see capture
+        reuse_buffers: read frames into a preallocated buffer and reuse the
+                       FaceMesh buffers and result objects (serial loop only)
+        alloc_profile: report per-frame allocations and GC pauses of the
+                       serial loop, see AllocationProfiler
+        load_models: False leaves model loading to worker processes, see
+                     start_detection(processes=True)
+        """
+        self.hud = hud
+        self.headless = headless
+        self.profiler = StageProfiler(window=profile_window, budget_ms=budget_ms,
+                                      dump_path=profile_dump)
+        self.startup = startup or StartupReport()
+        self.stop_requested = threading.Event()
+        self.sessions = 0
+        self.capture_options = dict(capture or {})
+        self.reuse_buffers = reuse_buffers
+        self.alloc_profiler = AllocationProfiler() if alloc_profile else None
+        self.live_source = False
+        self.processor_options = dict(track_interval=track_interval, tracker=tracker,
+                                      landmark_mode=landmark_mode, face_backend=face_backend,
+                                      face_model=face_model, detect_size=detect_size,
+                                      roi_size=roi_size, target_fps=target_fps,
+                                      skip_interval=skip_interval)
+        self.processor = None
+        self.face_detector = self.face_tracker = None
+        self.landmark_detector = self.drowsiness_detector = None
+        if load_models:
+            # Initialize detectors, both models in parallel
+            print("Loading models...")
+            self.processor = load_processor(self.processor_options, profiler=self.profiler,
+                                            warm_up=warm_up, report=self.startup)
+            self.startup.mark('models_ready')
+            self.face_detector = self.processor.face_detector
+            self.face_tracker = self.processor.face_tracker
+            self.landmark_detector = self.processor.landmark_detector
+            self.drowsiness_detector = self.processor.drowsiness_detector
         
-        # Initialize alert system
-        pygame.mixer.init()
-        if os.path.exists('assets/alarm.wav'):
-            self.alarm_sound = pygame.mixer.Sound('assets/alarm.wav')
-        else:
-            print("Warning: alarm.wav not found in assets folder")
-            self.alarm_sound = None
+        # Initialize alert system; alerts are dispatched on their own thread
+        self.alert_socket = alert_socket
+        self.alert_webhook = alert_webhook
+        self.alerts = self._create_alerts()
         
         # Initialize data collection
-        self.ear_data = []
-        self.mar_data = []
-        self.head_tilt_data = []
-        self.head_elevation_data = []
-        self.drowsy_data = []
-        self.timestamps = []
+        self.telemetry_dir = telemetry_dir
+        self.rotate = rotate
+        self.telemetry = TelemetryWriter(telemetry_dir, rotate=rotate)
         
-        # Initialize metrics
-        self.true_labels = []
-        self.predicted_labels = []
+        # Initialize metrics, confusion[true_label][predicted_label]
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
         
+    def _create_alerts(self):
+        sinks = [LogSink()]
+        if not self.headless:
+            if os.path.exists('assets/alarm.wav'):
+                try:
+                    sinks.append(AudioSink('assets/alarm.wav'))
+                except Exception as e:
+                    print(f"Warning: could not initialize audio alerts: {e}")
+            else:
+                print("Warning: alarm.wav not found in assets folder")
+        if self.alert_socket:
+            host, _, port = self.alert_socket.rpartition(':')
+            sinks.append(SocketSink(host or '127.0.0.1', int(port)))
+        if self.alert_webhook:
+            sinks.append(WebhookSink(self.alert_webhook))
+        return AlertManager(sinks)
+    
     def draw_landmarks(self, frame, landmarks):
         """Draw facial landmarks on frame"""
         for landmark_set in ['left_eye', 'right_eye', 'mouth', 'nose', 'left_ear', 'right_ear']:
-            points = landmarks[landmark_set]
-            for point in points:
-                cv2.circle(frame, tuple(point), 2, (0, 255, 0), -1)
+            points = np.asarray(landmarks[landmark_set]).astype(np.int32)
+            for x, y in points[:, :2]:
+                cv2.circle(frame, (int(x), int(y)), 2, (0, 255, 0), -1)
     
     def calculate_metrics(self):
         """Calculate model performance metrics"""
-        accuracy = accuracy_score(self.true_labels, self.predicted_labels)
-        precision = precision_score(self.true_labels, self.predicted_labels, average='binary')
-        recall = recall_score(self.true_labels, self.predicted_labels, average='binary')
-        f1 = f1_score(self.true_labels, self.predicted_labels, average='binary')
+        (tn, fp), (fn, tp) = self.confusion
+        total = tn + fp + fn + tp
+        accuracy = (tp + tn) / total if total else 0.0
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
         
         return accuracy, precision, recall, f1
     
-    def start_detection(self):
-        """Start the drowsiness detection system"""
+    def process_frame(self, frame, timestamp=None):
+        """
+        Run face, landmark and drowsiness detection on a single frame
+        timestamp: capture time in seconds, see capture.FrameClock
+        Returns: List of per-face result dictionaries
+        """
+        results = self.processor.process(frame, timestamp=timestamp)
+        self.record_results(results, timestamp)
+        return results
+    
+    def record_results(self, results, timestamp=None):
+        """Update metrics, telemetry and the alert state with the results of one frame"""
+        if isinstance(results, CarriedResults):
+            # Skipped frame: these results were recorded with the frame they came from
+            return
+        # Live timestamps are the monotonic grab time, see capture.FrameClock
+        captured = timestamp if self.live_source and timestamp is not None else None
+        if captured is not None:
+            self.profiler.record('capture_to_result', time.monotonic() - captured)
+        self.alerts.post(any(result['is_drowsy'] for result in results), timestamp,
+                         captured=captured)
+        if 'first_frame' not in self.startup.marks:
+            self.startup.mark('first_frame')
+        for result in results:
+            ear = result['ear']
+            is_drowsy = result['is_drowsy']
+            
+            # Update metrics (assuming ground truth is available)
+            # For demonstration, we'll use a simple threshold on EAR as ground truth
+            true_label = 1 if ear < 0.2 else 0
+            predicted_label = 1 if is_drowsy else 0
+            self.confusion[true_label, predicted_label] += 1
+            
+            # Collect data
+            self.telemetry.append(ear, result['mar'], result['head_tilt'],
+                                  result['head_elevation'], predicted_label, true_label,
+                                  timestamp_ns=self.telemetry.frame_ns(timestamp))
+    
+    def render_frame(self, frame, results):
+        """Draw detection results on frame"""
+        for result in results:
+            x1, y1, x2, y2 = result['bbox']
+            is_drowsy = result['is_drowsy']
+            
+            # Draw landmarks
+            self.draw_landmarks(frame, result['landmarks'])
+            
+            # Draw face rectangle
+            color = (0, 0, 255) if is_drowsy else (0, 255, 0)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            
+            # Display metrics
+            cv2.putText(frame, f"EAR: {result['ear']:.2f}", (10, 30),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(frame, f"MAR: {result['mar']:.2f}", (10, 60),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(frame, f"Head Tilt: {result['head_tilt']:.2f}", (10, 90),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(frame, f"Head Elevation: {result['head_elevation']:.2f}", (10, 120),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            if 'perclos' in result:
+                yawn = "  YAWN" if result['yawning'] else ""
+                cv2.putText(frame, f"PERCLOS: {result['perclos']:.0%}  Blinks/min: {result['blink_rate']:.0f}{yawn}",
+                            (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            
+            # Alert if drowsy
+            if is_drowsy:
+                cv2.putText(frame, "DROWSINESS ALERT!", (10, 180),
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    
+    def start_detection(self, pipelined=False, csv_path=None, source=0, processes=False):
+        """
+        Start the drowsiness detection system
+        pipelined: run capture, inference and rendering on separate threads
+        processes: run face detection and landmarks in two worker processes
+                   fed from a shared-memory frame ring, see frame_bus
+        csv_path: also export the session's telemetry to this CSV file
+        source: camera index, stream URL, video file path or 'synthetic[:WxH][@FPS]'
+        """
+        if self.telemetry.closed:
+            # Every detection session gets its own telemetry files
+            self.telemetry = TelemetryWriter(self.telemetry_dir, rotate=self.rotate)
+        if self.alerts.closed:
+            self.alerts = self._create_alerts()
+        if self.processor:
+            # A new session must not inherit the previous driver's state
+            self.processor.reset()
+        # ... nor report the previous sessions' metrics and latencies
+        self.confusion[:] = 0
+        self.profiler.reset()
+        if self.alloc_profiler:
+            self.alloc_profiler = AllocationProfiler()
+        # Reused buffers are overwritten by the next frame, which threaded
+        # pipelines start on before the previous results are rendered
+        serial = not (pipelined or processes)
+        if self.reuse_buffers and not serial:
+            print("Warning: buffer reuse only applies to the serial loop")
+        reuse = self.reuse_buffers and serial
+        if self.processor:
+            self.processor.set_reuse_buffers(reuse)
+        
         print("Starting video capture...")
-        cap = cv2.VideoCapture(0)
+        cap = open_source(source, reuse_buffers=reuse, **self.capture_options)
         
-        if not cap.isOpened():
+        if cap is None or not cap.isOpened():
             print("Error: Could not open video capture")
+            self.stop_requested.clear()
             return
+        # Recordings are timed by their own timestamps, cameras by the monotonic grab time
+        clock = FrameClock(cap, live=is_live_source(source))
+        self.live_source = clock.live
+        # A recording can wait for the disk; a live camera must not
+        self.telemetry.overflow = 'drop' if clock.live else 'block'
+        # Rows carry the frame's time, so a replay is stored on the recording's timeline
+        self.telemetry.live = clock.live
         
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    print("Error: Could not read frame")
-                    break
-                
-                # Detect faces
-                faces = self.face_detector.detect_faces(frame)
-                
-                for face in faces:
-                    # Get face ROI
-                    x1, y1, x2, y2 = face['bbox']
-                    face_roi = frame[y1:y2, x1:x2]
-                    
-                    # Detect facial landmarks
-                    landmarks = self.landmark_detector.detect_landmarks(face_roi)
-                    
-                    if landmarks:
-                        # Detect drowsiness
-                        is_drowsy, ear, mar, head_tilt, head_elevation = self.drowsiness_detector.detect_drowsiness(landmarks[0])
-                        
-                        # Collect data
-                        self.ear_data.append(ear)
-                        self.mar_data.append(mar)
-                        self.head_tilt_data.append(head_tilt)
-                        self.head_elevation_data.append(head_elevation)
-                        self.drowsy_data.append(1 if is_drowsy else 0)
-                        self.timestamps.append(datetime.now().strftime('%H:%M:%S.%f'))
-                        
-                        # Update metrics (assuming ground truth is available)
-                        # For demonstration, we'll use a simple threshold on EAR as ground truth
-                        true_label = 1 if ear < 0.2 else 0
-                        self.true_labels.append(true_label)
-                        self.predicted_labels.append(1 if is_drowsy else 0)
-                        
-                        # Draw landmarks
-                        self.draw_landmarks(frame, landmarks[0])
-                        
-                        # Draw face rectangle
-                        color = (0, 0, 255) if is_drowsy else (0, 255, 0)
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                        
-                        # Display metrics
-                        cv2.putText(frame, f"EAR: {ear:.2f}", (10, 30),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                        cv2.putText(frame, f"MAR: {mar:.2f}", (10, 60),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                        cv2.putText(frame, f"Head Tilt: {head_tilt:.2f}", (10, 90),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                        cv2.putText(frame, f"Head Elevation: {head_elevation:.2f}", (10, 120),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                        
-                        # Alert if drowsy
-                        if is_drowsy:
-                            cv2.putText(frame, "DROWSINESS ALERT!", (10, 150),
-                                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                            if self.alarm_sound:
-                                self.alarm_sound.play()
-                
-                # Display frame
-                cv2.imshow("Driver Drowsiness Detection", frame)
-                
-                # Break loop on 'q' press
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+            if processes:
+                pipeline = ProcessPipeline(self, self.processor_options)
+                pipeline.run(cap, clock)
+                pipeline.print_stats()
+            elif pipelined:
+                pipeline = DetectionPipeline(self)
+                pipeline.run(cap, clock)
+                pipeline.print_stats()
+            else:
+                self._run_serial(cap, clock)
+            self.profiler.print_summary()
+            if self.alloc_profiler and self.alloc_profiler.frames:
+                self.alloc_profiler.print_summary()
+            if self.profiler.dump_path:
+                self.profiler.dump()
+            
+            if self.face_tracker:
+                stats = self.face_tracker.stats()
+                print(f"Face tracking: {stats['full_detections']} full detections in "
+                      f"{stats['frames']} frames ({stats['fallback_detections']} fallbacks)")
+            if self.processor and self.processor.resolution:
+                stats = self.processor.resolution.stats()
+                print(f"Adaptive resolution: {stats['imgsz']}px at {stats['fps']:.1f} fps "
+                      f"(target {stats['target_fps']:.0f}, {stats['changes']} changes)")
+            if self.processor and self.processor.scheduler:
+                stats = self.processor.scheduler.stats(cap.get(cv2.CAP_PROP_FPS) or 30.0)
+                print(f"Adaptive rate: processed {stats['processed']} of {stats['frames']} frames "
+                      f"({stats['skip_rate']:.0%} skipped, ~{stats['cpu_saved_fraction']:.0%} CPU saved), "
+                      f"{stats['onsets']} onsets delayed by up to {stats['onset_delay_max_ms']:.0f}ms")
+            if hasattr(cap, 'stats'):
+                stats = cap.stats()
+                print(f"Capture: {stats['captured']} frames grabbed, {stats['dropped']} replaced "
+                      f"by newer frames before processing")
                     
         except Exception as e:
             print(f"Error during detection: {e}")
         finally:
             cap.release()
-            cv2.destroyAllWindows()
+            if not self.headless:
+                cv2.destroyAllWindows()
+            self.alerts.close()
+            self.alerts.print_stats()
+            # A stop request ends this session only; one sent before the
+            # session started (daemon mode, still queued) ends it right away
+            self.stop_requested.clear()
+            self.sessions += 1
+            if self.sessions == 1:
+                # Later sessions (daemon mode) start with the models already warm
+                self.startup.print_report()
             
             # Calculate and display metrics
             accuracy, precision, recall, f1 = self.calculate_metrics()
@@ -145,24 +300,163 @@ class DrowsinessDetectionSystem:
             print(f"Model F1-Score: {f1:.2f}")
             
             # Save collected data
-            self.save_data()
+            self.save_data(csv_path)
+    
+    def _run_serial(self, cap, clock):
+        """Capture, process and display frames one after another"""
+        profiler = self.profiler
+        allocations = self.alloc_profiler
+        if allocations:
+            allocations.start()
+        try:
+            self._serial_loop(cap, clock, profiler, allocations)
+        finally:
+            if allocations:
+                allocations.stop()
     
-    def save_data(self):
-        """Save collected data to CSV"""
+    def _serial_loop(self, cap, clock, profiler, allocations):
+        buffer = None
+        while True:
+            if allocations:
+                allocations.frame_start()
+            frame_start = time.perf_counter()
+            with profiler.stage('capture'):
+                if self.reuse_buffers:
+                    # Decoded into the previous frame's buffer once it exists
+                    ret, frame = cap.read(buffer) if buffer is not None else cap.read()
+                    buffer = frame if ret else buffer
+                else:
+                    ret, frame = cap.read()
+            if not ret:
+                print("Error: Could not read frame")
+                break
+            timestamp = clock.stamp()
+            
+            results = self.process_frame(frame, timestamp)
+            with profiler.stage('draw'):
+                self.render_frame(frame, results)
+                if self.hud:
+                    profiler.draw_overlay(frame)
+            
+            # Display frame
+            key = -1
+            if not self.headless:
+                with profiler.stage('display'):
+                    cv2.imshow("Driver Drowsiness Detection", frame)
+                    key = cv2.waitKey(1) & 0xFF
+            profiler.record('frame', time.perf_counter() - frame_start)
+            profiler.frame_done()
+            if allocations:
+                allocations.frame_done()
+            
+            # Break loop on 'q' press or a stop request (daemon mode)
+            if key == ord('q') or self.stop_requested.is_set():
+                break
+    
+    def save_data(self, csv_path=None):
+        """Flush recorded telemetry and optionally export it to CSV"""
         try:
-            df = pd.DataFrame({
-                'Timestamp': self.timestamps,
-                'EAR': self.ear_data,
-                'MAR': self.mar_data,
-                'Head_Tilt': self.head_tilt_data,
-                'Head_Elevation': self.head_elevation_data,
-                'Is_Drowsy': self.drowsy_data
-            })
-            df.to_csv('drowsiness_data.csv', index=False)
-            print("Data saved to drowsiness_data.csv")
+            self.telemetry.close()
+            stats = self.telemetry.stats()
+            print(f"Telemetry: {stats['rows_written']} rows in {len(stats['files'])} file(s) "
+                  f"under {self.telemetry.directory}")
+            if csv_path:
+                self.telemetry.export_csv(csv_path)
+                print(f"Data saved to {csv_path}")
         except Exception as e:
             print(f"Error saving data: {e}")
 
 if __name__ == "__main__":
-    system = DrowsinessDetectionSystem()
-    system.start_detection()
+    parser = argparse.ArgumentParser(description="Driver drowsiness detection")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="run capture, inference and rendering on separate threads")
+    parser.add_argument('--processes', action='store_true',
+                        help="run face detection and landmarks in separate processes over shared memory")
+    parser.add_argument('--track-interval', type=int, default=None,
+                        help="run face detection every N frames and track in between")
+    parser.add_argument('--tracker', choices=['landmarks', 'opencv'], default='landmarks',
+                        help="how face boxes are propagated between detections")
+    parser.add_argument('--landmark-mode', choices=DrowsinessDetectionSystem.LANDMARK_MODES,
+                        default='crop', help="what image FaceMesh runs on")
+    parser.add_argument('--face-backend', choices=['ultralytics', 'onnxruntime', 'openvino'],
+                        default='ultralytics', help="face detection inference backend")
+    parser.add_argument('--face-model', default='yolov8n-face.pt',
+                        help="face detector weights, e.g. an INT8 .onnx with --face-backend onnxruntime")
+    parser.add_argument('--detect-size', type=int, default=640,
+                        help="face detection resolution; frames are downscaled to this long side")
+    parser.add_argument('--roi-size', type=int, default=None,
+                        help="resize face ROIs to this fixed square size before FaceMesh")
+    parser.add_argument('--target-fps', type=float, default=None,
+                        help="adapt the detection resolution to hold this processing rate")
+    parser.add_argument('--skip-interval', type=int, default=None,
+                        help="process only every Nth frame (at most) while the driver is clearly alert")
+    parser.add_argument('--telemetry-dir', default='telemetry',
+                        help="directory for the recorded telemetry files")
+    parser.add_argument('--rotate', choices=['hour', 'session'], default='hour',
+                        help="start a new telemetry file every hour or once per session")
+    parser.add_argument('--export-csv', default=None, metavar='PATH',
+                        help="also export the session's telemetry to CSV on exit")
+    parser.add_argument('--hud', action='store_true',
+                        help="draw per-stage latency and FPS on the video")
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help="end-to-end frame latency budget to report against")
+    parser.add_argument('--profile-dump', default=None, metavar='PATH',
+                        help="periodically append latency statistics to this JSON-lines file")
+    parser.add_argument('--alert-socket', default=None, metavar='HOST:PORT',
+                        help="also send alerts as JSON datagrams to this UDP address")
+    parser.add_argument('--alert-webhook', default=None, metavar='URL',
+                        help="also POST alerts as JSON to this URL")
+    parser.add_argument('--no-warm-up', action='store_true',
+                        help="skip the dummy inference per model at startup")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep the models loaded and run sessions on request, see daemon.py")
+    parser.add_argument('--daemon-port', type=int, default=8765,
+                        help="local TCP port for daemon commands")
+    parser.add_argument('--source', default='0',
+                        help="camera index, stream URL, video file or synthetic[:WxH][@FPS]")
+    parser.add_argument('--fourcc', default=None, choices=['MJPG', 'YUYV'],
+                        help="camera pixel format")
+    parser.add_argument('--width', type=int, default=None, help="camera frame width")
+    parser.add_argument('--height', type=int, default=None, help="camera frame height")
+    parser.add_argument('--fps', type=float, default=None, help="camera frame rate")
+    parser.add_argument('--buffer-size', type=int, default=1,
+                        help="frames the camera driver may queue")
+    parser.add_argument('--no-latest', action='store_true',
+                        help="read every camera frame in order instead of only the newest")
+    parser.add_argument('--realtime', action='store_true',
+                        help="pace a video file at its frame rate, dropping frames like a camera")
+    parser.add_argument('--reuse-buffers', action='store_true',
+                        help="reuse frame, color-conversion and result buffers in the serial loop")
+    parser.add_argument('--alloc-profile', action='store_true',
+                        help="report per-frame allocations and GC pauses (tracemalloc, slower)")
+    args = parser.parse_args()
+    source = int(args.source) if args.source.isdigit() else args.source
+    startup = StartupReport(start=process_start())
+    startup.mark('imported')
+    
+    system = DrowsinessDetectionSystem(track_interval=args.track_interval, tracker=args.tracker,
+                                       landmark_mode=args.landmark_mode, face_backend=args.face_backend,
+                                       face_model=args.face_model, detect_size=args.detect_size,
+                                       roi_size=args.roi_size, target_fps=args.target_fps,
+                                       skip_interval=args.skip_interval,
+                                       telemetry_dir=args.telemetry_dir, rotate=args.rotate,
+                                       hud=args.hud, budget_ms=args.budget_ms,
+                                       profile_dump=args.profile_dump,
+                                       load_models=not args.processes,
+                                       alert_socket=args.alert_socket,
+                                       alert_webhook=args.alert_webhook,
+                                       warm_up=not args.no_warm_up, startup=startup,
+                                       capture=dict(fourcc=args.fourcc, width=args.width,
+                                                    height=args.height, fps=args.fps,
+                                                    buffer_size=args.buffer_size,
+                                                    latest=not args.no_latest,
+                                                    realtime=args.realtime),
+                                       reuse_buffers=args.reuse_buffers,
+                                       alloc_profile=args.alloc_profile)
+    if args.daemon:
+        from daemon import DetectionDaemon
+        startup.print_report()
+        DetectionDaemon(system, port=args.daemon_port).serve()
+    else:
+        system.start_detection(pipelined=args.pipelined, csv_path=args.export_csv, source=source,
+                               processes=args.processes)
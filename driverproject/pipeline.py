@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+import cv2
+from profiler import StageProfiler
+from capture import FrameClock
+
+
+class DropOldestQueue:
+    def __init__(self, maxsize=2):
+        """Bounded queue that discards the oldest item instead of blocking"""
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """Add item, dropping the oldest queued item if the queue is full"""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Wait for the next item
+        Returns: Item, or None once the queue is closed and empty or on timeout
+        """
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        """Wake up all waiting consumers and stop accepting new items"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def qsize(self):
+        return len(self._items)
+
+
+class DetectionPipeline:
+    def __init__(self, system, queue_size=2, report_interval=5.0,
+                 window_name="Driver Drowsiness Detection", profiler=None):
+        """
+        Staged capture -> inference -> render pipeline around a DrowsinessDetectionSystem
+
+        Capture and inference run on worker threads connected by bounded
+        drop-oldest queues, so inference always picks up the freshest frame.
+        Rendering, alerts and cv2.imshow stay on the calling thread because
+        HighGUI is not thread-safe on every platform.
+        Stage timings go to profiler (the system's StageProfiler by default);
+        'frame' is the capture-to-display latency including queue waits.
+        """
+        self.system = system
+        self.report_interval = report_interval
+        self.window_name = window_name
+
+        self.frame_queue = DropOldestQueue(queue_size)
+        self.result_queue = DropOldestQueue(queue_size)
+        self.profiler = profiler or getattr(system, 'profiler', None) or StageProfiler()
+
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _capture_loop(self, cap, clock):
+        """Read frames from the camera as fast as it delivers them"""
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret:
+                    print("Error: Could not read frame")
+                    break
+                timestamp = clock.stamp()
+                self.profiler.record('capture', time.perf_counter() - start)
+                self.frame_queue.put((frame, start, timestamp))
+        finally:
+            self.frame_queue.close()
+
+    def _inference_loop(self):
+        """Run detection on the newest available frame"""
+        try:
+            while not self._stop.is_set():
+                item = self.frame_queue.get(timeout=0.1)
+                if item is None:
+                    if self.frame_queue.closed:
+                        break
+                    continue
+
+                frame, captured, timestamp = item
+                with self.profiler.stage('inference'):
+                    try:
+                        results = self.system.process_frame(frame, timestamp)
+                    except Exception as e:
+                        print(f"Error in inference stage: {e}")
+                        results = []
+                self.result_queue.put((frame, captured, results))
+        finally:
+            self.result_queue.close()
+
+    def run(self, cap, clock=None):
+        """
+        Run the pipeline until 'q' is pressed or the capture ends
+        clock: capture.FrameClock timing the frames (default: live, monotonic)
+        """
+        clock = clock or FrameClock(cap, live=True)
+        self._threads = [
+            threading.Thread(target=self._capture_loop, args=(cap, clock), name='capture', daemon=True),
+            threading.Thread(target=self._inference_loop, name='inference', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        last_report = time.perf_counter()
+        try:
+            while True:
+                item = self.result_queue.get(timeout=0.1)
+                if item is None:
+                    if self.result_queue.closed:
+                        break
+                    continue
+
+                frame, captured, results = item
+                with self.profiler.stage('draw'):
+                    self.system.render_frame(frame, results)
+                    if getattr(self.system, 'hud', False):
+                        self.profiler.draw_overlay(frame)
+                key = -1
+                if not getattr(self.system, 'headless', False):
+                    with self.profiler.stage('display'):
+                        cv2.imshow(self.window_name, frame)
+                        key = cv2.waitKey(1) & 0xFF
+                self.profiler.record('frame', time.perf_counter() - captured)
+                self.profiler.frame_done()
+
+                stop = getattr(self.system, 'stop_requested', None)
+                if key == ord('q') or (stop is not None and stop.is_set()):
+                    break
+
+                if self.report_interval and time.perf_counter() - last_report >= self.report_interval:
+                    self.print_stats()
+                    last_report = time.perf_counter()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Signal worker threads to exit and wait for them"""
+        self._stop.set()
+        self.frame_queue.close()
+        self.result_queue.close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+
+    def stats(self):
+        """
+        Snapshot of pipeline health
+        Returns: Dictionary with per-stage latency, queue depths and dropped frame counts
+        """
+        return {
+            'stages': self.profiler.summary()['stages'],
+            'queues': {
+                'frames': {'depth': self.frame_queue.qsize(), 'dropped': self.frame_queue.dropped},
+                'results': {'depth': self.result_queue.qsize(), 'dropped': self.result_queue.dropped}
+            }
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        stages = ", ".join(
+            f"{name}: {s['mean_ms']:.1f}ms" for name, s in stats['stages'].items())
+        queues = ", ".join(
+            f"{name}: depth={q['depth']} dropped={q['dropped']}" for name, q in stats['queues'].items())
+        print(f"Pipeline stages - {stages}")
+        print(f"Pipeline queues - {queues}")
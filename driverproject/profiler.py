@@ -0,0 +1,264 @@
+import gc
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import cv2
+import numpy as np
+
+
+class StageProfiler:
+    def __init__(self, window=300, enabled=True, budget_ms=None,
+                 dump_path=None, dump_interval=10.0):
+        """
+        Rolling per-stage wall-time statistics for the detection loop
+
+        window: number of recent samples kept per stage for percentiles
+        budget_ms: end-to-end frame latency budget; summary() reports how
+                   often the 'frame' stage exceeded it
+        dump_path: append a JSON line with summary() every dump_interval seconds
+        """
+        self.window = window
+        self.enabled = enabled
+        self.budget_ms = budget_ms
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+
+        self._samples = {}
+        self._counts = {}
+        self._over_budget = 0
+        self._frame_times = deque(maxlen=window)
+        self._last_dump = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Drop all samples, e.g. at the start of a new session"""
+        with self._lock:
+            self._samples = {}
+            self._counts = {}
+            self._over_budget = 0
+            self._frame_times.clear()
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def stage(self, name):
+        """Context manager timing one execution of a stage"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+            samples.append(seconds * 1000.0)
+            self._counts[name] += 1
+            if name == 'frame' and self.budget_ms is not None and seconds * 1000.0 > self.budget_ms:
+                self._over_budget += 1
+
+    def frame_done(self):
+        """Mark the end of a frame for FPS, and dump statistics when due"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            self._frame_times.append(now)
+        if self.dump_path and now - self._last_dump >= self.dump_interval:
+            self._last_dump = now
+            self.dump()
+
+    def fps(self):
+        with self._lock:
+            times = list(self._frame_times)
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def summary(self):
+        """
+        Returns: Dictionary with FPS and, per stage, sample count and
+                 last/mean/p50/p95/p99/max latency in milliseconds
+        """
+        with self._lock:
+            stages = {name: (np.array(samples), self._counts[name])
+                      for name, samples in self._samples.items()}
+            over_budget = self._over_budget
+
+        report = {'timestamp': time.time(), 'fps': self.fps(), 'stages': {}}
+        for name, (samples, count) in stages.items():
+            if not len(samples):
+                continue
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            report['stages'][name] = {
+                'count': count,
+                'last_ms': float(samples[-1]),
+                'mean_ms': float(samples.mean()),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'max_ms': float(samples.max())
+            }
+        if self.budget_ms is not None:
+            frames = report['stages'].get('frame', {}).get('count', 0)
+            report['budget_ms'] = self.budget_ms
+            report['over_budget'] = over_budget
+            report['over_budget_rate'] = over_budget / frames if frames else 0.0
+        return report
+
+    def dump(self, path=None):
+        """Append the current summary as one JSON line"""
+        path = path or self.dump_path
+        try:
+            with open(path, 'a') as f:
+                f.write(json.dumps(self.summary()) + '\n')
+        except Exception as e:
+            print(f"Error writing profile dump: {e}")
+
+    def draw_overlay(self, frame, origin=None):
+        """Draw FPS and per-stage p50/p95 latency in the top-right corner of frame"""
+        if not self.enabled:
+            return
+        report = self.summary()
+        lines = [f"FPS: {report['fps']:.1f}"]
+        for name, stats in report['stages'].items():
+            lines.append(f"{name}: {stats['p50_ms']:.1f}/{stats['p95_ms']:.1f} ms")
+
+        x, y = origin if origin else (frame.shape[1] - 230, 20)
+        for line in lines:
+            cv2.putText(frame, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 0), 1)
+            y += 18
+
+    def print_summary(self):
+        report = self.summary()
+        print(f"Performance: {report['fps']:.1f} fps")
+        for name, stats in report['stages'].items():
+            print(f"  {name:>10}: p50 {stats['p50_ms']:.2f}ms  p95 {stats['p95_ms']:.2f}ms  "
+                  f"p99 {stats['p99_ms']:.2f}ms  ({stats['count']} samples)")
+        if 'over_budget' in report:
+            print(f"  {report['over_budget']} frames over the {report['budget_ms']:.0f}ms budget "
+                  f"({report['over_budget_rate']:.1%})")
+
+
+class AllocationProfiler:
+    def __init__(self, window=300, warm_up=30, top=5):
+        """
+        Per-frame Python heap allocations and garbage collector pauses
+
+        Uses tracemalloc (which also sees NumPy buffers), so it slows the loop
+        down and is meant for measurement runs. Per frame it records the
+        transient peak above the heap size at frame start, the bytes and
+        blocks still allocated at frame end, and every GC pause.
+        warm_up: frames before the baseline snapshot, so buffers allocated
+                 once at startup do not show up as allocation sites
+        top: allocation sites reported, by growth since the baseline
+        """
+        self.window = window
+        self.warm_up = warm_up
+        self.top = top
+        self.frames = 0
+        self._peaks = deque(maxlen=window)
+        self._retained = deque(maxlen=window)
+        self._blocks = deque(maxlen=window)
+        self._gc_pauses = deque(maxlen=window)
+        self._collections = [0, 0, 0]
+        self._gc_start = None
+        self._frame_start = None
+        self._baseline = None
+        self._sites = []
+        self.running = False
+
+    def _gc_callback(self, phase, info):
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self._gc_pauses.append((time.perf_counter() - self._gc_start) * 1000.0)
+            self._collections[info['generation']] += 1
+            self._gc_start = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        tracemalloc.start()
+        gc.callbacks.append(self._gc_callback)
+
+    def frame_start(self):
+        if not self.running:
+            return
+        tracemalloc.reset_peak()
+        self._frame_start = (tracemalloc.get_traced_memory()[0], sys.getallocatedblocks())
+
+    def frame_done(self):
+        if not self.running or self._frame_start is None:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        start_bytes, start_blocks = self._frame_start
+        self._peaks.append(peak - start_bytes)
+        self._retained.append(current - start_bytes)
+        self._blocks.append(sys.getallocatedblocks() - start_blocks)
+        self.frames += 1
+        if self.frames == self.warm_up:
+            self._baseline = tracemalloc.take_snapshot()
+
+    def stop(self):
+        """Stop tracing and record the top allocation sites since the baseline"""
+        if not self.running:
+            return
+        if self._baseline is not None:
+            snapshot = tracemalloc.take_snapshot()
+            # Leave out tracemalloc itself and the profilers' own sample windows
+            filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                       tracemalloc.Filter(False, __file__)]
+            stats = snapshot.filter_traces(filters).compare_to(
+                self._baseline.filter_traces(filters), 'lineno')
+            self._sites = [(str(stat.traceback), stat.size_diff, stat.count_diff)
+                           for stat in stats[:self.top] if stat.size_diff > 0]
+        gc.callbacks.remove(self._gc_callback)
+        tracemalloc.stop()
+        self.running = False
+
+    def summary(self):
+        """
+        Returns: Dictionary with per-frame transient peak and retained bytes
+                 (p50/p95/max), net allocated blocks, GC collections per
+                 generation and pause times, and the top allocation sites
+        """
+        peaks, retained = np.array(self._peaks), np.array(self._retained)
+        pauses = np.array(self._gc_pauses)
+        return {
+            'frames': self.frames,
+            'peak_bytes_p50': float(np.percentile(peaks, 50)) if len(peaks) else 0.0,
+            'peak_bytes_p95': float(np.percentile(peaks, 95)) if len(peaks) else 0.0,
+            'peak_bytes_max': float(peaks.max()) if len(peaks) else 0.0,
+            'retained_bytes_mean': float(retained.mean()) if len(retained) else 0.0,
+            'blocks_mean': float(np.mean(self._blocks)) if self._blocks else 0.0,
+            'gc_collections': list(self._collections),
+            'gc_pause_p50_ms': float(np.percentile(pauses, 50)) if len(pauses) else 0.0,
+            'gc_pause_max_ms': float(pauses.max()) if len(pauses) else 0.0,
+            'sites': self._sites
+        }
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"Allocations per frame ({s['frames']} frames): transient peak "
+              f"p50 {s['peak_bytes_p50'] / 1024:.1f}KiB p95 {s['peak_bytes_p95'] / 1024:.1f}KiB "
+              f"max {s['peak_bytes_max'] / 1024:.1f}KiB, retained {s['retained_bytes_mean']:.0f}B, "
+              f"{s['blocks_mean']:.1f} blocks")
+        gen0, gen1, gen2 = s['gc_collections']
+        print(f"  GC: {gen0}/{gen1}/{gen2} collections (gen 0/1/2), "
+              f"pause p50 {s['gc_pause_p50_ms']:.2f}ms max {s['gc_pause_max_ms']:.2f}ms")
+        for site, size, count in s['sites']:
+            print(f"  +{size / 1024:.1f}KiB in {count:+d} blocks: {site}")
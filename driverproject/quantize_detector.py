@@ -0,0 +1,168 @@
+"""
+Post-training INT8 quantization of the YOLO face detector
+
+Exports the fp32 model to ONNX, calibrates activation ranges on frames
+sampled from recorded videos and writes a statically quantized (QDQ)
+model for the 'onnxruntime' FaceDetector backend.
+Usage:
+    python quantize_detector.py recordings/ --model yolov8n-face.pt --output yolov8n-face.int8.onnx
+    python benchmarks/compare_detectors.py recordings/ --candidate yolov8n-face.int8.onnx
+"""
+import os
+import argparse
+import numpy as np
+import cv2
+from batch_processor import find_videos
+from face_backends import make_blob, export_onnx
+
+
+def sample_frames(videos, count=200, seed=0):
+    """
+    Sample count frames uniformly at random across all videos
+    Returns: List of BGR frames
+    """
+    lengths = []
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        lengths.append(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0)
+        cap.release()
+    total = sum(lengths)
+    if total == 0:
+        return []
+
+    rng = np.random.default_rng(seed)
+    chosen = np.sort(rng.choice(total, size=min(count, total), replace=False))
+
+    frames = []
+    offset = 0
+    for video, length in zip(videos, lengths):
+        wanted = set((chosen[(chosen >= offset) & (chosen < offset + length)] - offset).tolist())
+        offset += length
+        if not wanted:
+            continue
+        cap = cv2.VideoCapture(video)
+        try:
+            last = max(wanted)
+            for index in range(last + 1):
+                # grab() skips decoding into a new image for frames we do not keep
+                if not cap.grab():
+                    break
+                if index in wanted:
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        frames.append(frame)
+        finally:
+            cap.release()
+    return frames
+
+
+def head_nodes(onnx_path):
+    """
+    Names of the YOLOv8 box decoding nodes (DFL, anchors, concat) in an
+    ultralytics export; they are kept in float because coordinate outputs
+    lose far more accuracy from INT8 than the convolutions do
+    """
+    import onnx
+    graph = onnx.load(onnx_path).graph
+    indices = [int(node.name.split('/')[1].split('.')[1]) for node in graph.node
+               if node.name.startswith('/model.') and node.name.split('/')[1].split('.')[1].isdigit()]
+    if not indices:
+        return []
+    prefix = f"/model.{max(indices)}/"
+    excluded = []
+    for node in graph.node:
+        if node.name.startswith(prefix):
+            rest = node.name[len(prefix):]
+            if rest.startswith('dfl/') or '/' not in rest:
+                excluded.append(node.name)
+    return excluded
+
+
+def quantize_detector(model_path, frames, output_path, imgsz=640, per_channel=True, keep_head_fp32=True):
+    """
+    Statically quantize the face detector to INT8 with ONNX Runtime
+    model_path: .pt (exported to ONNX first) or fp32 .onnx model
+    frames: BGR calibration frames, see sample_frames
+    Returns: Path of the quantized model
+    """
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod,
+                                          QuantFormat, QuantType, quantize_static)
+
+    if not frames:
+        raise ValueError("No calibration frames")
+    if model_path.endswith('.pt'):
+        model_path = export_onnx(model_path, imgsz)
+
+    # Shape inference and graph cleanup before calibration, when available
+    source_path = model_path
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        source_path = os.path.splitext(output_path)[0] + '.prep.onnx'
+        quant_pre_process(model_path, source_path)
+    except Exception as e:
+        print(f"Skipping quantization pre-processing: {e}")
+        source_path = model_path
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(source_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            return {input_name: make_blob(frame, imgsz)[0]}
+
+        def rewind(self):
+            self._frames = iter(frames)
+
+    excluded = head_nodes(source_path) if keep_head_fp32 else []
+    print(f"Calibrating on {len(frames)} frames, keeping {len(excluded)} head nodes in fp32...")
+    quantize_static(source_path, output_path, FrameReader(),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=per_channel,
+                    calibrate_method=CalibrationMethod.MinMax,
+                    nodes_to_exclude=excluded)
+
+    if source_path != model_path and os.path.exists(source_path):
+        os.remove(source_path)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization of the face detector")
+    parser.add_argument('inputs', nargs='+', help="recorded videos or directories to calibrate on")
+    parser.add_argument('--model', default='yolov8n-face.pt', help="fp32 .pt or .onnx model")
+    parser.add_argument('--output', default=None, help="quantized model path (default: <model>.int8.onnx)")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--calibration-frames', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--per-tensor', action='store_true', help="per-tensor instead of per-channel weights")
+    parser.add_argument('--quantize-head', action='store_true',
+                        help="also quantize the box decoding head (faster, less accurate)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("Error: No videos found")
+        return
+    output = args.output or os.path.splitext(args.model)[0] + '.int8.onnx'
+
+    frames = sample_frames(videos, args.calibration_frames, args.seed)
+    print(f"Sampled {len(frames)} calibration frames from {len(videos)} videos")
+    quantize_detector(args.model, frames, output, imgsz=args.imgsz,
+                      per_channel=not args.per_tensor, keep_head_fp32=not args.quantize_head)
+
+    size = os.path.getsize(output) / 1e6
+    print(f"INT8 model written to {output} ({size:.1f} MB)")
+    print(f"Compare against fp32 with: python benchmarks/compare_detectors.py "
+          f"{' '.join(args.inputs)} --reference {args.model} --candidate {output} --seed {args.seed + 1}")
+
+
+if __name__ == "__main__":
+    main()
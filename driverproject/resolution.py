@@ -0,0 +1,74 @@
+# Detection resolutions the adaptive policy steps between, multiples of the YOLO stride
+RESOLUTION_LEVELS = (256, 320, 416, 512, 640)
+
+
+class AdaptiveResolution:
+    def __init__(self, detector, target_fps, levels=RESOLUTION_LEVELS, smoothing=0.1,
+                 headroom=1.3, cooldown=30):
+        """
+        Step the face detector's inference resolution down when the processing
+        rate falls below target_fps and back up when there is spare time
+
+        detector: FaceDetector whose backend accepts a variable input size
+        smoothing: weight of the newest frame time in the moving average
+        headroom: step up only when running this much faster than target_fps
+        cooldown: frames to wait after a change before deciding again, so the
+                  average reflects the new resolution
+        """
+        if detector.fixed_shape:
+            raise ValueError(f"Adaptive resolution needs a variable input size; the "
+                             f"{detector.backend_name} backend is fixed at {detector.imgsz}px")
+        self.detector = detector
+        self.target_fps = target_fps
+        # Never step above the configured size
+        self.max_imgsz = detector.imgsz
+        self.levels = sorted({size for size in levels if size < self.max_imgsz} | {self.max_imgsz})
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.cooldown = cooldown
+
+        # Start at the configured size, the top level
+        self.level = len(self.levels) - 1
+
+        self.frame_time = None
+        self.changes = 0
+        self._since_change = 0
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level]
+
+    def update(self, seconds):
+        """
+        Feed the processing time of one frame
+        Returns: Current inference resolution
+        """
+        if self.frame_time is None:
+            self.frame_time = seconds
+        else:
+            self.frame_time += self.smoothing * (seconds - self.frame_time)
+        self._since_change += 1
+        if self._since_change < self.cooldown or self.frame_time <= 0:
+            return self.imgsz
+
+        fps = 1.0 / self.frame_time
+        if fps < self.target_fps and self.level > 0:
+            self._set_level(self.level - 1)
+        elif fps > self.target_fps * self.headroom and self.level < len(self.levels) - 1:
+            self._set_level(self.level + 1)
+        return self.imgsz
+
+    def _set_level(self, level):
+        self.level = level
+        self.detector.set_imgsz(self.levels[level])
+        self.changes += 1
+        self._since_change = 0
+
+    def stats(self):
+        return {
+            'imgsz': self.imgsz,
+            'fps': 1.0 / self.frame_time if self.frame_time else 0.0,
+            'max_imgsz': self.max_imgsz,
+            'target_fps': self.target_fps,
+            'changes': self.changes
+        }
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+class FrameScheduler:
+    def __init__(self, drowsiness_detector, max_interval=4, ear_margin=0.08,
+                 tilt_margin=8.0, motion_threshold=4.0, calm_frames=15):
+        """
+        Decide per frame whether the full pipeline has to run, based on how
+        far the driver is from the drowsiness thresholds
+
+        While EAR stays ear_margin above ear_threshold, the head tilt stays
+        tilt_margin inside head_tilt_threshold and the head is still, the
+        processing interval doubles every calm_frames processed frames up to
+        max_interval. Any sign of trouble (frame_counter > 0, EAR or tilt near
+        a threshold, head motion, lost face) drops straight back to every frame.
+
+        motion_threshold: change in degrees of tilt (or pixels of elevation)
+                          between processed frames that counts as movement
+        """
+        self.detector = drowsiness_detector
+        self.max_interval = max(1, int(max_interval))
+        self.ear_margin = ear_margin
+        self.tilt_margin = tilt_margin
+        self.motion_threshold = motion_threshold
+        self.calm_frames = calm_frames
+
+        self.interval = 1
+        self._since_processed = 0
+        self._calm = 0
+        self._last_pose = None
+        self._was_counting = False
+
+        # Statistics
+        self.frames = 0
+        self.processed = 0
+        self.ramp_ups = 0
+        self.cpu_time = 0.0
+        self.onset_intervals = []
+
+    def reset(self):
+        """Start over for a new stream, statistics included"""
+        self.frames = 0
+        self.processed = 0
+        self.ramp_ups = 0
+        self.cpu_time = 0.0
+        self.onset_intervals = []
+        self.interval = 1
+        self._since_processed = 0
+        self._calm = 0
+        self._last_pose = None
+        self._was_counting = False
+
+    def should_process(self):
+        """Call once per frame; Returns: True if this frame needs the full pipeline"""
+        self.frames += 1
+        self._since_processed += 1
+        if self._since_processed >= self.interval:
+            self._since_processed = 0
+            return True
+        return False
+
+    def update(self, results, cpu_seconds=0.0):
+        """Feed the results of a processed frame and its CPU time"""
+        self.processed += 1
+        self.cpu_time += cpu_seconds
+
+        detector = self.detector
+        counting = detector.frame_counter > 0
+        if counting and not self._was_counting:
+            # A possible episode starts here; it may have begun up to interval - 1 frames earlier
+            self.onset_intervals.append(self.interval)
+        self._was_counting = counting
+
+        if not results or counting:
+            self._ramp_up()
+            return
+
+        result = results[0]
+        pose = (result['head_tilt'], result['head_elevation'])
+        moving = self._last_pose is not None and max(
+            abs(pose[0] - self._last_pose[0]), abs(pose[1] - self._last_pose[1])) > self.motion_threshold
+        self._last_pose = pose
+
+        near_threshold = (result['ear'] < detector.ear_threshold + self.ear_margin
+                          or abs(result['head_tilt']) > detector.head_tilt_threshold - self.tilt_margin)
+        if near_threshold or moving:
+            self._ramp_up()
+            return
+
+        self._calm += 1
+        if self._calm >= self.calm_frames and self.interval < self.max_interval:
+            self.interval = min(self.interval * 2, self.max_interval)
+            self._calm = 0
+
+    def _ramp_up(self):
+        if self.interval > 1:
+            self.ramp_ups += 1
+        self.interval = 1
+        self._calm = 0
+        self._since_processed = 0
+
+    def stats(self, fps=None):
+        """
+        fps: frame rate of the source, to express the added delay in milliseconds
+        Returns: Dictionary with skip rate, estimated CPU saved and the
+                 worst-case detection delay added at episode onsets
+        """
+        skipped = self.frames - self.processed
+        cost = self.cpu_time / self.processed if self.processed else 0.0
+        onsets = np.array(self.onset_intervals) - 1
+        stats = {
+            'frames': self.frames,
+            'processed': self.processed,
+            'skipped': skipped,
+            'skip_rate': skipped / self.frames if self.frames else 0.0,
+            'interval': self.interval,
+            'ramp_ups': self.ramp_ups,
+            'cpu_per_frame_ms': cost * 1000.0,
+            # Pipeline CPU the skipped frames would have cost at the measured per-frame cost
+            'cpu_saved_s': skipped * cost,
+            'cpu_saved_fraction': skipped * cost / (self.cpu_time + skipped * cost) if cost else 0.0,
+            'onsets': len(onsets),
+            'onset_delay_mean_frames': float(onsets.mean()) if len(onsets) else 0.0,
+            'onset_delay_max_frames': int(onsets.max()) if len(onsets) else 0
+        }
+        if fps:
+            stats['onset_delay_mean_ms'] = stats['onset_delay_mean_frames'] * 1000.0 / fps
+            stats['onset_delay_max_ms'] = stats['onset_delay_max_frames'] * 1000.0 / fps
+        return stats
@@ -0,0 +1,320 @@
+"""
+Multi-camera depot server
+
+Monitors many camera streams (RTSP URLs, device indices or video files)
+from one process. Every stream is read on its own thread into a
+latest-frame slot; the main loop takes at most one fresh frame per stream
+per round, runs YOLO once on the whole batch and then FaceMesh and the
+drowsiness features with that stream's own state.
+Usage: python server.py rtsp://cam1/stream rtsp://cam2/stream --batch-size 8
+"""
+import os
+import time
+import json
+import threading
+import argparse
+from collections import deque
+import cv2
+import numpy as np
+from face_detector import FaceDetector
+from frame_processor import FrameProcessor
+from telemetry import TelemetryWriter
+from capture import FrameClock
+from alerts import AlertManager, LogSink
+
+
+class StreamReader:
+    def __init__(self, name, source, realtime=None):
+        """
+        Read one stream on a background thread, keeping only the newest frame
+        realtime: pace reads at the stream's FPS; defaults to True for files so
+                  a recording behaves like a live camera
+        """
+        self.name = name
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open stream {name}: {source}")
+        is_file = isinstance(source, str) and os.path.isfile(source)
+        self.realtime = is_file if realtime is None else realtime
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.clock = FrameClock(self.cap, live=not is_file)
+
+        self.captured = 0
+        self.dropped = 0  # frames replaced before the server took them
+        self.finished = False
+        self._latest = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read_loop, name=f"stream-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _read_loop(self):
+        interval = 1.0 / self.fps
+        next_read = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                if self.realtime:
+                    delay = next_read - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_read += interval
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                captured = time.perf_counter()
+                timestamp = self.clock.stamp()
+                with self._lock:
+                    if self._latest is not None:
+                        self.dropped += 1
+                    self._latest = (frame, captured, timestamp)
+                    self.captured += 1
+        finally:
+            self.finished = True
+            self.cap.release()
+
+    def take(self):
+        """Returns: (frame, capture time, frame timestamp) of the newest unseen frame, or None"""
+        with self._lock:
+            item, self._latest = self._latest, None
+        return item
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+
+
+class StreamState:
+    def __init__(self, reader, processor, alerts, telemetry=None, window=300):
+        """Per-stream detector state and service statistics; alerts: the shared AlertManager"""
+        self.reader = reader
+        self.processor = processor
+        self.alerts = alerts
+        self.telemetry = telemetry
+        self.processed = 0
+        self.latencies = deque(maxlen=window)  # capture -> processed, seconds
+        self.served_at = deque(maxlen=window)
+        self.results = []
+
+    @property
+    def name(self):
+        return self.reader.name
+
+    def record(self, results, captured, timestamp=None):
+        now = time.perf_counter()
+        self.processed += 1
+        self.latencies.append(now - captured)
+        self.served_at.append(now)
+        self.results = results
+        self.alerts.post(any(result['is_drowsy'] for result in results), timestamp, stream=self.name)
+
+        if self.telemetry and results:
+            result = results[0]
+            self.telemetry.append(result['ear'], result['mar'], result['head_tilt'],
+                                  result['head_elevation'], result['is_drowsy'],
+                                  timestamp_ns=self.telemetry.frame_ns(timestamp))
+
+    def fps(self):
+        times = self.served_at
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000.0
+        reader = self.reader
+        return {
+            'captured': reader.captured,
+            'processed': self.processed,
+            'dropped': reader.dropped,
+            'fps': self.fps(),
+            'source_fps': reader.fps,
+            # Share of the camera's frames this stream got processed
+            'service_ratio': self.processed / reader.captured if reader.captured else 0.0,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'latency_p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            'alerts': self.alerts.stats()['streams'].get(self.name, 0),
+            'finished': reader.finished
+        }
+
+
+def jain_fairness(values):
+    """Jain's fairness index: 1.0 when all values are equal, 1/n when one takes everything"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values) or not values.any():
+        return 1.0
+    return float(values.sum() ** 2 / (len(values) * (values ** 2).sum()))
+
+
+class MultiStreamServer:
+    def __init__(self, sources, batch_size=None, face_backend='ultralytics',
+                 face_model='yolov8n-face.pt', detect_size=640, landmark_mode='crop',
+                 roi_size=None, max_faces=1, telemetry_dir=None, realtime=None,
+                 report_interval=10.0, alert_sinks=None):
+        """
+        sources: {name: RTSP URL, camera index or video file}
+        batch_size: streams per YOLO call (default: all streams)
+        telemetry_dir: record one telemetry session per stream when set
+        alert_sinks: where alerts of all streams go (default: log only), see alerts
+        """
+        self.batch_size = batch_size or len(sources)
+        self.report_interval = report_interval
+        exported = face_backend != 'ultralytics'
+        self.face_detector = FaceDetector(face_model, backend=face_backend, imgsz=detect_size,
+                                          batch=self.batch_size if exported else 1)
+
+        self.alerts = AlertManager(alert_sinks or [LogSink()])
+        self.streams = []
+        for name, source in sources.items():
+            reader = StreamReader(name, source, realtime=realtime)
+            # Shared YOLO, but FaceMesh tracking and drowsiness timers are per stream
+            processor = FrameProcessor(landmark_mode=landmark_mode, roi_size=roi_size,
+                                       max_faces=max_faces, face_detector=self.face_detector)
+            telemetry = (TelemetryWriter(telemetry_dir, session=name, live=reader.clock.live)
+                         if telemetry_dir else None)
+            self.streams.append(StreamState(reader, processor, self.alerts, telemetry))
+
+        self.batches = 0
+        self.batch_sizes = deque(maxlen=1000)
+        self._next = 0
+        self._stop = threading.Event()
+
+    def _collect(self):
+        """
+        Take up to batch_size fresh frames, one per stream, starting after the
+        stream served last in the previous round so every stream gets a turn
+        """
+        batch = []
+        count = len(self.streams)
+        for offset in range(count):
+            index = (self._next + offset) % count
+            item = self.streams[index].reader.take()
+            if item is not None:
+                batch.append((self.streams[index], item))
+                if len(batch) == self.batch_size:
+                    self._next = (index + 1) % count
+                    return batch
+        self._next = (self._next + 1) % count
+        return batch
+
+    def run(self, duration=None):
+        """Serve all streams until they end, duration seconds pass or stop() is called"""
+        for stream in self.streams:
+            stream.reader.start()
+
+        start = last_report = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                batch = self._collect()
+                if not batch:
+                    if all(stream.reader.finished for stream in self.streams):
+                        break
+                    time.sleep(0.001)
+                    continue
+
+                frames = [item[0] for _, item in batch]
+                detections = self.face_detector.detect_faces_batch(frames)
+                self.batches += 1
+                self.batch_sizes.append(len(batch))
+                for (stream, (frame, captured, timestamp)), faces in zip(batch, detections):
+                    try:
+                        results = stream.processor.process(frame, faces=faces, timestamp=timestamp)
+                    except Exception as e:
+                        print(f"[{stream.name}] Error processing frame: {e}")
+                        results = []
+                    stream.record(results, captured, timestamp)
+
+                now = time.perf_counter()
+                if duration and now - start >= duration:
+                    break
+                if self.report_interval and now - last_report >= self.report_interval:
+                    self.print_stats()
+                    last_report = now
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        for stream in self.streams:
+            stream.reader.stop()
+            if stream.telemetry:
+                stream.telemetry.close()
+        self.alerts.close()
+
+    def stats(self):
+        """
+        Returns: Dictionary with per-stream FPS, drops and latency, the mean
+                 batch size and Jain's fairness index over service ratios
+        """
+        streams = {stream.name: stream.stats() for stream in self.streams}
+        return {
+            'streams': streams,
+            'batches': self.batches,
+            'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            'fairness': jain_fairness([s['service_ratio'] for s in streams.values()]),
+            'alerts': self.alerts.stats()
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"Server: {stats['batches']} batches, mean batch {stats['mean_batch_size']:.1f}, "
+              f"fairness {stats['fairness']:.3f}")
+        for name, s in stats['streams'].items():
+            print(f"  {name:>12}: {s['fps']:5.1f} fps ({s['service_ratio']:.0%} of {s['source_fps']:.0f}), "
+                  f"dropped {s['dropped']}, latency p50 {s['latency_p50_ms']:.0f}ms "
+                  f"p95 {s['latency_p95_ms']:.0f}ms, alerts {s['alerts']}")
+
+
+def parse_sources(values):
+    """'name=url' or bare url/index/path; bare sources are named cam0, cam1, ..."""
+    sources = {}
+    for index, value in enumerate(values):
+        name, sep, source = value.partition('=')
+        if not sep or '://' in name:
+            name, source = f"cam{index}", value
+        sources[name] = int(source) if source.isdigit() else source
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-camera drowsiness monitoring server")
+    parser.add_argument('sources', nargs='+', help="streams as [name=]rtsp-url, camera index or video file")
+    parser.add_argument('--batch-size', type=int, default=None, help="streams per YOLO call (default: all)")
+    parser.add_argument('--face-backend', choices=['ultralytics', 'onnxruntime', 'openvino'],
+                        default='ultralytics', help="face detection inference backend")
+    parser.add_argument('--face-model', default='yolov8n-face.pt', help="face detector weights")
+    parser.add_argument('--detect-size', type=int, default=640, help="face detection resolution")
+    parser.add_argument('--landmark-mode', choices=FrameProcessor.LANDMARK_MODES, default='crop')
+    parser.add_argument('--roi-size', type=int, default=None, help="fixed FaceMesh ROI size")
+    parser.add_argument('--max-faces', type=int, default=1,
+                        help="drivers per camera in full_frame landmark mode")
+    parser.add_argument('--telemetry-dir', default=None, help="record per-stream telemetry here")
+    parser.add_argument('--no-realtime', action='store_true',
+                        help="read video files as fast as possible instead of at their FPS")
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many seconds")
+    parser.add_argument('--report-interval', type=float, default=10.0)
+    parser.add_argument('--stats-output', default=None, help="write final statistics as JSON")
+    args = parser.parse_args()
+
+    server = MultiStreamServer(parse_sources(args.sources), batch_size=args.batch_size,
+                               face_backend=args.face_backend, face_model=args.face_model,
+                               detect_size=args.detect_size, landmark_mode=args.landmark_mode,
+                               roi_size=args.roi_size, max_faces=args.max_faces,
+                               telemetry_dir=args.telemetry_dir,
+                               realtime=False if args.no_realtime else None,
+                               report_interval=args.report_interval)
+    try:
+        server.run(duration=args.duration)
+    except KeyboardInterrupt:
+        pass
+    server.print_stats()
+    server.alerts.print_stats()
+    if args.stats_output:
+        with open(args.stats_output, 'w') as f:
+            json.dump(server.stats(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Fast startup: load both models in parallel and warm them up
+
+Importing torch/ultralytics and mediapipe and building the two models takes
+seconds each, and the first inference of each model is much slower than
+the rest (lazy allocation, graph optimization, kernel selection). Loading
+both on separate threads overlaps that work, and one dummy inference per
+model moves the first-call cost before the first real frame.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Fallback for process_start() where the OS does not report the start time
+_IMPORTED = time.perf_counter()
+
+
+def process_start():
+    """
+    Returns: time.perf_counter() value when this process started, so a
+             StartupReport covers interpreter start-up and imports; without
+             /proc, the time this module was imported
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name, which may contain spaces; starttime is field 22
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _IMPORTED
+    return time.perf_counter() - max(0.0, uptime - started)
+
+
+class StartupReport:
+    def __init__(self, start=None):
+        """
+        Wall time of the startup phases
+        start: time.perf_counter() value the marks are relative to (default: now)
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.phases = {}
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager timing one startup phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = time.perf_counter() - start
+
+    def mark(self, name):
+        """Record the time since start the first time name is reached, e.g. 'first_frame'"""
+        with self._lock:
+            self.marks.setdefault(name, time.perf_counter() - self.start)
+
+    def summary(self):
+        with self._lock:
+            return {
+                'phases_ms': {name: s * 1000.0 for name, s in self.phases.items()},
+                'marks_ms': {name: s * 1000.0 for name, s in self.marks.items()}
+            }
+
+    def print_report(self):
+        summary = self.summary()
+        if summary['phases_ms']:
+            phases = ", ".join(f"{name} {ms:.0f}ms" for name, ms in summary['phases_ms'].items())
+            print(f"Startup phases: {phases}")
+        if summary['marks_ms']:
+            marks = ", ".join(f"{name} at {ms:.0f}ms" for name, ms in summary['marks_ms'].items())
+            print(f"Startup: {marks}")
+
+
+def load_processor(options, profiler=None, warm_up=True, frame_shape=(480, 640, 3), report=None):
+    """
+    Build a FrameProcessor with the face detector and FaceMesh loaded in parallel
+    options: FrameProcessor keyword arguments
+    warm_up: run one dummy inference per model before returning
+    frame_shape: camera frame shape used for the face detector's warm-up
+    report: StartupReport receiving the phase timings
+    Returns: FrameProcessor
+    """
+    report = report or StartupReport()
+    landmark_mode = options.get('landmark_mode', 'crop')
+    max_faces = options.get('max_faces', 1) if landmark_mode == 'full_frame' else 1
+    roi_size = options.get('roi_size') or 256
+
+    def load_face_detector():
+        with report.phase('load_face_detector'):
+            from face_detector import FaceDetector
+            detector = FaceDetector(options.get('face_model', 'yolov8n-face.pt'),
+                                    backend=options.get('face_backend', 'ultralytics'),
+                                    imgsz=options.get('detect_size', 640))
+        if warm_up:
+            with report.phase('warm_up_face_detector'):
+                detector.detect_faces(np.zeros(frame_shape, dtype=np.uint8))
+        return detector
+
+    def load_landmark_detector():
+        with report.phase('load_landmarks'):
+            from landmark_detector import FacialLandmarkDetector
+            detector = FacialLandmarkDetector(max_num_faces=max_faces)
+        if warm_up:
+            with report.phase('warm_up_landmarks'):
+                size = frame_shape if landmark_mode == 'full_frame' else (roi_size, roi_size, 3)
+                detector.detect_landmarks(np.zeros(size, dtype=np.uint8))
+        return detector
+
+    with report.phase('load_models'):
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='load') as pool:
+            faces = pool.submit(load_face_detector)
+            landmarks = pool.submit(load_landmark_detector)
+            face_detector, landmark_detector = faces.result(), landmarks.result()
+
+    from frame_processor import FrameProcessor
+    return FrameProcessor(face_detector=face_detector, landmark_detector=landmark_detector,
+                          profiler=profiler, **options)
@@ -0,0 +1,336 @@
+"""
+Parallel DrowsinessDetector threshold sweep over labeled recordings
+
+Evaluates every combination of ear_threshold, head_tilt_threshold,
+drowsy_time and perclos_threshold against labeled drowsy episodes, and
+reports frame-level precision/recall/F1 and alert latency per
+configuration. Faces and landmarks come from the landmark cache (videos
+not cached yet are scored once with batch_processor to fill it). EAR and
+head pose are computed once per session, and the detector's per-frame
+state machine is replayed with array operations, all drowsy_time and
+perclos_threshold values of one (ear, tilt) pair at once. (ear, tilt)
+pairs are spread across a process pool.
+
+Sessions manifest (JSON):
+    [{"video": "drive1.mp4", "labels": [[12.5, 20.0], [301.0, 340.5]]},
+     {"video": "drive2.mp4", "labels": "drive2_labels.csv"}]
+labels are drowsy episodes as [start_s, end_s] on the video's timeline,
+inline or as a CSV with start_s,end_s columns.
+Usage:
+    python sweep_thresholds.py sessions.json --landmark-cache cache/ \\
+        --ear-threshold 0.18:0.30:0.01 --drowsy-time 0.5,1.0,1.5 --output sweep.csv
+"""
+import os
+import csv
+import json
+import time
+import argparse
+import warnings
+import itertools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from drowsiness_detector import DrowsinessDetector, compute_point_features
+from landmark_cache import LandmarkCache, model_version
+
+RESULT_COLUMNS = ['ear_threshold', 'head_tilt_threshold', 'drowsy_time', 'perclos_threshold',
+                  'precision', 'recall', 'f1', 'episodes', 'episodes_detected',
+                  'latency_mean_s', 'latency_p90_s', 'false_alerts_per_hour']
+
+# Sessions loaded once per worker process by _init_worker
+_sessions = None
+
+
+def load_labels(labels):
+    """Returns: (K, 2) array of [start_s, end_s] episodes from a list or a CSV path"""
+    if isinstance(labels, str):
+        with open(labels, newline='') as f:
+            labels = [(float(row['start_s']), float(row['end_s'])) for row in csv.DictReader(f)]
+    return np.asarray(labels, dtype=np.float64).reshape(-1, 2)
+
+
+def parse_values(text, cast=float):
+    """'0.18:0.30:0.01' (start:stop:step, stop included), '0.5,1,1.5' or 'none' values"""
+    if ':' in text:
+        start, stop, step = (float(v) for v in text.split(':'))
+        return [cast(round(v, 10)) for v in np.arange(start, stop + step / 2.0, step)]
+    return [None if v.strip().lower() == 'none' else cast(v) for v in text.split(',')]
+
+
+class Session:
+    def __init__(self, name, cached, episodes, max_gap=0.5, perclos_window=60.0):
+        """
+        Per-frame features of one labeled recording, computed once for all configurations
+        cached: CachedLandmarks of the video; episodes: (K, 2) labeled drowsy intervals
+        """
+        self.name = name
+        self.episodes = episodes
+        self.timestamps = np.asarray(cached.timestamps, dtype=np.float64)
+        self.frames = len(self.timestamps)
+        self.duration = float(self.timestamps[-1] - self.timestamps[0]) if self.frames > 1 else 0.0
+
+        # The detector only sees frames with a face (first face, as in batch scoring)
+        self.face, points = cached.first_face_points()
+        features = compute_point_features(points[self.face])
+        self.ear = features['ear']
+        self.abs_tilt = np.abs(features['head_tilt'])
+        self.face_times = self.timestamps[self.face]
+
+        # FeatureEngine weights each PERCLOS sample by its capped frame duration
+        dt = np.diff(self.face_times, prepend=self.face_times[:1])
+        self.weights = np.clip(dt, 0.0, max_gap)
+        self.perclos_window = perclos_window
+        self.weight_sums = np.concatenate([[0.0], np.cumsum(self.weights)])
+        # Samples inside (t - window, t] start at window_start[i]
+        self.window_start = np.searchsorted(self.face_times, self.face_times - perclos_window,
+                                            side='right')
+
+        self.truth = np.zeros(self.frames, dtype=bool)
+        for start, end in episodes:
+            self.truth |= (self.timestamps >= start) & (self.timestamps <= end)
+
+    def perclos(self, ear_threshold):
+        """PERCLOS over the window at every face frame, as FeatureEngine computes it"""
+        closed = np.concatenate([[0.0], np.cumsum(self.weights * (self.ear < ear_threshold))])
+        index = np.arange(1, len(self.face_times) + 1)
+        weight = self.weight_sums[index] - self.weight_sums[self.window_start]
+        closed = closed[index] - closed[self.window_start]
+        return np.divide(closed, weight, out=np.zeros_like(closed), where=weight > 0)
+
+    def run_durations(self, ear_threshold, head_tilt_threshold):
+        """
+        Seconds since DrowsinessDetector's drowsy_start at every face frame
+        (-1 where the eyes-closed / head-tilt condition does not hold)
+        """
+        condition = (self.ear < ear_threshold) | (self.abs_tilt > head_tilt_threshold)
+        starts = condition & ~np.concatenate([[False], condition[:-1]])
+        run_start = np.where(starts, self.face_times, -np.inf)
+        run_start = np.maximum.accumulate(run_start)
+        return np.where(condition, self.face_times - run_start, -1.0)
+
+    def predictions(self, ear_threshold, head_tilt_threshold, drowsy_times, perclos_thresholds):
+        """
+        Returns: (len(drowsy_times), len(perclos_thresholds), frames) bool array of
+                 is_drowsy per frame; frames without a face are never drowsy
+        """
+        durations = self.run_durations(ear_threshold, head_tilt_threshold)
+        timed = durations[np.newaxis] > np.asarray(drowsy_times, dtype=np.float64)[:, np.newaxis]
+        perclos = self.perclos(ear_threshold)
+        thresholds = np.array([np.inf if t is None else t for t in perclos_thresholds])
+        by_perclos = perclos[np.newaxis] >= thresholds[:, np.newaxis]
+        face_drowsy = timed[:, np.newaxis] | by_perclos[np.newaxis]
+        drowsy = np.zeros((len(drowsy_times), len(perclos_thresholds), self.frames), dtype=bool)
+        drowsy[..., self.face] = face_drowsy
+        return drowsy
+
+
+def sequential_predictions(session_cached, params):
+    """Replay one configuration frame by frame through DrowsinessDetector (reference)"""
+    detector = DrowsinessDetector(**params)
+    drowsy = np.zeros(len(session_cached), dtype=bool)
+    for index in range(len(session_cached)):
+        faces = session_cached.faces(index)
+        if faces:
+            drowsy[index] = detector.detect_drowsiness(faces[0][1], session_cached.timestamps[index])[0]
+    return drowsy
+
+
+def _score(sessions, predicted):
+    """
+    Metrics of a batch of configurations
+    predicted: per session, a (..., frames) bool array; leading axes are configurations
+    Returns: Dictionary of metric arrays over the leading axes
+    """
+    tp = fp = fn = 0
+    latencies = []
+    episodes = detected = false_alerts = 0
+    duration = 0.0
+    for session, drowsy in zip(sessions, predicted):
+        truth = session.truth
+        tp = tp + (drowsy & truth).sum(axis=-1)
+        fp = fp + (drowsy & ~truth).sum(axis=-1)
+        fn = fn + (~drowsy & truth).sum(axis=-1)
+        duration += session.duration
+
+        # Alert latency: first drowsy frame of each labeled episode
+        times = session.timestamps
+        for start, end in session.episodes:
+            inside = (times >= start) & (times <= end)
+            if not inside.any():
+                continue
+            hits = drowsy[..., inside]
+            found = hits.any(axis=-1)
+            latencies.append(np.where(found, times[inside][np.argmax(hits, axis=-1)] - start, np.nan))
+            episodes += 1
+            detected = detected + found
+
+        # False alerts: alert onsets outside every labeled episode
+        onsets = drowsy & ~np.concatenate([np.zeros(drowsy.shape[:-1] + (1,), dtype=bool),
+                                           drowsy[..., :-1]], axis=-1)
+        false_alerts = false_alerts + (onsets & ~truth).sum(axis=-1)
+
+    precision = np.divide(tp, tp + fp, out=np.zeros(np.shape(tp)), where=(tp + fp) > 0)
+    recall = np.divide(tp, tp + fn, out=np.zeros(np.shape(tp)), where=(tp + fn) > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros(np.shape(tp)), where=(precision + recall) > 0)
+    latencies = np.stack(latencies, axis=-1) if latencies else np.full(np.shape(tp) + (1,), np.nan)
+    with warnings.catch_warnings():
+        # Configurations that detect no episode have no latency (NaN)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        latency_mean = np.nanmean(latencies, axis=-1)
+        latency_p90 = np.nanpercentile(latencies, 90, axis=-1)
+    hours = duration / 3600.0
+    return {
+        'precision': precision, 'recall': recall, 'f1': f1,
+        'episodes': np.full(np.shape(tp), episodes), 'episodes_detected': detected,
+        'latency_mean_s': latency_mean, 'latency_p90_s': latency_p90,
+        'false_alerts_per_hour': false_alerts / hours if hours > 0 else np.full(np.shape(tp), np.nan)
+    }
+
+
+def _init_worker(sessions):
+    global _sessions
+    _sessions = sessions
+
+
+def _evaluate_pair(args):
+    """Worker: all drowsy_time x perclos_threshold configurations of one (ear, tilt) pair"""
+    ear_threshold, head_tilt_threshold, drowsy_times, perclos_thresholds = args
+    predicted = [session.predictions(ear_threshold, head_tilt_threshold, drowsy_times,
+                                     perclos_thresholds) for session in _sessions]
+    metrics = _score(_sessions, predicted)
+    rows = []
+    for i, drowsy_time in enumerate(drowsy_times):
+        for j, perclos_threshold in enumerate(perclos_thresholds):
+            row = {'ear_threshold': ear_threshold, 'head_tilt_threshold': head_tilt_threshold,
+                   'drowsy_time': drowsy_time, 'perclos_threshold': perclos_threshold}
+            for name, values in metrics.items():
+                value = values[i, j] if np.ndim(values) else values
+                row[name] = float(value) if np.isfinite(value) else None
+            rows.append(row)
+    return rows
+
+
+def load_sessions(manifest, cache_dir, options, workers=None):
+    """
+    Cached landmarks and labels of every session in the manifest; videos not
+    in the cache yet are scored once with batch_processor to fill it
+    Returns: (list of Session, {name: CachedLandmarks}); sessions are named
+             by their manifest video path, so same-named videos in different
+             directories stay apart
+    """
+    with open(manifest) as f:
+        entries = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest))
+    resolve = lambda path: path if os.path.isabs(path) else os.path.join(base, path)
+
+    cache = LandmarkCache(cache_dir)
+    version = model_version(options)
+    videos = [resolve(entry['video']) for entry in entries]
+    missing = [video for video in videos if cache.get(video, version) is None]
+    if missing:
+        from batch_processor import run_batch
+        print(f"Scoring {len(missing)} uncached video(s) to fill the landmark cache...")
+        with tempfile.TemporaryDirectory() as output_dir:
+            run_batch(missing, output_dir, workers=workers, cache_dir=cache_dir, **options)
+
+    sessions = []
+    cached_sessions = {}
+    for entry, video in zip(entries, videos):
+        cached = cache.get(video, version)
+        if cached is None:
+            raise RuntimeError(f"No cached landmarks for {video}")
+        labels = entry['labels']
+        episodes = load_labels(resolve(labels) if isinstance(labels, str) else labels)
+        sessions.append(Session(entry['video'], cached, episodes))
+        cached_sessions[entry['video']] = cached
+    return sessions, cached_sessions
+
+
+def sweep(sessions, ear_thresholds, head_tilt_thresholds, drowsy_times, perclos_thresholds,
+          workers=None):
+    """
+    Evaluate the full grid across a process pool
+    Returns: List of result rows (see RESULT_COLUMNS), best F1 first
+    """
+    tasks = [(ear, tilt, list(drowsy_times), list(perclos_thresholds))
+             for ear, tilt in itertools.product(ear_thresholds, head_tilt_thresholds)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(sessions,)) as pool:
+        for result in pool.map(_evaluate_pair, tasks, chunksize=max(1, len(tasks) // (workers * 4))):
+            rows.extend(result)
+    rows.sort(key=lambda row: -row['f1'])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel drowsiness threshold sweep")
+    parser.add_argument('manifest', help="JSON list of {video, labels} sessions")
+    parser.add_argument('--landmark-cache', required=True, metavar='DIR',
+                        help="landmark cache directory, see batch_processor --landmark-cache")
+    parser.add_argument('--ear-threshold', default='0.18:0.30:0.01')
+    parser.add_argument('--head-tilt-threshold', default='15:35:5')
+    parser.add_argument('--drowsy-time', default='0.5,0.75,1.0,1.5,2.0')
+    parser.add_argument('--perclos-threshold', default='none,0.15,0.2,0.3',
+                        help="PERCLOS (60 s window) alert levels; 'none' disables the PERCLOS rule")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--check', action='store_true',
+                        help="verify the vectorized replay against DrowsinessDetector for one configuration")
+    # Options that produced the cached landmarks, see batch_processor
+    parser.add_argument('--landmark-mode', choices=['crop', 'stable_roi', 'full_frame'], default='crop')
+    parser.add_argument('--face-backend', choices=['ultralytics', 'onnxruntime', 'openvino'],
+                        default='ultralytics')
+    parser.add_argument('--face-model', default='yolov8n-face.pt')
+    parser.add_argument('--detect-size', type=int, default=640)
+    parser.add_argument('--roi-size', type=int, default=None)
+    parser.add_argument('--track-interval', type=int, default=None)
+    args = parser.parse_args()
+
+    options = dict(landmark_mode=args.landmark_mode, face_backend=args.face_backend,
+                   face_model=args.face_model, detect_size=args.detect_size,
+                   roi_size=args.roi_size, track_interval=args.track_interval)
+    sessions, cached = load_sessions(args.manifest, args.landmark_cache, options, args.workers)
+    grid = (parse_values(args.ear_threshold), parse_values(args.head_tilt_threshold),
+            parse_values(args.drowsy_time), parse_values(args.perclos_threshold))
+
+    if args.check:
+        ear, tilt, drowsy_time, perclos = (values[0] for values in grid)
+        for session in sessions:
+            expected = sequential_predictions(cached[session.name], dict(
+                ear_threshold=ear, head_tilt_threshold=tilt, drowsy_time=drowsy_time,
+                perclos_threshold=perclos))
+            actual = session.predictions(ear, tilt, [drowsy_time], [perclos])[0, 0]
+            print(f"Check {session.name}: {int((expected != actual).sum())} of "
+                  f"{session.frames} frames differ from DrowsinessDetector")
+
+    configurations = int(np.prod([len(values) for values in grid]))
+    print(f"Sweeping {configurations} configurations over {len(sessions)} sessions "
+          f"({sum(s.frames for s in sessions)} frames)")
+    start = time.perf_counter()
+    rows = sweep(sessions, *grid, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {len(rows)} configurations in {elapsed:.1f}s "
+          f"({len(rows) / elapsed if elapsed > 0 else 0.0:.0f}/s)")
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    for row in rows[:10]:
+        latency = f"{row['latency_mean_s']:.2f}s" if row['latency_mean_s'] is not None else "n/a"
+        p90 = f"{row['latency_p90_s']:.2f}s" if row['latency_p90_s'] is not None else "n/a"
+        false_alerts = (f"{row['false_alerts_per_hour']:.1f}"
+                        if row['false_alerts_per_hour'] is not None else "n/a")
+        print(f"ear<{row['ear_threshold']:.2f} tilt>{row['head_tilt_threshold']:g} "
+              f"time>{row['drowsy_time']:g}s perclos>={row['perclos_threshold']}: "
+              f"P {row['precision']:.2f} R {row['recall']:.2f} F1 {row['f1']:.2f}, "
+              f"detected {row['episodes_detected']:.0f}/{row['episodes']:.0f} "
+              f"latency {latency} (p90 {p90}), {false_alerts} false alerts/h")
+
+
+if __name__ == "__main__":
+    main()
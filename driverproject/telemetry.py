@@ -0,0 +1,290 @@
+import os
+import csv
+import json
+import time
+import threading
+from datetime import datetime
+import numpy as np
+
+# One record per processed face. Timestamps are wall-clock nanoseconds since
+# the epoch, derived from a monotonic clock so they never go backwards.
+TELEMETRY_DTYPE = np.dtype([
+    ('timestamp_ns', '<i8'),
+    ('ear', '<f4'),
+    ('mar', '<f4'),
+    ('head_tilt', '<f4'),
+    ('head_elevation', '<f4'),
+    ('is_drowsy', 'u1'),
+    ('true_label', 'u1')
+])
+
+RECORD_EXTENSION = '.rec'
+HEADER_EXTENSION = '.json'
+NS_PER_HOUR = 3600 * 10**9
+
+
+class MonotonicClock:
+    def __init__(self):
+        """Epoch nanoseconds that advance with time.monotonic_ns()"""
+        self.epoch_ns = time.time_ns()
+        self.monotonic_ns = time.monotonic_ns()
+
+    def now_ns(self):
+        return self.epoch_ns + (time.monotonic_ns() - self.monotonic_ns)
+
+    def at_monotonic_ns(self, monotonic_ns):
+        """Epoch nanoseconds of an earlier time.monotonic_ns() reading"""
+        return self.epoch_ns + (monotonic_ns - self.monotonic_ns)
+
+
+def write_header(record_path, session, dtype=TELEMETRY_DTYPE):
+    """Write the JSON sidecar describing a record file"""
+    header = {
+        'format': 'drowsiness-telemetry',
+        'version': 1,
+        'session': session,
+        'dtype': dtype.descr,
+        'created': datetime.now().isoformat()
+    }
+    with open(os.path.splitext(record_path)[0] + HEADER_EXTENSION, 'w') as f:
+        json.dump(header, f, indent=2)
+
+
+def read_header(record_path):
+    """Returns: (header dictionary, record dtype) for a record file"""
+    with open(os.path.splitext(record_path)[0] + HEADER_EXTENSION) as f:
+        header = json.load(f)
+    return header, np.dtype([tuple(field) for field in header['dtype']])
+
+
+def export_csv(record_paths, csv_path):
+    """Convert record files to a CSV with the same columns as the old drowsiness_data.csv"""
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Timestamp', 'EAR', 'MAR', 'Head_Tilt', 'Head_Elevation', 'Is_Drowsy'])
+        for path in record_paths:
+            _, dtype = read_header(path)
+            records = np.memmap(path, dtype=dtype, mode='r') if os.path.getsize(path) else []
+            for row in records:
+                timestamp = datetime.fromtimestamp(int(row['timestamp_ns']) / 1e9)
+                writer.writerow([timestamp.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                                 float(row['ear']), float(row['mar']), float(row['head_tilt']),
+                                 float(row['head_elevation']), int(row['is_drowsy'])])
+
+
+class TelemetryWriter:
+    COLUMNS = TELEMETRY_DTYPE.names
+
+    def __init__(self, directory='telemetry', session=None, batch_size=1024, num_batches=4,
+                 flush_interval=5.0, rotate='hour', overflow='drop', live=True, block_timeout=30.0):
+        """
+        Append-only telemetry recorder with bounded memory
+
+        Rows go into a preallocated columnar ring buffer of batch_size *
+        num_batches rows. A background thread writes full batches (or
+        whatever is pending every flush_interval seconds) to a raw NumPy
+        record file and fsyncs it, so a crash loses at most one interval.
+        rotate: 'hour' starts a new file every wall-clock hour, 'session'
+                keeps one file for the whole session
+        overflow: what append() does when the flusher is a whole ring behind;
+                  'drop' overwrites the oldest unflushed row (live capture must
+                  not stall), 'block' waits for the flusher (offline and batch
+                  runs, which must not lose rows)
+        block_timeout: seconds a blocked append() waits for the flusher to
+                       make room before raising
+        live: how frame_ns() reads capture.FrameClock timestamps; True for
+              the monotonic capture time of a camera, False for positions in
+              a recording, which are laid out from the first recorded frame
+              at the time it is recorded
+        """
+        if rotate not in ('hour', 'session'):
+            raise ValueError(f"Unknown rotation policy: {rotate}")
+        if overflow not in ('drop', 'block'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.directory = directory
+        self.session = session or datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.batch_size = batch_size
+        self.capacity = batch_size * num_batches
+        self.flush_interval = flush_interval
+        self.rotate = rotate
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.live = live
+        self.clock = MonotonicClock()
+        self._origin_ns = None
+        os.makedirs(directory, exist_ok=True)
+
+        # Ring buffer, one preallocated array per column
+        self._columns = {name: np.zeros(self.capacity, dtype=TELEMETRY_DTYPE[name])
+                         for name in self.COLUMNS}
+        self._batch = np.zeros(batch_size, dtype=TELEMETRY_DTYPE)
+        self._head = 0
+        self._tail = 0
+
+        self.files = []
+        self.rows_written = 0
+        self.dropped = 0
+        self._write_error = None
+        self._file = None
+        self._file_key = None
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._space = threading.Condition(self._lock)
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name='telemetry-flush', daemon=True)
+        self._flusher.start()
+
+    def frame_ns(self, timestamp):
+        """
+        timestamp: capture.FrameClock timestamp in seconds, or None for now
+        Returns: Epoch nanoseconds for the timestamp_ns column
+        """
+        if timestamp is None:
+            return self.clock.now_ns()
+        offset_ns = int(round(timestamp * 1e9))
+        if self.live:
+            return self.clock.at_monotonic_ns(offset_ns)
+        if self._origin_ns is None:
+            self._origin_ns = self.clock.now_ns() - offset_ns
+        return self._origin_ns + offset_ns
+
+    def append(self, ear, mar, head_tilt, head_elevation, is_drowsy, true_label=0, timestamp_ns=None):
+        """
+        Record one row; never blocks on disk I/O unless overflow is 'block'
+        and the ring is full
+        timestamp_ns: the frame's time, see frame_ns(); defaults to now
+        """
+        if timestamp_ns is None:
+            timestamp_ns = self.clock.now_ns()
+        with self._lock:
+            if self._closed:
+                raise ValueError("append() on a closed TelemetryWriter")
+            if self.overflow == 'block':
+                self._wait_for_space()
+            elif self._head - self._tail >= self.capacity:
+                # Flusher fell behind a whole ring, overwrite the oldest row
+                self._tail += 1
+                self.dropped += 1
+            i = self._head % self.capacity
+            columns = self._columns
+            columns['timestamp_ns'][i] = timestamp_ns
+            columns['ear'][i] = ear
+            columns['mar'][i] = mar
+            columns['head_tilt'][i] = head_tilt
+            columns['head_elevation'][i] = head_elevation
+            columns['is_drowsy'][i] = is_drowsy
+            columns['true_label'][i] = true_label
+            self._head += 1
+            if self._head - self._tail >= self.batch_size:
+                self._wake.notify()
+
+    def _wait_for_space(self):
+        """Called with _lock held: wait until the flusher frees a slot in the ring"""
+        deadline = time.monotonic() + self.block_timeout
+        while self._head - self._tail >= self.capacity:
+            if not self._flusher.is_alive():
+                raise RuntimeError("Telemetry flusher is not running, rows cannot be written")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"Telemetry flusher made no room in {self.block_timeout:.0f}s"
+                                   + (f", last error: {self._write_error}" if self._write_error else ""))
+            self._wake.notify()
+            self._space.wait(remaining)
+            if self._closed:
+                # close() flushed without this row; it would be lost in the ring
+                raise ValueError("append() on a closed TelemetryWriter")
+
+    def flush(self):
+        """Write every pending row to disk now"""
+        while self._write_batch():
+            pass
+
+    def close(self):
+        """Flush remaining rows, stop the flusher and close the current file"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+            self._space.notify_all()
+        self._flusher.join()
+        self.flush()
+        with self._write_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+        if self.dropped:
+            print(f"Warning: telemetry dropped {self.dropped} rows the flusher could not keep up with")
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def export_csv(self, csv_path):
+        """Export everything written in this session to CSV"""
+        self.flush()
+        export_csv(self.files, csv_path)
+
+    def stats(self):
+        with self._lock:
+            pending = self._head - self._tail
+        return {'rows_written': self.rows_written, 'pending': pending,
+                'dropped': self.dropped, 'files': list(self.files)}
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                if not self._closed and self._head - self._tail < self.batch_size:
+                    self._wake.wait(self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+                self._write_error = None
+            except Exception as e:
+                self._write_error = e
+                print(f"Error writing telemetry: {e}")
+
+    def _write_batch(self):
+        """Move up to one batch from the ring to disk; returns False if nothing was pending"""
+        with self._write_lock:
+            with self._lock:
+                count = min(self._head - self._tail, self.batch_size)
+                if count == 0:
+                    return False
+                batch = self._batch[:count]
+                positions = np.arange(self._tail, self._tail + count) % self.capacity
+                for name in self.COLUMNS:
+                    np.take(self._columns[name], positions, out=batch[name])
+                self._tail += count
+                self._space.notify_all()
+
+            if self.rotate == 'hour':
+                # A batch may straddle an hour boundary
+                hours = batch['timestamp_ns'] // NS_PER_HOUR
+                splits = np.flatnonzero(np.diff(hours)) + 1
+                for chunk in np.split(batch, splits):
+                    self._write_records(chunk, int(chunk['timestamp_ns'][0] // NS_PER_HOUR))
+            else:
+                self._write_records(batch, 0)
+            return True
+
+    def _write_records(self, records, key):
+        if self._file is None or key != self._file_key:
+            self._open_file(key, int(records['timestamp_ns'][0]))
+        self._file.write(records.tobytes())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.rows_written += len(records)
+
+    def _open_file(self, key, timestamp_ns):
+        if self._file:
+            self._file.close()
+        stamp = datetime.fromtimestamp(timestamp_ns / 1e9).strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"{self.session}_{stamp}{RECORD_EXTENSION}")
+        write_header(path, self.session)
+        self._file = open(path, 'ab')
+        self._file_key = key
+        self.files.append(path)
@@ -0,0 +1,276 @@
+import os
+import csv
+import glob
+from datetime import datetime, timedelta
+import numpy as np
+from telemetry import TELEMETRY_DTYPE, RECORD_EXTENSION, read_header, write_header
+
+NS_PER_SECOND = 10**9
+
+
+class TelemetryReader:
+    def __init__(self, paths, chunk_rows=1 << 22, session=None):
+        """
+        Memory-mapped view over recorded telemetry files
+        paths: a directory, a glob pattern or a list of .rec files
+        session: only read the files of this session (the header's
+                 'session', one per TelemetryWriter, e.g. per server stream)
+
+        Nothing is loaded up front; queries stream over the files in
+        time order chunk_rows rows at a time, reading only the columns
+        they need, so memory use does not depend on how much is recorded.
+        Queries need one monotonic stream: sessions whose time ranges
+        overlap must be read one at a time, and timestamps that go
+        backwards inside a session raise ValueError.
+        """
+        self.chunk_rows = chunk_rows
+        by_session = {}
+        for path in self._expand(paths):
+            if os.path.getsize(path) == 0:
+                continue
+            header, dtype = read_header(path)
+            if session is not None and header.get('session') != session:
+                continue
+            records = np.memmap(path, dtype=dtype, mode='r')
+            if len(records):
+                self._check_monotonic(path, records['timestamp_ns'])
+                by_session.setdefault(header.get('session'), []).append((path, records))
+
+        # Files of one session in time order, then sessions by their first timestamp
+        groups = []
+        for name, files in by_session.items():
+            files.sort(key=lambda item: int(item[1]['timestamp_ns'][0]))
+            for (previous, before), (path, records) in zip(files, files[1:]):
+                if int(records['timestamp_ns'][0]) < int(before['timestamp_ns'][-1]):
+                    raise ValueError(f"Telemetry of session {name} goes back in time "
+                                     f"from {previous} to {path}")
+            groups.append((name, files))
+        groups.sort(key=lambda group: int(group[1][0][1]['timestamp_ns'][0]))
+        for (name, files), (next_name, next_files) in zip(groups, groups[1:]):
+            if int(next_files[0][1]['timestamp_ns'][0]) < int(files[-1][1]['timestamp_ns'][-1]):
+                raise ValueError(f"Telemetry sessions {name} and {next_name} overlap in time; "
+                                 f"read them one at a time with session=, "
+                                 f"sessions: {', '.join(str(g[0]) for g in groups)}")
+        self.sessions = [name for name, _ in groups]
+        self.files = [item for _, files in groups for item in files]
+
+    def _check_monotonic(self, path, timestamps):
+        """Stream over a file's timestamps; windowed queries rely on their order"""
+        previous = None
+        for begin in range(0, len(timestamps), self.chunk_rows):
+            chunk = np.asarray(timestamps[begin:begin + self.chunk_rows])
+            if (previous is not None and chunk[0] < previous) or np.any(chunk[1:] < chunk[:-1]):
+                raise ValueError(f"Telemetry timestamps in {path} are not monotonic")
+            previous = chunk[-1]
+
+    @staticmethod
+    def _expand(paths):
+        if isinstance(paths, str):
+            if os.path.isdir(paths):
+                return sorted(glob.glob(os.path.join(paths, '*' + RECORD_EXTENSION)))
+            return sorted(glob.glob(paths))
+        return list(paths)
+
+    def __len__(self):
+        return sum(len(records) for _, records in self.files)
+
+    @property
+    def time_range(self):
+        """Returns: (first, last) timestamp in nanoseconds, or None without data"""
+        if not self.files:
+            return None
+        return int(self.files[0][1]['timestamp_ns'][0]), int(self.files[-1][1]['timestamp_ns'][-1])
+
+    def iter_chunks(self, columns=('timestamp_ns', 'ear'), start_ns=None, end_ns=None):
+        """
+        Stream the selected columns in time order
+        Yields: Dictionaries of column arrays with at most chunk_rows rows
+        """
+        for _, records in self.files:
+            timestamps = records['timestamp_ns']
+            lo = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns, 'left'))
+            hi = len(records) if end_ns is None else int(np.searchsorted(timestamps, end_ns, 'left'))
+            for begin in range(lo, hi, self.chunk_rows):
+                end = min(begin + self.chunk_rows, hi)
+                yield {name: np.array(records[name][begin:end]) for name in columns}
+
+    def column(self, name, start_ns=None, end_ns=None):
+        """Load one column for a time range into memory"""
+        chunks = [chunk[name] for chunk in self.iter_chunks((name,), start_ns, end_ns)]
+        if not chunks:
+            return np.empty(0, dtype=TELEMETRY_DTYPE[name])
+        return np.concatenate(chunks)
+
+    def ear_percentiles(self, percentiles=(5, 50, 95), bin_s=60, start_ns=None, end_ns=None):
+        """
+        EAR percentiles per time bin (per minute by default)
+        Returns: Dictionary with 'start_ns' and 'count' arrays plus one 'p<q>' array per percentile
+        """
+        bin_ns = int(bin_s * NS_PER_SECOND)
+        out = {'start_ns': [], 'count': []}
+        out.update({f"p{q:g}": [] for q in percentiles})
+        carry_bins = np.empty(0, dtype=np.int64)
+        carry_ear = np.empty(0, dtype=np.float32)
+
+        def emit(bins, ear):
+            # Sort by (bin, value), then interpolate each bin's percentiles at once
+            order = np.lexsort((ear, bins))
+            bins, ear = bins[order], ear[order]
+            starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+            counts = np.diff(np.r_[starts, len(bins)])
+            out['start_ns'].append(bins[starts] * bin_ns)
+            out['count'].append(counts)
+            for q in percentiles:
+                position = starts + (counts - 1) * (q / 100.0)
+                lower = np.floor(position).astype(np.int64)
+                upper = np.minimum(lower + 1, starts + counts - 1)
+                fraction = position - lower
+                out[f"p{q:g}"].append(ear[lower] * (1 - fraction) + ear[upper] * fraction)
+
+        for chunk in self.iter_chunks(('timestamp_ns', 'ear'), start_ns, end_ns):
+            bins = np.concatenate([carry_bins, chunk['timestamp_ns'] // bin_ns])
+            ear = np.concatenate([carry_ear, chunk['ear']])
+            # The last bin may continue in the next chunk
+            complete = bins < bins[-1]
+            if complete.any():
+                emit(bins[complete], ear[complete])
+            carry_bins, carry_ear = bins[~complete], ear[~complete]
+        if len(carry_bins):
+            emit(carry_bins, carry_ear)
+
+        return {key: np.concatenate(values) if values else np.empty(0) for key, values in out.items()}
+
+    def perclos(self, window_s=60, step_s=1.0, ear_threshold=0.2, start_ns=None, end_ns=None):
+        """
+        PERCLOS: fraction of frames with EAR below ear_threshold in a sliding
+        window of window_s seconds, evaluated every step_s seconds
+        Returns: Dictionary with 'timestamp_ns', 'perclos' and 'frames' arrays;
+                 windows without any frames are skipped
+        """
+        window_ns = int(window_s * NS_PER_SECOND)
+        step_ns = int(step_s * NS_PER_SECOND)
+        out = {'timestamp_ns': [], 'perclos': [], 'frames': []}
+        carry_ts = np.empty(0, dtype=np.int64)
+        carry_closed = np.empty(0, dtype=np.int64)
+        next_eval = None
+
+        for chunk in self.iter_chunks(('timestamp_ns', 'ear'), start_ns, end_ns):
+            timestamps = np.concatenate([carry_ts, chunk['timestamp_ns']])
+            closed = np.concatenate([carry_closed, (chunk['ear'] < ear_threshold).astype(np.int64)])
+            if next_eval is None:
+                next_eval = (int(timestamps[0]) // step_ns + 1) * step_ns
+
+            # Evaluation points covered by this chunk
+            last = int(timestamps[-1])
+            if next_eval <= last:
+                points = np.arange(next_eval, last + 1, step_ns, dtype=np.int64)
+                cumulative = np.r_[0, np.cumsum(closed)]
+                hi = np.searchsorted(timestamps, points, 'right')
+                lo = np.searchsorted(timestamps, points - window_ns, 'right')
+                frames = hi - lo
+                valid = frames > 0
+                out['timestamp_ns'].append(points[valid])
+                out['perclos'].append((cumulative[hi] - cumulative[lo])[valid] / frames[valid])
+                out['frames'].append(frames[valid])
+                next_eval = int(points[-1]) + step_ns
+
+            # Keep one window of history for the next chunk
+            keep = timestamps > next_eval - step_ns - window_ns
+            carry_ts, carry_closed = timestamps[keep], closed[keep]
+
+        return {key: np.concatenate(values) if values else np.empty(0) for key, values in out.items()}
+
+    def drowsy_episodes(self, max_gap_s=1.0, min_duration_s=0.0, start_ns=None, end_ns=None):
+        """
+        Runs of consecutive drowsy frames; a gap of more than max_gap_s
+        between frames (e.g. between sessions) ends an episode
+        Returns: Dictionary with 'start_ns', 'end_ns', 'duration_s' and 'frames' arrays
+        """
+        max_gap_ns = int(max_gap_s * NS_PER_SECOND)
+        starts, ends, counts = [], [], []
+        # Episode still running at the end of the previous chunk
+        open_start = None
+        open_count = 0
+        last_ts = None
+
+        for chunk in self.iter_chunks(('timestamp_ns', 'is_drowsy'), start_ns, end_ns):
+            timestamps = chunk['timestamp_ns']
+            drowsy = chunk['is_drowsy'].astype(bool)
+            previous_ts = np.r_[timestamps[0] if last_ts is None else last_ts, timestamps[:-1]]
+            previous_drowsy = np.r_[open_start is not None, drowsy[:-1]]
+            gap = (timestamps - previous_ts) > max_gap_ns
+
+            # Episodes open on frame i and close just before frame i
+            opened = np.flatnonzero(drowsy & (~previous_drowsy | gap))
+            closed = np.flatnonzero(previous_drowsy & (~drowsy | gap))
+            cumulative = np.r_[0, np.cumsum(drowsy)]
+
+            if open_start is not None:
+                if len(closed):
+                    first = closed[0]
+                    starts.append(open_start)
+                    ends.append(int(previous_ts[first]))
+                    counts.append(open_count + int(cumulative[first]))
+                    closed = closed[1:]
+                    open_start = None
+                else:
+                    open_count += int(cumulative[-1])
+
+            paired = len(closed)
+            starts.extend(timestamps[opened[:paired]].tolist())
+            ends.extend(previous_ts[closed].tolist())
+            counts.extend((cumulative[closed] - cumulative[opened[:paired]]).tolist())
+
+            if len(opened) > paired:
+                first = opened[paired]
+                open_start = int(timestamps[first])
+                open_count = int(cumulative[-1] - cumulative[first])
+            last_ts = int(timestamps[-1])
+
+        if open_start is not None:
+            starts.append(open_start)
+            ends.append(last_ts)
+            counts.append(open_count)
+
+        start_arr = np.array(starts, dtype=np.int64)
+        end_arr = np.array(ends, dtype=np.int64)
+        duration = (end_arr - start_arr) / NS_PER_SECOND
+        keep = duration >= min_duration_s
+        return {
+            'start_ns': start_arr[keep],
+            'end_ns': end_arr[keep],
+            'duration_s': duration[keep],
+            'frames': np.array(counts, dtype=np.int64)[keep]
+        }
+
+
+def convert_legacy_csv(csv_path, date, output_dir='telemetry', session=None):
+    """
+    Convert an old drowsiness_data.csv (time of day only) to a record file
+    date: the day the recording started; times that go backwards are taken
+          to have crossed midnight
+    Returns: Path of the written record file
+    """
+    day = datetime.strptime(date, '%Y-%m-%d') if isinstance(date, str) else date
+    day = datetime(day.year, day.month, day.day)
+    rows = []
+    previous = None
+    with open(csv_path, newline='') as f:
+        for row in csv.DictReader(f):
+            time_of_day = datetime.strptime(row['Timestamp'], '%H:%M:%S.%f')
+            stamp = day.replace(hour=time_of_day.hour, minute=time_of_day.minute,
+                                second=time_of_day.second, microsecond=time_of_day.microsecond)
+            if previous is not None and stamp < previous:
+                day += timedelta(days=1)
+                stamp += timedelta(days=1)
+            previous = stamp
+            rows.append((int(stamp.timestamp() * 1e6) * 1000, float(row['EAR']), float(row['MAR']),
+                         float(row['Head_Tilt']), float(row['Head_Elevation']), int(row['Is_Drowsy']), 0))
+
+    records = np.array(rows, dtype=TELEMETRY_DTYPE)
+    session = session or os.path.splitext(os.path.basename(csv_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{session}{RECORD_EXTENSION}")
+    write_header(path, session)
+    records.tofile(path)
+    return path